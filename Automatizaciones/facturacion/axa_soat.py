@@ -23,11 +23,12 @@ from playwright.sync_api import Page, expect, TimeoutError as PlaywrightTimeoutE
 try:
     from Configuracion.constantes import *
     from Core.utilidades import encontrar_documentos_facturacion_axa
+    from Core.linea_tiempo import tramo
 except ImportError as e:
     raise ImportError(f"ERROR CRITICO: Importaciones fallaron: {e}")
 
 # Reutilización de funciones comunes desde el módulo de glosas de AXA
-from ..glosas.axa_soat import login, asegurar_extension_pdf_minuscula
+from ..glosas.axa_soat import login, verificar_sesion, USUARIO_SESION, asegurar_extension_pdf_minuscula
 
 # --- Definición de Estados del Proceso ---
 ESTADO_EXITO = "EXITO"
@@ -196,44 +197,70 @@ def enviar_y_finalizar_radicado(page: Page) -> tuple[str | None, str]:
 # --- FUNCIÓN ORQUESTADORA PRINCIPAL ---
 # ==============================================================================
 
-def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str, str | None, str | None, str]:
+def preparar_carpeta(subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str | None, str | None, tuple | None, str]:
+    """
+    Etapa local (sin navegador): verificación de omisión, búsqueda de documentos y renombrado.
+    Puede ejecutarse en otro hilo mientras el navegador trabaja en otra carpeta.
+
+    Returns:
+        (estado, codigo_factura, (cuv, archivos_a_subir), log). 'estado' es None si la carpeta quedó lista.
+    """
+    logs = []
+    # 1. Verificación previa de omisión
+    if any(f.name.lower().endswith("-recibido.pdf") for f in subfolder_path.iterdir()):
+        return ESTADO_OMITIDO_RADICADO, None, None, "OMITIENDO: Ya existe radicado."
+        
+    # 2. Búsqueda y validación de archivos
+    with tramo("busqueda_archivos"):
+        codigo_factura, cuv, archivos_a_subir, docs_log = encontrar_documentos_facturacion_axa(subfolder_path, subfolder_name)
+    logs.append(docs_log)
+    if not all([codigo_factura, cuv, archivos_a_subir]):
+        return ESTADO_FALLO, codigo_factura, None, "\n".join(logs)
+
+    # 3. Preparación de archivos (renombrar PDFs a minúsculas)
+    for tipo, path in archivos_a_subir.items():
+        if path.suffix.lower() == ".pdf":
+            path_final, rename_log = asegurar_extension_pdf_minuscula(path)
+            archivos_a_subir[tipo] = path_final
+            logs.append(rename_log)
+
+    return None, codigo_factura, (cuv, archivos_a_subir), "\n".join(logs)
+
+def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default', preparacion=None) -> tuple[str, str | None, str | None, str]:
     """
     Orquesta el flujo completo de radicación de facturación para una carpeta.
+    'preparacion' es el resultado de preparar_carpeta si ya se ejecutó por adelantado.
     """
     logs = [f"--- Iniciando AXA FACTURACIÓN | Carpeta: '{subfolder_name}' ---"]
     radicado, codigo_factura = None, None
     try:
-        # 1. Verificación previa de omisión
-        if any(f.name.lower().endswith("-recibido.pdf") for f in subfolder_path.iterdir()):
-            return ESTADO_OMITIDO_RADICADO, None, None, "\n".join(logs + ["OMITIENDO: Ya existe radicado."])
-            
-        # 2. Búsqueda y validación de archivos
-        codigo_factura, cuv, archivos_a_subir, docs_log = encontrar_documentos_facturacion_axa(subfolder_path, subfolder_name)
-        logs.append(docs_log)
-        if not all([codigo_factura, cuv, archivos_a_subir]):
-            return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
-
-        # 3. Preparación de archivos (renombrar PDFs a minúsculas)
-        for tipo, path in archivos_a_subir.items():
-            if path.suffix.lower() == ".pdf":
-                path_final, rename_log = asegurar_extension_pdf_minuscula(path)
-                archivos_a_subir[tipo] = path_final
-                logs.append(rename_log)
+        if preparacion is None:
+            preparacion = preparar_carpeta(subfolder_path, subfolder_name, context)
+        estado_prep, codigo_factura, datos, prep_log = preparacion
+        logs.append(prep_log)
+        if estado_prep == ESTADO_OMITIDO_RADICADO:
+            return estado_prep, None, None, "\n".join(logs)
+        if estado_prep is not None:
+            return estado_prep, None, codigo_factura, "\n".join(logs)
+        cuv, archivos_a_subir = datos
 
         # 4. Proceso de llenado y subida en la web
-        form_ok, form_log = llenar_formulario(page, codigo_factura, cuv)
+        with tramo("llenado_formulario"):
+            form_ok, form_log = llenar_formulario(page, codigo_factura, cuv)
         logs.append(form_log)
         if not form_ok:
             return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
 
         logs.append(handle_optional_popup(page, 3000))
         
-        upload_ok, upload_log = subir_archivos_facturacion(page, archivos_a_subir)
+        with tramo("subida"):
+            upload_ok, upload_log = subir_archivos_facturacion(page, archivos_a_subir)
         logs.append(upload_log)
         if not upload_ok:
             return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
             
-        radicado, final_log = enviar_y_finalizar_radicado(page)
+        with tramo("confirmacion"):
+            radicado, final_log = enviar_y_finalizar_radicado(page)
         logs.append(final_log)
         if not radicado:
             return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
@@ -13,10 +13,12 @@ except ImportError:
 try:
     from Configuracion.constantes import *
     from Core.utilidades import encontrar_documentos_facturacion, guardar_screenshot_de_error
+    from Core.esperas import esperar_dom_estable, esperar_valor_vacio
+    from Core.linea_tiempo import tramo
 except ImportError:
     raise ImportError("ERROR CRITICO: No se pudieron importar módulos.")
 
-from ..glosas.previsora import login, navegar_a_inicio, guardar_confirmacion_previsora, _verificar_pagina_activa
+from ..glosas.previsora import login, verificar_sesion, USUARIO_SESION, navegar_a_inicio, guardar_confirmacion_previsora, _verificar_pagina_activa, seleccionar_ciudad
 
 # Estados
 ESTADO_EXITO = "EXITO"
@@ -32,15 +34,9 @@ def llenar_formulario_facturacion(page: Page, codigo_factura: str) -> tuple[str,
     """
     logs = [f"  Llenando formulario de Facturación (Factura: {codigo_factura})..."]
     try:
-        dropdown_ciudad_container = page.locator(f"//input[@id='{PREVISORA_ID_CIUDAD_HIDDEN_FORM}']/..")
-        opcion_ciudad = page.locator(PREVISORA_XPATH_CIUDAD_OPCION)
         factura_input = page.locator(f"#{PREVISORA_ID_FACTURA_FORM}")
         
-        logs.append("    - Abriendo dropdown de Ciudad...")
-        dropdown_ciudad_container.click()
-        logs.append(f"    - Seleccionando '{PREVISORA_CIUDAD_FORM_NOMBRE}'...")
-        opcion_ciudad.click()
-        logs.append("    - Ciudad OK.")
+        seleccionar_ciudad(page, logs)
 
         factura_input.fill(codigo_factura)
         page.locator(f"#{PREVISORA_ID_CORREO_FORM}").fill(PREVISORA_CORREO_FORM)
@@ -51,11 +47,15 @@ def llenar_formulario_facturacion(page: Page, codigo_factura: str) -> tuple[str,
         try:
             page.locator(PREVISORA_XPATH_POPUP_FACTURA_CONTINUAR).click(timeout=10000)
             logs.append("    - Pop-up de factura existente manejado.")
+            # El portal vacía el campo factura tras el pop-up si la factura ya existe. Se vigila
+            # el valor del campo (vaciarlo no muta el DOM); si sigue lleno al agotar la espera, no es duplicada.
+            campo_vacio = esperar_valor_vacio(factura_input, timeout_ms=1500)
         except PlaywrightTimeoutError:
             logs.append("    - Pop-up de factura no apareció, continuando.")
+            # Sin pop-up no hay nada que vacíe el campo: basta leerlo, sin esperar
+            campo_vacio = not factura_input.input_value()
 
-        time.sleep(0.5)
-        if not factura_input.input_value():
+        if campo_vacio:
             logs.append("    -> CAMPO FACTURA VACÍO. Omitiendo por duplicado.")
             return ESTADO_OMITIDO_DUPLICADA, "\n".join(logs)
 
@@ -98,21 +98,40 @@ def subir_archivos_facturacion(page: Page, documentos: dict[str, Path]) -> tuple
         logs.append(log_screenshot)
         traceback.print_exc()
         
-# --- ORQUESTADOR PRINCIPAL (RÉPLICA DE LA LÓGICA DE GLOSAS) ---
-def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str, str | None, str | None, str]:
+def preparar_carpeta(subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str | None, str | None, dict | None, str]:
     """
-    Orquestador para Facturación con la estrategia de reintento proactiva.
+    Etapa local (sin navegador): verificaciones previas y búsqueda de documentos.
+    Puede ejecutarse en otro hilo mientras el navegador trabaja en otra carpeta.
+
+    Returns:
+        (estado, codigo_factura, documentos, log). 'estado' es None si la carpeta quedó lista.
     """
-    logs = [f"--- Iniciando Proceso de FACTURACIÓN (Previsora) para: '{subfolder_name}' ---"]
-    
     # Verificaciones previas
     if any(p in subfolder_name.upper() for p in PALABRAS_EXCLUSION_CARPETAS) or (subfolder_path / "RAD.pdf").is_file():
         return ESTADO_OMITIDO_RADICADO, None, None, f"OMITIENDO: Carpeta excluida por nombre o ya radicada."
 
-    codigo_factura, documentos, docs_log = encontrar_documentos_facturacion(subfolder_path, subfolder_name)
-    logs.append(docs_log)
+    with tramo("busqueda_archivos"):
+        codigo_factura, documentos, docs_log = encontrar_documentos_facturacion(subfolder_path, subfolder_name)
     if not (codigo_factura and documentos):
-        return ESTADO_FALLO, None, None, "\n".join(logs)
+        return ESTADO_FALLO, None, None, docs_log
+    return None, codigo_factura, documentos, docs_log
+
+# --- ORQUESTADOR PRINCIPAL (RÉPLICA DE LA LÓGICA DE GLOSAS) ---
+def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default', preparacion=None) -> tuple[str, str | None, str | None, str]:
+    """
+    Orquestador para Facturación con la estrategia de reintento proactiva.
+    'preparacion' es el resultado de preparar_carpeta si ya se ejecutó por adelantado.
+    """
+    logs = [f"--- Iniciando Proceso de FACTURACIÓN (Previsora) para: '{subfolder_name}' ---"]
+
+    if preparacion is None:
+        preparacion = preparar_carpeta(subfolder_path, subfolder_name, context)
+    estado_prep, codigo_factura, documentos, prep_log = preparacion
+    if estado_prep == ESTADO_OMITIDO_RADICADO:
+        return estado_prep, None, None, prep_log
+    logs.append(prep_log)
+    if estado_prep is not None:
+        return estado_prep, None, None, "\n".join(logs)
         
     MAX_ATTEMPTS = 3
     for attempt in range(1, MAX_ATTEMPTS + 1):
@@ -122,12 +141,13 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
             if attempt > 1:
                 logs.append("   -> Fallo en intento anterior. Recargando la página...")
                 page.reload(wait_until="domcontentloaded", timeout=45000)
-                page.wait_for_timeout(3000)
+                esperar_dom_estable(page, quietud_ms=500, timeout_ms=3000)
             
             _verificar_pagina_activa(page)
             
             # PASO 1: Llenado de Formulario
-            estado_llenado, log_llenado = llenar_formulario_facturacion(page, codigo_factura)
+            with tramo("llenado_formulario"):
+                estado_llenado, log_llenado = llenar_formulario_facturacion(page, codigo_factura)
             logs.append(log_llenado)
             if estado_llenado == ESTADO_OMITIDO_DUPLICADA:
                 return ESTADO_OMITIDO_DUPLICADA, None, codigo_factura, "\n".join(logs)
@@ -137,7 +157,8 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
             _verificar_pagina_activa(page)
 
             # PASO 2: Subida de Archivos
-            estado_subida, log_subida = subir_archivos_facturacion(page, documentos)
+            with tramo("subida"):
+                estado_subida, log_subida = subir_archivos_facturacion(page, documentos)
             logs.append(log_subida)
             if estado_subida != ESTADO_EXITO:
                 raise Exception("La subida de archivos de facturación falló.")
@@ -10,6 +10,7 @@ from playwright.sync_api import Page, expect, TimeoutError as PlaywrightTimeoutE
 try:
     from Configuracion.constantes import *
     from Core.utilidades import encontrar_y_validar_pdfs, guardar_screenshot_de_error
+    from Core.linea_tiempo import tramo
 except ImportError as e:
     raise ImportError(f"ERROR CRITICO: No se pudieron importar constantes: {e}")
 
@@ -19,6 +20,9 @@ ESTADO_FALLO = "FALLO"
 ESTADO_OMITIDO_RADICADO = "OMITIDO_RADICADO"
 ESTADO_OMITIDO_DUPLICADA = "OMITIDO_DUPLICADA"
 
+# Usuario con el que se guarda la sesión persistida (ver Core/sesiones.py)
+USUARIO_SESION = AXASOAT_DOCUMENTO_LOGIN
+
 def check_server_error(page: Page) -> bool:
     """Verifica si la página actual muestra un error de servidor '502 Bad Gateway'."""
     try:
@@ -74,6 +78,27 @@ def login(page: Page) -> tuple[bool, str]:
         return False, "\n".join(logs)
 
 
+def verificar_sesion(page: Page) -> tuple[bool, str]:
+    """Comprueba si la sesión restaurada lleva directo al formulario de radicación."""
+    logs = ["Verificando sesión guardada de AXA SOAT..."]
+    try:
+        page.goto(AXASOAT_LOGIN_URL, timeout=60000)
+        if check_server_error(page):
+            logs.append("El servidor de AXA respondió con error 502. Se intentará el login completo.")
+            return False, "\n".join(logs)
+        expect(page.locator(AXASOAT_SELECTOR_FORMULARIO_VERIFY)).to_be_enabled(timeout=8000)
+        try:
+            page.locator(AXASOAT_SELECTOR_MODAL_ACEPTAR).click(timeout=2000)
+            logs.append("  - Pop-up de notificación cerrado.")
+        except PlaywrightTimeoutError:
+            pass
+        logs.append("Sesión vigente. Se omite el login.")
+        return True, "\n".join(logs)
+    except Exception:
+        logs.append("Sesión expirada o inválida. Se hará login completo.")
+        return False, "\n".join(logs)
+
+
 def llenar_formulario(page: Page, codigo_factura: str, context: str = 'default') -> tuple[bool, str]:
     """Llena los campos del formulario de radicación de AXA."""
     logs = ["Llenando formulario de radicación..."]
@@ -177,50 +202,71 @@ def subir_archivo_respuesta(page: Page, pdf_path: Path) -> tuple[bool, str]:
         logs.append(log_screenshot)
         return False, "\n".join(logs)
 
-def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str, str | None, str | None, str]:
+def preparar_carpeta(subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str | None, str | None, Path | None, str]:
+    """
+    Etapa local (sin navegador): filtros de omisión, búsqueda y validación del PDF.
+    Puede ejecutarse en otro hilo mientras el navegador trabaja en otra carpeta.
+
+    Returns:
+        (estado, codigo_factura, pdf_path, log). 'estado' es None si la carpeta quedó lista.
+    """
+    logs = []
+    # 1. Verificar por nombre de carpeta
+    palabras_encontradas = [p for p in PALABRAS_EXCLUSION_CARPETAS if p in subfolder_name.upper()]
+    if palabras_encontradas:
+        # Si encuentra "NO RADICAR" y "CARTERA", las unirá
+        motivo = ", ".join(palabras_encontradas)
+        msg = f"OMITIENDO: El nombre contiene la(s) palabra(s) de exclusión: '{motivo}'."
+        logs.append(msg)
+        return ESTADO_OMITIDO_RADICADO, None, None, "\n".join(logs)
+
+    # 2. Verificar si ya está radicada
+    if any(f.name.lower().endswith("-recibido.pdf") for f in subfolder_path.iterdir() if f.is_file()):
+        msg = "OMITIENDO: Ya existe un archivo de radicado '*-recibido.pdf'."
+        logs.append(msg)
+        return ESTADO_OMITIDO_RADICADO, None, None, "\n".join(logs)
+
+    # 3. Búsqueda y preparación de archivos
+    with tramo("busqueda_archivos"):
+        codigo_factura, pdf_path, pdf_log = encontrar_y_validar_pdfs(subfolder_path, subfolder_name, AXASOAT_NOMBRE_EN_PDF)
+    logs.append(pdf_log)
+    if not (codigo_factura and pdf_path):
+        return ESTADO_FALLO, None, None, "\n".join(logs)
+    
+    path_pdf_final, rename_log = asegurar_extension_pdf_minuscula(pdf_path)
+    logs.append(rename_log)
+    return None, codigo_factura, path_pdf_final, "\n".join(logs)
+
+def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default', preparacion=None) -> tuple[str, str | None, str | None, str]:
     """
     Orquestador web para AXA: filtra, valida, llena formulario y lo envía.
     NO se encarga de la lógica de email; solo devuelve el radicado para la cola.
+    'preparacion' es el resultado de preparar_carpeta si ya se ejecutó por adelantado.
     """
     logs = [f"--- Iniciando procesamiento WEB para AXA | Carpeta: '{subfolder_name}' ---"]
     try:
-        # --- NUEVO BLOQUE (MENSAJES ESPECÍFICOS) ---
-        # 1. Verificar por nombre de carpeta
-        palabras_encontradas = [p for p in PALABRAS_EXCLUSION_CARPETAS if p in subfolder_name.upper()]
-        if palabras_encontradas:
-            # Si encuentra "NO RADICAR" y "CARTERA", las unirá
-            motivo = ", ".join(palabras_encontradas)
-            msg = f"OMITIENDO: El nombre contiene la(s) palabra(s) de exclusión: '{motivo}'."
-            logs.append(msg)
-            return ESTADO_OMITIDO_RADICADO, None, None, "\n".join(logs)
-
-        # 2. Verificar si ya está radicada
-        if any(f.name.lower().endswith("-recibido.pdf") for f in subfolder_path.iterdir() if f.is_file()):
-            msg = "OMITIENDO: Ya existe un archivo de radicado '*-recibido.pdf'."
-            logs.append(msg)
-            return ESTADO_OMITIDO_RADICADO, None, None, "\n".join(logs)
-
-        # 2. Búsqueda y preparación de archivos
-        codigo_factura, pdf_path, pdf_log = encontrar_y_validar_pdfs(subfolder_path, subfolder_name, AXASOAT_NOMBRE_EN_PDF)
-        logs.append(pdf_log)
-        if not (codigo_factura and pdf_path):
-            return ESTADO_FALLO, None, None, "\n".join(logs)
-        
-        path_pdf_final, rename_log = asegurar_extension_pdf_minuscula(pdf_path)
-        logs.append(rename_log)
+        if preparacion is None:
+            preparacion = preparar_carpeta(subfolder_path, subfolder_name, context)
+        estado_prep, codigo_factura, path_pdf_final, prep_log = preparacion
+        logs.append(prep_log)
+        if estado_prep is not None:
+            return estado_prep, None, None, "\n".join(logs)
 
         # 3. Interacción Web
-        form_ok, form_log = llenar_formulario(page, codigo_factura, context=context)
+        with tramo("llenado_formulario"):
+            form_ok, form_log = llenar_formulario(page, codigo_factura, context=context)
         logs.append(form_log)
         if not form_ok:
             return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
 
-        upload_ok, upload_log = subir_archivo_respuesta(page, path_pdf_final)
+        with tramo("subida"):
+            upload_ok, upload_log = subir_archivo_respuesta(page, path_pdf_final)
         logs.append(upload_log)
         if not upload_ok:
             return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
             
-        radicado_final, final_log = enviar_y_finalizar_radicado(page)
+        with tramo("confirmacion"):
+            radicado_final, final_log = enviar_y_finalizar_radicado(page)
         logs.append(final_log)
         if not radicado_final:
             return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
@@ -3,7 +3,7 @@
 import os
 import re
 from openpyxl import load_workbook
-from Core.api_gema import query_api_gema
+from Core.api_gema import consultar_items_de_glosas_api
 
 def limpiar_texto(texto):
     """
@@ -13,32 +13,6 @@ def limpiar_texto(texto):
         return texto
     return re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f]', '', texto)
 
-def consultar_items_de_glosa_api(factura: str, estado: str, progreso_callback=None) -> list[dict]:
-    try:
-        match = re.match(r'([A-Za-z]+)(\d+)', factura)
-        if not match:
-            return []
-        prefijo, num = match.groups()
-
-        sql_gl_docn = f"gl_docn FROM [gema10.d/salud/datos/glo_cab] WHERE fc_serie = '{prefijo}' AND fc_docn = {num} ORDER BY gl_fecha DESC"
-        if progreso_callback:
-            progreso_callback(f"  [API GEMA] Consultando ID para {factura}...")
-        
-        resultados_cab = query_api_gema(sql_gl_docn)
-        if not resultados_cab:
-            return []
-
-        gl_docn = resultados_cab[0]['gl_docn']
-        sql_gl_det = f"codigo, vr_glosa, motivo_res FROM [gema10.d/salud/datos/glo_det] WHERE gl_docn = {gl_docn} AND estatus1 = '{estado}'"
-        if progreso_callback:
-            progreso_callback(f"  [API GEMA] Obteniendo detalles de ítems (gl_docn: {gl_docn}, estado: {estado})...")
-        
-        return query_api_gema(sql_gl_det)
-    except Exception as e:
-        if progreso_callback:
-            progreso_callback(f"  - ERROR CRÍTICO durante la consulta a la API: {e}")
-        return []
-
 def procesar_glosas_grupo_sis(ruta_excel: str, lista_glosas_texto: str, progreso_callback, modo: str = "glosas"):
     """
     Procesa glosas o reconsideraciones para Grupo SIS integrando la lógica de procesador_glosas_excel.py.
@@ -100,10 +74,17 @@ def procesar_glosas_grupo_sis(ruta_excel: str, lista_glosas_texto: str, progreso
     reporte_final = []
 
     # 4. Procesamiento
+    items_por_glosa, errores_api = consultar_items_de_glosas_api(glosas_a_procesar, progreso_callback)
     for factura, estado in glosas_a_procesar:
         progreso_callback(f"\n--- Procesando {factura} | Estado: {estado} ---")
-        items_api = consultar_items_de_glosa_api(factura, estado, progreso_callback)
-        
+        items_api = items_por_glosa[(factura, estado)]
+
+        if (factura, estado) in errores_api:
+            progreso_callback(f"  - ERROR consultando la API: {errores_api[(factura, estado)]}")
+            fallos += 1
+            reporte_final.append(f"{factura} (Error API)")
+            continue
+
         if not items_api:
             progreso_callback("  - Sin ítems en la API o factura no encontrada.")
             fallos += 1
@@ -3,7 +3,7 @@ import re
 import traceback
 from playwright.sync_api import Page, FrameLocator, expect, TimeoutError as PlaywrightTimeoutError
 from Configuracion.constantes import MUNDIAL_ESCOLAR_URL
-from Core.api_gema import query_api_gema
+from Core.api_gema import consultar_glosas_por_facturas, clave_factura
 
 def login(page: Page, usuario: str, contrasena: str) -> tuple[bool, str]:
     """Inicia sesión en la plataforma de Mundial usando constantes."""
@@ -60,8 +60,8 @@ def clear_iframe_popups(page: Page, frame: FrameLocator) -> tuple[bool, str]:
         except Exception as e:
             logs.append(f"      -> Clic fallido, intentando con tecla 'Escape'. Razón: {e}")
             page.keyboard.press('Escape')
-            page.wait_for_timeout(1000)
-            expect(modal_locator).to_be_hidden(timeout=5000)
+            # expect ya espera a que el modal se oculte; no hace falta una pausa previa
+            expect(modal_locator).to_be_hidden(timeout=6000)
             logs.append("      -> Éxito: Modal cerrado con 'Escape'.")
             return True, "\n".join(logs)
     except PlaywrightTimeoutError:
@@ -254,11 +254,25 @@ def _determinar_lote_y_radicabilidad(items_api_completos: list) -> tuple[bool, s
     return True, motivo, lote_a_radicar
 
 
+def consultar_historiales_gema(glosas: list[dict]) -> dict[tuple[str, str], dict]:
+    """
+    Trae de una vez, por lotes, el glo_cab más reciente y el historial completo de
+    glo_det de todas las glosas. El resultado se le pasa a diagnosticar_factura_desde_gema
+    para no hacer dos consultas por factura.
+    """
+    facturas = [(g['prefijo'].strip(), g['factura'].strip()) for g in glosas]
+    return consultar_glosas_por_facturas(
+        facturas,
+        columnas_cab="gl_docn, gl_fecha", orden_cab="gl_fecha DESC",
+        columnas_det="codigo, vr_glosa, motivo_res, estatus1, fecha_gl", orden_det="fecha_gl ASC, estatus1 ASC",
+    )
+
+
 # --- REEMPLAZA ESTA FUNCIÓN PRINCIPAL DE DIAGNÓSTICO ---
-def diagnosticar_factura_desde_gema(glosa_info: dict) -> tuple[bool, str, list | None]:
+def diagnosticar_factura_desde_gema(glosa_info: dict, historiales: dict | None = None) -> tuple[bool, str, list | None]:
     """
     Realiza el análisis de datos de una factura contra Gema.
-    - Corrige el tipo de dato de la factura en la consulta SQL.
+    - Usa 'historiales' (de consultar_historiales_gema) si trae la factura; si no, la consulta sola.
     - Añade logging detallado del lote a radicar.
     """
     prefijo = glosa_info['prefijo'].strip()
@@ -266,20 +280,20 @@ def diagnosticar_factura_desde_gema(glosa_info: dict) -> tuple[bool, str, list |
     logs = [f"--- Diagnóstico para {prefijo}{factura} ---"]
     
     try:
-        # 1. Obtener gl_docn más reciente de 'glo_cab'
-        # CORRECCIÓN: Volvemos a poner comillas en la factura, ya que fc_docn es de tipo Character
-        sql_gl_docn = f"gl_docn, gl_fecha FROM [gema10.d/salud/datos/glo_cab] WHERE fc_serie = '{prefijo}' AND fc_docn = {factura} ORDER BY gl_fecha DESC"
-        resultados_cab = query_api_gema(sql_gl_docn)
-        
-        if not resultados_cab:
+        # 1. glo_cab más reciente e historial de glo_det (precargados o consultados ahora)
+        clave = clave_factura(prefijo, factura)
+        if historiales is None or clave not in historiales:
+            historiales = consultar_historiales_gema([glosa_info])
+        historial = historiales.get(clave) or {"cab": None, "det": []}
+
+        if not historial["cab"]:
             return False, "\n".join(logs + ["  - Resultado: FALLO. La factura no existe en glo_cab."]), None
         
-        gl_docn_maestro = resultados_cab[0]['gl_docn']
-        logs.append(f"  - gl_docn maestro encontrado: {gl_docn_maestro} (fecha: {resultados_cab[0].get('gl_fecha', 'N/A')})")
+        gl_docn_maestro = historial["cab"]['gl_docn']
+        logs.append(f"  - gl_docn maestro encontrado: {gl_docn_maestro} (fecha: {historial['cab'].get('gl_fecha', 'N/A')})")
 
-        # 2. Obtener todo el historial de 'glo_det'
-        sql_gl_det = f"codigo, vr_glosa, motivo_res, estatus1, fecha_gl FROM [gema10.d/salud/datos/glo_det] WHERE gl_docn = {gl_docn_maestro} ORDER BY fecha_gl ASC, estatus1 ASC"
-        items_api_completos = query_api_gema(sql_gl_det)
+        # 2. Historial completo de 'glo_det' (ordenado por fecha_gl y estatus1)
+        items_api_completos = historial["det"]
         logs.append(f"  - Se encontraron {len(items_api_completos)} eventos en el historial de la glosa.")
 
         # 3. Determinar si es radicable y qué lote usar, con la lógica actualizada
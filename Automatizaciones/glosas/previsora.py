@@ -7,6 +7,9 @@ import os
 import fitz
 
 from Core.utilidades import encontrar_y_validar_pdfs, guardar_screenshot_de_error
+from Core.esperas import esperar_primero, esperar_dom_estable, esperar_valor_vacio
+from Core.ritmo import obtener_ritmo
+from Core.linea_tiempo import tramo
 from playwright.sync_api import Page, expect, TimeoutError as PlaywrightTimeoutError
 try:
     from PIL import Image
@@ -23,6 +26,9 @@ ESTADO_FALLO = "FALLO"
 ESTADO_OMITIDO_RADICADO = "OMITIDO_RADICADO"
 ESTADO_OMITIDO_DUPLICADA = "OMITIDO_DUPLICADA"
 
+# Usuario con el que se guarda la sesión persistida (ver Core/sesiones.py)
+USUARIO_SESION = PREVISORA_NO_DOCUMENTO_LOGIN
+
 def _verificar_pagina_activa(page: Page):
     """
     Verifica rápidamente si los elementos clave del formulario de radicación están presentes.
@@ -62,6 +68,18 @@ def login(page: Page) -> tuple[bool, str]:
         traceback.print_exc()
         return False, "\n".join(logs)
 
+def verificar_sesion(page: Page) -> tuple[bool, str]:
+    """Comprueba rápidamente si la sesión restaurada sigue activa (sin repetir el login)."""
+    logs = ["Verificando sesión guardada de Previsora..."]
+    try:
+        page.goto(PREVISORA_LOGIN_URL, timeout=60000)
+        expect(page.locator(PREVISORA_XPATH_INICIO_LINK)).to_be_visible(timeout=8000)
+        logs.append("Sesión vigente. Se omite el login.")
+        return True, "\n".join(logs)
+    except Exception:
+        logs.append("Sesión expirada o inválida. Se hará login completo.")
+        return False, "\n".join(logs)
+
 def navegar_a_inicio(page: Page) -> tuple[bool, str]:
     """Navega a la sección de 'Inicio' de la pagina."""
     logs = ["Navegando a la sección 'Inicio' (Recepción Reclamación)..."]
@@ -79,19 +97,39 @@ def navegar_a_inicio(page: Page) -> tuple[bool, str]:
         traceback.print_exc()
         return False, "\n".join(logs)
 
+def seleccionar_ciudad(page: Page, logs: list):
+    """
+    Abre el dropdown de Ciudad y elige la ciudad configurada. Es el paso más inestable
+    del portal: si la opción no aparece, se reintenta con una pausa adaptativa.
+    """
+    ritmo = obtener_ritmo(PREVISORA_ID)
+    dropdown_ciudad_container = page.locator(f"//input[@id='{PREVISORA_ID_CIUDAD_HIDDEN_FORM}']/..")
+    opcion_ciudad = page.locator(PREVISORA_XPATH_CIUDAD_OPCION)
+    max_intentos = 3
+    for intento in range(1, max_intentos + 1):
+        logs.append("    - Abriendo dropdown de Ciudad...")
+        dropdown_ciudad_container.click()
+        ritmo.pausa(page, "ciudad_dropdown")
+        logs.append(f"    - Seleccionando '{PREVISORA_CIUDAD_FORM_NOMBRE}'...")
+        try:
+            opcion_ciudad.click(timeout=5000)
+            ritmo.registrar_exito("ciudad_dropdown")
+            logs.append("    - Ciudad OK.")
+            return
+        except PlaywrightTimeoutError:
+            if intento == max_intentos:
+                raise
+            nueva_pausa = ritmo.registrar_fallo("ciudad_dropdown")
+            logs.append(f"    - El dropdown de Ciudad no respondió. Reintentando con pausa de {nueva_pausa} ms...")
+            page.keyboard.press("Escape")
+
 def llenar_formulario_previsora(page: Page, codigo_factura: str, context: str = 'default') -> tuple[str, str]:
     """Llena el formulario con los datos de la factura."""
     logs = [f"  Llenando formulario (Factura: {codigo_factura})..."]
     try:
-        dropdown_ciudad_container = page.locator(f"//input[@id='{PREVISORA_ID_CIUDAD_HIDDEN_FORM}']/..")
-        opcion_ciudad = page.locator(PREVISORA_XPATH_CIUDAD_OPCION)
         factura_input = page.locator(f"#{PREVISORA_ID_FACTURA_FORM}")
         
-        logs.append("    - Abriendo dropdown de Ciudad...")
-        dropdown_ciudad_container.click()
-        logs.append(f"    - Seleccionando '{PREVISORA_CIUDAD_FORM_NOMBRE}'...")
-        opcion_ciudad.click()
-        logs.append("    - Ciudad OK.")
+        seleccionar_ciudad(page, logs)
 
         factura_input.fill(codigo_factura)
         page.locator(f"#{PREVISORA_ID_CORREO_FORM}").fill(PREVISORA_CORREO_FORM)
@@ -102,11 +140,15 @@ def llenar_formulario_previsora(page: Page, codigo_factura: str, context: str =
         try:
             page.locator(PREVISORA_XPATH_POPUP_FACTURA_CONTINUAR).click(timeout=10000)
             logs.append("    - Pop-up de factura existente manejado.")
+            # El portal vacía el campo factura tras el pop-up si la factura ya existe. Se vigila
+            # el valor del campo (vaciarlo no muta el DOM); si sigue lleno al agotar la espera, no es duplicada.
+            campo_vacio = esperar_valor_vacio(factura_input, timeout_ms=1500)
         except PlaywrightTimeoutError:
             logs.append("    - Pop-up de factura no apareció, continuando.")
+            # Sin pop-up no hay nada que vacíe el campo: basta leerlo, sin esperar
+            campo_vacio = not factura_input.input_value()
 
-        time.sleep(0.5)
-        if not factura_input.input_value():
+        if campo_vacio:
             logs.append("    -> CAMPO FACTURA VACÍO. Omitiendo por duplicado.")
             return ESTADO_OMITIDO_DUPLICADA, "\n".join(logs)
 
@@ -166,62 +208,54 @@ def guardar_confirmacion_previsora(page: Page, output_folder: Path) -> tuple[str
     """
     logs = ["  Manejando fase de confirmación final (lógica adaptativa)..."]
     try:
-        # 1. Esperar a que la página se estabilice (sin cambios)
-        logs.append("    - Esperando a que la página se estabilice...")
-        page.wait_for_load_state("load", timeout=30000)
-        logs.append("    - Página estabilizada.")
-
-        # --- LÓGICA ADAPTATIVA: BUSCAR QUÉ CAMINO TOMÓ LA WEB ---
-        # Definimos los localizadores para ambos posibles pop-ups
-        popup_intermedio_boton = page.locator(PREVISORA_XPATH_POPUP_CONTINUAR_GUARDAR)
-        popup_final_confirmacion = page.locator(PREVISORA_XPATH_FINAL_CONFIRMATION_POPUP_CONTAINER)
+        with tramo("confirmacion"):
+            # 1. Esperar a que la página se estabilice (sin cambios)
+            logs.append("    - Esperando a que la página se estabilice...")
+            page.wait_for_load_state("load", timeout=30000)
+            logs.append("    - Página estabilizada.")
+
+            # --- LÓGICA ADAPTATIVA: BUSCAR QUÉ CAMINO TOMÓ LA WEB ---
+            # Definimos los localizadores para ambos posibles pop-ups
+            popup_intermedio_boton = page.locator(PREVISORA_XPATH_POPUP_CONTINUAR_GUARDAR)
+            popup_final_confirmacion = page.locator(PREVISORA_XPATH_FINAL_CONFIRMATION_POPUP_CONTAINER)
         
-        logs.append("    - Detectando siguiente paso del flujo (Intermedio o Final)...")
+            logs.append("    - Detectando siguiente paso del flujo (Intermedio o Final)...")
         
-        # Esperamos un máximo de 3 minutos a que ALGUNO de los dos aparezca.
-        # Esto lo logramos con un bucle de espera manual.
-        popup_final = None # Definimos la variable fuera del bucle
-        found_path = False
-        for _ in range(180): # Intentar cada segundo por 3 minutos (180 segundos)
-            # Primero, revisar si ya tenemos el resultado final.
-            if popup_final_confirmacion.is_visible():
+            # Esperamos un máximo de 3 minutos a que ALGUNO de los dos aparezca.
+            # La espera termina en cuanto uno se hace visible; si ambos lo están, gana el final.
+            camino = esperar_primero(
+                {"final": popup_final_confirmacion, "intermedio": popup_intermedio_boton},
+                timeout_ms=180000,
+            )
+            if camino == "final":
                 logs.append("    -> DETECTADO: El pop-up final 'Registro Generado' apareció directamente.")
-                popup_final = popup_final_confirmacion
-                found_path = True
-                break
-            
-            # Si no, revisar si tenemos el paso intermedio.
-            if popup_intermedio_boton.is_visible():
+            elif camino == "intermedio":
                 logs.append("    -> DETECTADO: El pop-up intermedio 'Continuar y Guardar' está visible.")
                 popup_intermedio_boton.click(no_wait_after=True)
                 logs.append("    -> Clic en 'Continuar y Guardar'. Ahora esperando el pop-up final...")
                 # Ahora que hicimos clic, podemos esperar con `expect` de forma segura
                 expect(popup_final_confirmacion).to_be_visible(timeout=180000)
-                popup_final = popup_final_confirmacion
-                found_path = True
-                break
-
-            page.wait_for_timeout(1000) # Esperar 1 segundo antes de volver a comprobar
-
-        if not found_path or not popup_final:
-            raise Exception("Timeout: No se detectó ni el pop-up intermedio ni el final después de 3 minutos.")
+            else:
+                raise Exception("Timeout: No se detectó ni el pop-up intermedio ni el final después de 3 minutos.")
+            popup_final = popup_final_confirmacion
         
         # --- Si llegamos aquí, 'popup_final' tiene el elemento correcto ---
         
         # El resto del código para extraer y guardar la evidencia no cambia.
-        texto_popup = popup_final.inner_text()
-        radicado_match = re.search(r"Tu codigo es:\s*'(\d+)'", texto_popup, re.IGNORECASE)
-        radicado_extraido = radicado_match.group(1) if radicado_match else "Extracción Fallida"
-        logs.append(f"    - Código de radicado extraído: {radicado_extraido}")
+        with tramo("evidencia"):
+            texto_popup = popup_final.inner_text()
+            radicado_match = re.search(r"Tu codigo es:\s*'(\d+)'", texto_popup, re.IGNORECASE)
+            radicado_extraido = radicado_match.group(1) if radicado_match else "Extracción Fallida"
+            logs.append(f"    - Código de radicado extraído: {radicado_extraido}")
         
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        temp_png_path = output_folder / f"temp_confirmacion_{timestamp}.png"
-        rad_pdf_path = output_folder / "RAD.pdf"
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            temp_png_path = output_folder / f"temp_confirmacion_{timestamp}.png"
+            rad_pdf_path = output_folder / "RAD.pdf"
         
-        popup_final.screenshot(path=temp_png_path)
-        with Image.open(temp_png_path) as img: img.convert("RGB").save(rad_pdf_path)
-        temp_png_path.unlink()
-        logs.append(f"    - Confirmación guardada como {rad_pdf_path.name}")
+            popup_final.screenshot(path=temp_png_path)
+            with Image.open(temp_png_path) as img: img.convert("RGB").save(rad_pdf_path)
+            temp_png_path.unlink()
+            logs.append(f"    - Confirmación guardada como {rad_pdf_path.name}")
         
         page.locator(PREVISORA_XPATH_BOTON_NUEVA_RECLAMACION).click()
         expect(page.locator(f"#{PREVISORA_ID_FACTURA_FORM}")).to_be_enabled(timeout=20000)
@@ -237,19 +271,24 @@ def guardar_confirmacion_previsora(page: Page, output_folder: Path) -> tuple[str
         traceback.print_exc()
         return None, None, "\n".join(logs)
 
-def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str, str | None, str | None, str]:
+def preparar_carpeta(subfolder_path: Path, subfolder_name: str, context: str = 'default') -> tuple[str | None, str | None, Path | None, str]:
     """
-    Orquestador para Previsora con una estrategia de reintento proactiva:
-    si un intento falla, recarga la página antes de volver a intentarlo.
+    Etapa local (sin navegador): verificaciones previas, búsqueda del PDF y compresión.
+    Puede ejecutarse en otro hilo mientras el navegador trabaja en otra carpeta.
+
+    Returns:
+        (estado, codigo_factura, pdf_path, log). 'estado' es None si la carpeta
+        quedó lista para el navegador; si no, es el estado final de la carpeta.
     """
-    logs = [f"--- Iniciando Playwright/Previsora para: '{subfolder_name}' ---"]
-    
+    logs = []
+
     # Verificaciones previas de nombre y RAD.pdf
     if any(p in subfolder_name.upper() for p in PALABRAS_EXCLUSION_CARPETAS) or (subfolder_path / "RAD.pdf").is_file():
         return ESTADO_OMITIDO_RADICADO, None, None, f"OMITIENDO: Carpeta excluida por nombre o ya radicada."
 
     # 1. Encontrar los archivos
-    codigo_factura, pdf_path, pdf_log = encontrar_y_validar_pdfs(subfolder_path, subfolder_name, PREVISORA_NOMBRE_EN_PDF)
+    with tramo("busqueda_archivos"):
+        codigo_factura, pdf_path, pdf_log = encontrar_y_validar_pdfs(subfolder_path, subfolder_name, PREVISORA_NOMBRE_EN_PDF)
     logs.append(pdf_log)
     if not (codigo_factura and pdf_path):
         return ESTADO_FALLO, None, None, "\n".join(logs)
@@ -271,7 +310,7 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
                     f"El archivo sigue siendo demasiado grande. Esta carpeta será omitida para evitar bucles."
                 )
                 logs.append(error_msg)
-                return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
+                return ESTADO_FALLO, codigo_factura, None, "\n".join(logs)
 
             # Si no hay backup, es el primer intento. Procedemos a comprimir.
             logs.append("Intentando comprimir por primera vez...")
@@ -280,8 +319,9 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
 
             try:
                 # Comprimir el PDF
-                with fitz.open(original_pdf_path) as doc:
-                    doc.save(str(pdf_path), garbage=4, deflate=True, clean=True)
+                with tramo("compresion"):
+                    with fitz.open(original_pdf_path) as doc:
+                        doc.save(str(pdf_path), garbage=4, deflate=True, clean=True)
                 
                 new_size = pdf_path.stat().st_size
                 logs.append(f"  - Compresión completa. Nuevo tamaño: {new_size / (1024*1024):.2f} MB")
@@ -295,7 +335,7 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
                     )
                     logs.append(error_msg)
                     # No restauramos el nombre, dejamos el -original.pdf como evidencia del fallo.
-                    return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
+                    return ESTADO_FALLO, codigo_factura, None, "\n".join(logs)
                 
                 # Si la compresión fue exitosa, el proceso continúa con el nuevo pdf_path
                 logs.append("  - El archivo ahora está dentro del límite de tamaño.")
@@ -306,11 +346,30 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
                 if original_pdf_path.exists():
                     original_pdf_path.rename(pdf_path)
                     logs.append(f"  - Se restauró el nombre del archivo original: {pdf_path.name}")
-                return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)
+                return ESTADO_FALLO, codigo_factura, None, "\n".join(logs)
 
     except FileNotFoundError:
         logs.append(f"ERROR: No se pudo encontrar el archivo {pdf_path} para verificar su tamaño.")
-        return ESTADO_FALLO, None, codigo_factura, "\n".join(logs)    
+        return ESTADO_FALLO, codigo_factura, None, "\n".join(logs)
+
+    return None, codigo_factura, pdf_path, "\n".join(logs)
+
+def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, context: str = 'default', preparacion=None) -> tuple[str, str | None, str | None, str]:
+    """
+    Orquestador para Previsora con una estrategia de reintento proactiva:
+    si un intento falla, recarga la página antes de volver a intentarlo.
+    'preparacion' es el resultado de preparar_carpeta si ya se ejecutó por adelantado.
+    """
+    logs = [f"--- Iniciando Playwright/Previsora para: '{subfolder_name}' ---"]
+
+    if preparacion is None:
+        preparacion = preparar_carpeta(subfolder_path, subfolder_name, context)
+    estado_prep, codigo_factura, pdf_path, prep_log = preparacion
+    if estado_prep == ESTADO_OMITIDO_RADICADO:
+        return estado_prep, None, None, prep_log
+    logs.append(prep_log)
+    if estado_prep is not None:
+        return estado_prep, None, codigo_factura, "\n".join(logs)
     
     MAX_ATTEMPTS = 3 # Aumentamos a 3 para más robustez
     for attempt in range(1, MAX_ATTEMPTS + 1):
@@ -322,15 +381,16 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
             if attempt > 1:
                 logs.append("   -> Fallo en intento anterior. Recargando la página para empezar de nuevo...")
                 page.reload(wait_until="domcontentloaded", timeout=45000)
-                # Opcional: una pequeña espera tras la recarga puede ayudar a estabilizar
-                page.wait_for_timeout(3000) 
+                # Esperar a que los scripts del formulario terminen de pintar, sin pausa fija
+                esperar_dom_estable(page, quietud_ms=500, timeout_ms=3000)
             
             # VERIFICACIÓN DEL VIGÍA #1: ¿La página está bien ANTES de empezar a llenar?
             _verificar_pagina_activa(page)
             
             # --- PASO 1: Llenado de Formulario ---
             logs.append("\n--- PASO 1: Llenado de Formulario ---")
-            estado_llenado, log_llenado = llenar_formulario_previsora(page, codigo_factura, context)
+            with tramo("llenado_formulario"):
+                estado_llenado, log_llenado = llenar_formulario_previsora(page, codigo_factura, context)
             logs.append(log_llenado)
             if estado_llenado == ESTADO_OMITIDO_DUPLICADA: 
                 return ESTADO_OMITIDO_DUPLICADA, None, codigo_factura, "\n".join(logs)
@@ -339,7 +399,8 @@ def procesar_carpeta(page: Page, subfolder_path: Path, subfolder_name: str, cont
 
             # --- PASO 2: Subida de Archivos ---
             logs.append("\n--- PASO 2: Subida de Archivos ---")
-            estado_subida, log_subida = subir_y_enviar_previsora(page, pdf_path)
+            with tramo("subida"):
+                estado_subida, log_subida = subir_y_enviar_previsora(page, pdf_path)
             logs.append(log_subida)
             if estado_subida != ESTADO_EXITO: 
                 raise Exception("La subida de archivos falló.")
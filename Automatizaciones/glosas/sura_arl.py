@@ -5,6 +5,9 @@ import traceback
 from pathlib import Path
 import os
 from playwright.sync_api import Page, expect, TimeoutError as PlaywrightTimeoutError
+from Core.esperas import esperar_primero, esperar_oculto, esperar_condicion, esperar_mutacion, esperar_dom_estable
+from Core.ritmo import obtener_ritmo
+from Core.linea_tiempo import tramo, FasesSecuenciales
 
 try:
     from PIL import Image
@@ -21,6 +24,64 @@ ESTADO_FALLO = "FALLO"
 ESTADO_OMITIDO_RADICADO = "OMITIDO_RADICADO"
 ESTADO_OMITIDO_DUPLICADA = "OMITIDO_DUPLICADA"
 
+# Usuario con el que se guarda la sesión persistida (ver Core/sesiones.py)
+USUARIO_SESION = SURA_ARL_USUARIO_LOGIN
+
+# Cuenta las barras de progreso del modal de carga y cuántas ya llegaron al 100%.
+_JS_ESTADO_SUBIDA = r"""() => {
+    const getBars = () => {
+        let list = Array.from(document.querySelectorAll('ngb-modal-window .progress-bar, ngb-modal-window [role="progressbar"], ngb-modal-window ngb-progressbar .progress-bar'));
+        if (list.length === 0) {
+            list = Array.from(document.querySelectorAll('ngb-modal-window *')).filter(el => {
+                const width = el.style.width || '';
+                if (!width.endsWith('%')) return false;
+                const className = (el.className || '').toString().toLowerCase();
+                const parentClassName = el.parentElement ? (el.parentElement.className || '').toString().toLowerCase() : '';
+                return className.includes('progress') || 
+                       className.includes('bar') || 
+                       parentClassName.includes('progress') || 
+                       parentClassName.includes('bar') ||
+                       className.includes('upload') ||
+                       parentClassName.includes('upload');
+            });
+        }
+        return list;
+    };
+    
+    const bars = getBars();
+    if (bars.length === 0) {
+        return { count: 0, finished: 0, pending: 0 };
+    }
+    
+    let finished = 0;
+    let pending = 0;
+    
+    bars.forEach(bar => {
+        const widthStr = bar.style.width || '';
+        const widthMatch = widthStr.match(/(\d+(?:\.\d+)?)\s*%/);
+        const ariaNow = parseFloat(bar.getAttribute('aria-valuenow') || '-1');
+        const ariaMax = parseFloat(bar.getAttribute('aria-valuemax') || '100');
+        
+        let isFinished = false;
+        if (widthMatch) {
+            const val = parseFloat(widthMatch[1]);
+            if (val >= 99.9) {
+                isFinished = true;
+            }
+        } else if (ariaNow >= 0 && ariaNow === ariaMax) {
+            isFinished = true;
+        }
+        
+        if (isFinished) {
+            finished++;
+        } else {
+            pending++;
+        }
+    });
+    
+    return { count: bars.length, finished, pending };
+}"""
+
 def dispatch_mouse_events(page: Page, selector: str):
     """Simula eventos de mouse completos (mousedown, mouseup, click) en un elemento."""
     page.eval_on_selector(selector, """el => {
@@ -29,6 +90,48 @@ def dispatch_mouse_events(page: Page, selector: str):
         });
     }""")
 
+def digitar_clave_teclado_virtual(page: Page, clave: str, logs: list):
+    """
+    Digita la clave en el teclado virtual del login. El teclado pierde teclas si se
+    pulsa demasiado rápido: si el campo no queda con la longitud esperada, se
+    reintenta con una pausa adaptativa entre teclas.
+    """
+    ritmo = obtener_ritmo(SURA_ARL_ID)
+    password_input = page.locator("input[name='suraPassword']")
+    max_intentos = 3
+    for intento in range(1, max_intentos + 1):
+        # Asegurar foco y clic en contraseña para habilitar el teclado
+        password_input.click()
+        logs.append("  - Clic en campo de contraseña para desplegar teclado virtual.")
+
+        # Esperar a que el teclado virtual esté visible en el DOM
+        page.wait_for_selector(".ui-keyboard", timeout=5000)
+        esperar_dom_estable(page, quietud_ms=200, timeout_ms=1500, selector=".ui-keyboard")
+
+        for digito in clave:
+            # Buscar el botón por el atributo data-value del dígito
+            selector_tecla = f"button.ui-keyboard-button[data-value='{digito}']"
+            page.wait_for_selector(selector_tecla, timeout=3000)
+            dispatch_mouse_events(page, selector_tecla)
+            logs.append(f"    - Tecla {digito} presionada.")
+            ritmo.pausa(page, "teclado_virtual")
+
+        # Click en el botón de aceptar del teclado (chulo/✔) usando eventos de mouse completos
+        page.wait_for_selector("button.ui-keyboard-accept", timeout=3000)
+        dispatch_mouse_events(page, "button.ui-keyboard-accept")
+        logs.append("  - Aceptar (✔) teclado virtual presionado.")
+        esperar_oculto(page.locator(".ui-keyboard"), timeout_ms=3000)
+
+        if len(password_input.input_value()) == len(clave):
+            ritmo.registrar_exito("teclado_virtual")
+            return
+        if intento == max_intentos:
+            logs.append("  - ADVERTENCIA: No se pudo confirmar la longitud de la clave. Se intentará iniciar sesión igualmente.")
+            return
+        nueva_pausa = ritmo.registrar_fallo("teclado_virtual")
+        logs.append(f"  - El teclado virtual perdió teclas. Reintentando con pausa de {nueva_pausa} ms entre teclas...")
+        password_input.evaluate("el => { el.value = ''; }")
+
 def login(page: Page) -> tuple[bool, str]:
     """Realiza el login en SURA ARL usando Playwright con lógica ultra-robusta de eventos."""
     logs = ["Iniciando login en SURA ARL con Playwright..."]
@@ -48,8 +151,8 @@ def login(page: Page) -> tuple[bool, str]:
         }""")
         logs.append("  - Tipo Identificación: CEDULA seleccionado y eventos disparados.")
 
-        # Esperar un momento a que termine cualquier postback/recarga de ASP.NET tras cambiar el tipo de identificación
-        time.sleep(2)
+        # Esperar a que termine cualquier postback/recarga de ASP.NET tras cambiar el tipo de identificación
+        esperar_dom_estable(page, quietud_ms=500, timeout_ms=3000)
         page.wait_for_selector("#suraName", timeout=10000)
         
         # Verificar si se deseleccionó y re-seleccionar si es necesario
@@ -61,35 +164,14 @@ def login(page: Page) -> tuple[bool, str]:
                 el.dispatchEvent(new Event('change', { bubbles: true }));
                 el.dispatchEvent(new Event('input', { bubbles: true }));
             }""")
-            time.sleep(1)
+            esperar_dom_estable(page, quietud_ms=500, timeout_ms=3000)
 
-        page.locator("#suraName").fill("1005911366")
+        page.locator("#suraName").fill(SURA_ARL_USUARIO_LOGIN)
         logs.append("  - Cédula ingresada.")
 
-        # Asegurar foco y clic en contraseña para habilitar el teclado
-        password_input = page.locator("input[name='suraPassword']")
-        password_input.click()
-        logs.append("  - Clic en campo de contraseña para desplegar teclado virtual.")
-
-        # Esperar a que el teclado virtual esté visible en el DOM
-        page.wait_for_selector(".ui-keyboard", timeout=5000)
-        time.sleep(1)
-
         # Clave: 2026
         clave = "2026"
-        for digito in clave:
-            # Buscar el botón por el atributo data-value del dígito
-            selector_tecla = f"button.ui-keyboard-button[data-value='{digito}']"
-            page.wait_for_selector(selector_tecla, timeout=3000)
-            dispatch_mouse_events(page, selector_tecla)
-            logs.append(f"    - Tecla {digito} presionada.")
-            time.sleep(0.3)
-
-        # Click en el botón de aceptar del teclado (chulo/✔) usando eventos de mouse completos
-        page.wait_for_selector("button.ui-keyboard-accept", timeout=3000)
-        dispatch_mouse_events(page, "button.ui-keyboard-accept")
-        logs.append("  - Aceptar (✔) teclado virtual presionado.")
-        time.sleep(0.5)
+        digitar_clave_teclado_virtual(page, clave, logs)
 
         # Verificar por última vez el select antes de enviar
         current_type = page.eval_on_selector("#ctl00_ContentMain_suraType", "el => el.value")
@@ -100,7 +182,7 @@ def login(page: Page) -> tuple[bool, str]:
                 el.dispatchEvent(new Event('change', { bubbles: true }));
                 el.dispatchEvent(new Event('input', { bubbles: true }));
             }""")
-            time.sleep(1)
+            esperar_dom_estable(page, quietud_ms=500, timeout_ms=3000)
 
         # Iniciar sesión
         page.locator("#session-internet").click()
@@ -116,6 +198,18 @@ def login(page: Page) -> tuple[bool, str]:
         traceback.print_exc()
         return False, "\n".join(logs)
 
+def verificar_sesion(page: Page) -> tuple[bool, str]:
+    """Comprueba si la sesión SSO restaurada salta el teclado virtual y llega a 'Ingresar'."""
+    logs = ["Verificando sesión guardada de SURA ARL..."]
+    try:
+        page.goto(SURA_ARL_LOGIN_URL, timeout=60000)
+        page.wait_for_selector("button:has-text('Ingresar')", timeout=10000)
+        logs.append("Sesión vigente. Se omite el login con teclado virtual.")
+        return True, "\n".join(logs)
+    except Exception:
+        logs.append("Sesión expirada o inválida. Se hará login completo.")
+        return False, "\n".join(logs)
+
 def navegar_a_inicio(page: Page) -> tuple[bool, str]:
     """Navega a la sección de radicación de glosas abriendo la pestaña correspondiente."""
     logs = ["Navegando a la sección de Radicación de Glosas..."]
@@ -299,7 +393,7 @@ def limpiar_pantalla_y_modales(sura_page: Page, logs: list):
         while confirm_btn.is_visible():
             logs.append("    - Cerrando alerta SweetAlert...")
             confirm_btn.first.click(timeout=3000)
-            time.sleep(1)
+            esperar_oculto(confirm_btn, timeout_ms=3000)
     except Exception:
         pass
         
@@ -316,19 +410,19 @@ def limpiar_pantalla_y_modales(sura_page: Page, logs: list):
             cerrar_btn = modal.locator("button:has-text('Cerrar')")
             if cerrar_btn.is_visible():
                 cerrar_btn.click(timeout=3000)
-                time.sleep(1)
+                esperar_oculto(modal, timeout_ms=3000)
                 continue
                 
             # Si no hay botón 'Cerrar', intentar con el botón de la equis (close icon)
             x_btn = modal.locator("button.close, button[aria-label='Close']")
             if x_btn.is_visible():
                 x_btn.click(timeout=3000)
-                time.sleep(1)
+                esperar_oculto(modal, timeout_ms=3000)
                 continue
                 
             # Si nada de eso funciona, presionar Escape
             sura_page.keyboard.press("Escape")
-            time.sleep(1)
+            esperar_oculto(modal, timeout_ms=1000)
             
             # Evitar bucle infinito si no se cierra, forzando eliminación vía DOM
             if modal.is_visible():
@@ -368,28 +462,52 @@ def obtener_codigo_factura_corregido(subfolder_path: Path, current_code: str) ->
                     return candidate
     return None
 
-def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context: str = 'default') -> tuple[str, str, str, str]:
-    """Procesa una factura/carpeta en el radicador de SURA ARL."""
-    logs = [f"--- Iniciando Playwright/SURA ARL para: '{folder_name}' ---"]
+def preparar_carpeta(subfolder_path: Path, folder_name: str, context: str = 'default') -> tuple[str | None, str, None, str]:
+    """
+    Etapa local (sin navegador): verificaciones previas, compresión y limpieza de los PDFs.
+    Puede ejecutarse en otro hilo mientras el navegador trabaja en otra carpeta.
+
+    Returns:
+        (estado, codigo_factura, None, log). 'estado' es None si la carpeta quedó lista.
+    """
+    logs = []
     codigo_factura = folder_name.upper()
-    radicado = ""
-    
+
     # 1. Verificaciones previas de nombre y RAD.pdf
     if any(p in folder_name.upper() for p in PALABRAS_EXCLUSION_CARPETAS) or (subfolder_path / "RAD.pdf").is_file():
         msg = "OMITIENDO: Carpeta excluida por nombre o ya radicada (RAD.pdf existe)."
         logs.append(msg)
-        return ESTADO_OMITIDO_RADICADO, "", codigo_factura, "\n".join(logs)
+        return ESTADO_OMITIDO_RADICADO, codigo_factura, None, "\n".join(logs)
 
     # Limpiar y comprimir PDFs antes de procesar
     for f in subfolder_path.iterdir():
         if f.is_file() and f.suffix.upper() == ".PDF" and f.name.upper() != "RAD.PDF" and not f.name.upper().endswith("_ORIGINAL.PDF"):
-            comprimir_pdf(f, logs)
-            limpiar_archivo_malicioso(f, logs)
+            with tramo("compresion"):
+                comprimir_pdf(f, logs)
+            with tramo("sanitizacion"):
+                limpiar_archivo_malicioso(f, logs)
+
+    return None, codigo_factura, None, "\n".join(logs)
+
+def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context: str = 'default', preparacion=None) -> tuple[str, str, str, str]:
+    """Procesa una factura/carpeta en el radicador de SURA ARL."""
+    logs = [f"--- Iniciando Playwright/SURA ARL para: '{folder_name}' ---"]
+    radicado = ""
+
+    if preparacion is None:
+        preparacion = preparar_carpeta(subfolder_path, folder_name, context)
+    estado_prep, codigo_factura, _, prep_log = preparacion
+    if prep_log:
+        logs.append(prep_log)
+    if estado_prep is not None:
+        return estado_prep, "", codigo_factura, "\n".join(logs)
 
     # Obtener la página del radicador que guardamos en navegar_a_inicio
     sura_page = getattr(page, 'sura_page', page)
+    fases = FasesSecuenciales()
 
     try:
+        fases.iniciar("busqueda_portal")
         # Esperar a que se oculte cualquier overlay previo de carga
         esperar_overlay_oculto(sura_page)
         
@@ -398,8 +516,8 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
         sura_page.locator("button.btn.btn-primary.rounded-pill").click()
         logs.append(f"  - Buscando factura {codigo_factura}...")
 
-        # Dar tiempo a que se muestre el overlay de búsqueda y esperar a que se oculte
-        time.sleep(0.5)
+        # Esperar a que el portal reaccione a la búsqueda (aparece el overlay) y a que se oculte
+        esperar_mutacion(sura_page, timeout_ms=500)
         esperar_overlay_oculto(sura_page)
 
         # Esperar a que cargue algún resultado (puede ser el botón de detalles o el de respuestas)
@@ -412,7 +530,7 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
                 logs.append(f"  - Factura {codigo_factura} no encontrada. Reintentando con código corregido {codigo_corregido}...")
                 sura_page.locator("input[placeholder='Ingresa número de factura']").fill(codigo_corregido)
                 sura_page.locator("button.btn.btn-primary.rounded-pill").click()
-                time.sleep(0.5)
+                esperar_mutacion(sura_page, timeout_ms=500)
                 esperar_overlay_oculto(sura_page)
                 try:
                     sura_page.wait_for_selector("input[name='detalle']", timeout=10000)
@@ -427,16 +545,19 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
         # Esperar a que desaparezca cualquier overlay antes de interactuar con los resultados
         esperar_overlay_oculto(sura_page)
 
+        fases.iniciar("verificacion_estado")
         # 3. Comprobar si el botón de cargar soportes (Respuesta / btnRes) está visible
         btn_res = sura_page.locator("input.btnRes[title='Cargar soportes de respuesta glosa']").first
         
         if not btn_res.is_visible():
             logs.append("  - Factura ya radicada anteriormente (Botón de cargar soportes no visible).")
             logs.append("  - Extrayendo evidencia desde Ver Detalles...")
+            fases.iniciar("evidencia")
             
             # Clic en el botón "Ver detalles de factura"
             sura_page.locator("input[name='detalle']").first.click()
-            time.sleep(2)
+            esperar_primero({"modal": sura_page.locator("ngb-modal-window")}, timeout_ms=5000)
+            esperar_dom_estable(sura_page, quietud_ms=300, timeout_ms=2000)
             
             # Tomar captura de pantalla de los detalles
             screenshot_path = subfolder_path / "temp_detalles.png"
@@ -458,11 +579,12 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
             except PlaywrightTimeoutError:
                 # Fallback: presionar tecla Escape si el botón no responde
                 sura_page.keyboard.press("Escape")
-            time.sleep(1)
+            esperar_oculto(sura_page.locator("ngb-modal-window"), timeout_ms=3000)
             
             return ESTADO_OMITIDO_RADICADO, "Ya Radicada", codigo_factura, "\n".join(logs)
 
         # 4. Flujo de Radicación (si btn_res está visible)
+        fases.iniciar("subida")
         esperar_overlay_oculto(sura_page)
         
         # Clic en el botón "Cargar soportes de respuesta glosa" (btnRes)
@@ -546,7 +668,8 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
         # Subir el directorio completo directamente ya que el input tiene webkitdirectory=true
         input_file.set_input_files(str(subfolder_path.resolve()))
         logs.append(f"  - Subiendo directorio completo: {subfolder_path.name}...")
-        time.sleep(3)
+        # El modal lista los archivos en cuanto Angular procesa la carga
+        esperar_mutacion(sura_page, "ngb-modal-window", timeout_ms=3000)
 
         # Esperar a que se listen los archivos o aparezca SweetAlert
         try:
@@ -559,10 +682,10 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
                 
                 # Cerrar SweetAlert
                 sura_page.locator("button.swal2-confirm:has-text('OK')").click()
-                time.sleep(1)
+                esperar_oculto(sura_page.locator("div.swal2-icon-error"), timeout_ms=3000)
                 # Cerrar modal de carga
                 sura_page.locator("button:has-text('Cerrar')").click()
-                time.sleep(1)
+                esperar_oculto(sura_page.locator("ngb-modal-window"), timeout_ms=3000)
                 
                 # Guardar captura de pantalla del error para diagnóstico
                 error_screenshot_path = subfolder_path / "temp_error_screenshot.png"
@@ -651,7 +774,7 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
             
             if deleted_files:
                 logs.append(f"  - Archivos eliminados de la lista de subida por errores: {', '.join(deleted_files)}")
-                time.sleep(2)
+                esperar_dom_estable(sura_page, quietud_ms=300, timeout_ms=2000, selector="ngb-modal-window")
             else:
                 logs.append("  - ADVERTENCIA: Se detectó el indicador de archivos inválidos pero no se pudieron eliminar de manera automática.")
                 
@@ -664,90 +787,29 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
                 return ESTADO_FALLO, "Archivos invalidos en lista", codigo_factura, "\n".join(logs)
 
         # --- ESPERAR CARGA COMPLETA DE ARCHIVOS (PROGRESS BARS) ---
+        # El navegador evalúa las barras en cada cuadro: la espera termina en cuanto la última llega al 100%.
         logs.append("  - Esperando que los archivos terminen de cargarse en el portal...")
-        t_inicio_carga = time.time()
-        timeout_carga = 180  # 3 minutos máximo para subir todos los archivos
-        carga_completa = False
-        
-        while time.time() - t_inicio_carga < timeout_carga:
-            estado = sura_page.evaluate(r"""() => {
-                const getBars = () => {
-                    let list = Array.from(document.querySelectorAll('ngb-modal-window .progress-bar, ngb-modal-window [role="progressbar"], ngb-modal-window ngb-progressbar .progress-bar'));
-                    if (list.length === 0) {
-                        list = Array.from(document.querySelectorAll('ngb-modal-window *')).filter(el => {
-                            const width = el.style.width || '';
-                            if (!width.endsWith('%')) return false;
-                            const className = (el.className || '').toString().toLowerCase();
-                            const parentClassName = el.parentElement ? (el.parentElement.className || '').toString().toLowerCase() : '';
-                            return className.includes('progress') || 
-                                   className.includes('bar') || 
-                                   parentClassName.includes('progress') || 
-                                   parentClassName.includes('bar') ||
-                                   className.includes('upload') ||
-                                   parentClassName.includes('upload');
-                        });
-                    }
-                    return list;
-                };
-                
-                const bars = getBars();
-                if (bars.length === 0) {
-                    return { count: 0, finished: 0, pending: 0 };
-                }
-                
-                let finished = 0;
-                let pending = 0;
-                
-                bars.forEach(bar => {
-                    const widthStr = bar.style.width || '';
-                    const widthMatch = widthStr.match(/(\d+(?:\.\d+)?)\s*%/);
-                    const ariaNow = parseFloat(bar.getAttribute('aria-valuenow') || '-1');
-                    const ariaMax = parseFloat(bar.getAttribute('aria-valuemax') || '100');
-                    
-                    let isFinished = false;
-                    if (widthMatch) {
-                        const val = parseFloat(widthMatch[1]);
-                        if (val >= 99.9) {
-                            isFinished = true;
-                        }
-                    } else if (ariaNow >= 0 && ariaNow === ariaMax) {
-                        isFinished = true;
-                    }
-                    
-                    if (isFinished) {
-                        finished++;
-                    } else {
-                        pending++;
-                    }
-                });
-                
-                return { count: bars.length, finished, pending };
-            }""")
-            
-            count = estado['count']
-            finished = estado['finished']
-            pending = estado['pending']
-            
-            if count > 0:
-                logs.append(f"    - Estado de subida: {finished}/{count} archivos listos (pendientes: {pending}).")
-                if pending == 0:
-                    logs.append("    - Todos los archivos se han cargado exitosamente.")
-                    carga_completa = True
-                    break
+        timeout_carga = 180000  # 3 minutos máximo para subir todos los archivos
+        hay_barras = esperar_condicion(sura_page, f"() => ({_JS_ESTADO_SUBIDA})().count > 0", timeout_ms=8000)
+        if not hay_barras:
+            logs.append("    - No se detectaron barras de progreso activas. Continuando...")
+        else:
+            estado = esperar_condicion(
+                sura_page,
+                f"() => {{ const e = ({_JS_ESTADO_SUBIDA})(); return e.count > 0 && e.pending === 0 ? e : false; }}",
+                timeout_ms=timeout_carga,
+                polling=250,  # la subida tarda minutos: no hace falta revisar en cada cuadro
+            )
+            if estado:
+                logs.append(f"    - Estado de subida: {estado['finished']}/{estado['count']} archivos listos (pendientes: 0).")
+                logs.append("    - Todos los archivos se han cargado exitosamente.")
             else:
-                if time.time() - t_inicio_carga > 8:
-                    logs.append("    - No se detectaron barras de progreso activas. Continuando...")
-                    carga_completa = True
-                    break
-            
-            time.sleep(2)
-            
-        if not carga_completa:
-            logs.append("  -> ADVERTENCIA: Se alcanzó el tiempo límite de espera para la subida de archivos. Se intentará continuar.")
+                logs.append("  -> ADVERTENCIA: Se alcanzó el tiempo límite de espera para la subida de archivos. Se intentará continuar.")
 
+        fases.iniciar("confirmacion")
         # Hacer clic en "Siguiente" en el modal
         sura_page.locator("button.btn-outline-dark:has-text('Siguiente')").click()
-        time.sleep(1.5)
+        esperar_dom_estable(sura_page, quietud_ms=300, timeout_ms=1500, selector="ngb-modal-window")
  
         # Hacer clic en "Confirmar" en el modal
         sura_page.locator("button.btn-outline-dark:has-text('Confirmar')").click()
@@ -770,15 +832,7 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
         error_locator = sura_page.locator("ngb-modal-window:has-text('Atención'), ngb-modal-window:has-text('error al registrar')")
         
         logs.append("  - Esperando respuesta del registro...")
-        resultado_espera = None
-        for _ in range(60): # 60s max
-            if exito_locator.is_visible():
-                resultado_espera = "exito"
-                break
-            if error_locator.is_visible():
-                resultado_espera = "error"
-                break
-            time.sleep(1)
+        resultado_espera = esperar_primero({"exito": exito_locator, "error": error_locator}, timeout_ms=60000)
             
         if resultado_espera == "exito":
             texto_radicado = sura_page.locator(".swal2-html-container").inner_text()
@@ -790,6 +844,7 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
                 radicado = "Desconocido"
                 logs.append(f"  - Registro exitoso. No se pudo extraer número de radicado del texto: '{texto_radicado}'")
 
+            fases.iniciar("evidencia")
             # Tomar captura de pantalla del SweetAlert exitoso
             screenshot_path = subfolder_path / "temp_rad_screenshot.png"
             sura_page.screenshot(path=str(screenshot_path))
@@ -834,6 +889,7 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
             return ESTADO_FALLO, "Timeout Registro", codigo_factura, "\n".join(logs)
 
     except Exception as e:
+        fases.cerrar(ok=False)
         error_msg = f"ERROR procesando la carpeta: {e}"
         logs.append(error_msg)
         try:
@@ -845,4 +901,6 @@ def procesar_carpeta(page: Page, subfolder_path: Path, folder_name: str, context
         traceback.print_exc()
         return ESTADO_FALLO, "", codigo_factura, "\n".join(logs)
     finally:
+        fases.iniciar("limpieza")
         limpiar_pantalla_y_modales(sura_page, logs)
+        fases.cerrar()
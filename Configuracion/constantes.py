@@ -182,6 +182,7 @@ GRUPO_SIS_NOMBRE = "Grupo SIS"
 SURA_ARL_ID = "sura_arl"
 SURA_ARL_NOMBRE = "SURA ARL"
 SURA_ARL_LOGIN_URL = "https://login.sura.com/sso/servicelogin.aspx?continueTo=https%3A%2F%2Fwww.arlsura.com%2Fcomponent%2Farl_login&service=arpsura"
+SURA_ARL_USUARIO_LOGIN = "1005911366"
 
 
 # ==============================================================================
@@ -190,14 +191,172 @@ SURA_ARL_LOGIN_URL = "https://login.sura.com/sso/servicelogin.aspx?continueTo=ht
 
 # --- Configuración del Lector de Correos (Email Listener) ---
 EMAIL_IMAP_SERVER = "imap.gmail.com"
+EMAIL_IMAP_PUERTO = 993
+EMAIL_IMAP_SSL = True  # False solo para el servidor local de pruebas (Core/servidor_imap_prueba.py)
 EMAIL_USER_ADDRESS = "radicacionglosa@asotrauma.com.co"
 EMAIL_APP_PASSWORD = "mlmk qmln ywim yyax"  # Contraseña de aplicación
 EMAIL_PROCESSED_FOLDER = "Procesados"
 EMAIL_SEARCH_RETRIES = 60
 EMAIL_SEARCH_DELAY_SECONDS = 15
+# Con IDLE el servidor avisa cuando llega un correo; el listener solo busca al recibir el aviso.
+# Cada IDLE se renueva tras este tiempo (Gmail corta a los 29 min) y de paso se repasan los
+# pendientes por si se perdió algún aviso. Sin IDLE se busca cada EMAIL_SEARCH_DELAY_SECONDS.
+EMAIL_IDLE_RENOVAR_SEGUNDOS = 120
+# Correos nuevos por cada FETCH de cabeceras/BODYSTRUCTURE, y tamaño de cada bloque al
+# descargar un adjunto (se piden por partes para no cargar PDFs grandes completos en memoria).
+EMAIL_LOTE_FETCH = 100
+EMAIL_BLOQUE_DESCARGA_BYTES = 1024 * 1024
+# Conexiones IMAP extra que descargan adjuntos en paralelo mientras la conexión principal
+# vigila el buzón (0 = todo por la conexión principal). Gmail admite hasta 15 por cuenta.
+EMAIL_CONEXIONES_DESCARGA = 3
+# Cada conexión envía un NOOP tras este tiempo sin uso para que el servidor no la cierre.
+EMAIL_NOOP_SEGUNDOS = 240
+# Servicio de correo: los radicados exitosos se anotan en una tabla persistente (carpeta Datos)
+# y un listener en segundo plano adjunta los PDFs aunque lleguen horas después o la aplicación
+# se reinicie. La ejecución web ya no espera al correo. Con False se usa el listener por ejecución.
+EMAIL_MODO_SERVICIO = True
+EMAIL_ARCHIVO_PENDIENTES = "correos_pendientes.sqlite3"
+# Tiempo máximo que el servicio espera el correo de un radicado antes de descartarlo.
+EMAIL_SERVICIO_ESPERA_MAXIMA_HORAS = 72
 # Remitente específico del que se esperan correos para asociar con la automatización.
 AXASOAT_EMAIL_SENDER = "notificaciones@claimonline.com.co"
 
+# --- Configuración de Contextos de Navegador en Paralelo ---
+# Cantidad de sesiones (cada una con su login) que procesan carpetas a la vez.
+# Solo subir este valor en portales que toleren sesiones concurrentes del mismo usuario.
+CONTEXTOS_NAVEGADOR_POR_DEFECTO = 1
+CONTEXTOS_NAVEGADOR_POR_ASEGURADORA = {
+    PREVISORA_ID: 1,
+    AXASOAT_ID: 1,
+    SURA_ARL_ID: 1,
+}
+
+# --- Ritmo Adaptativo de Acciones (reemplaza el slow_mo global) ---
+# Pausa inicial en ms por portal y paso. Todo arranca en 0: la pausa solo crece cuando
+# el módulo reporta que ese paso falló, y baja de nuevo tras varios éxitos seguidos.
+RITMO_POR_PORTAL = {
+    PREVISORA_ID: {"ciudad_dropdown": 0},
+    SURA_ARL_ID: {"teclado_virtual": 0},
+}
+RITMO_INCREMENTO_MS = 150
+RITMO_MAXIMO_MS = 1500
+RITMO_EXITOS_PARA_REDUCIR = 10
+
+# --- Preparación Anticipada de Carpetas ---
+# Hilos que ejecutan preparar_carpeta (búsqueda, validación, compresión y limpieza de PDFs)
+# por adelantado mientras el navegador trabaja. PyMuPDF y la E/S de disco avanzan en
+# paralelo con las esperas de red de Playwright.
+HILOS_PREPARACION_CARPETAS = 2
+
+# --- Bitácora de Trabajos (Reanudar Ejecuciones Interrumpidas) ---
+# Archivo JSONL que run_automation escribe en la carpeta contenedora tras cada carpeta.
+ARCHIVO_BITACORA_AUTOMATIZACION = "bitacora_automatizacion.jsonl"
+
+# --- Línea de Tiempo de la Ejecución ---
+# Tramos por fase y carpeta (JSONL) y resumen por portal y fase (CSV), junto a resultados_automatizacion.json.
+ARCHIVO_LINEA_TIEMPO = "linea_tiempo_automatizacion.jsonl"
+ARCHIVO_RESUMEN_LINEA_TIEMPO = "linea_tiempo_resumen.csv"
+
+# --- Filtro de Recursos de los Portales ---
+# Solo los portales listados instalan el filtro (Playwright desactiva la caché HTTP del
+# contexto cuando hay rutas activas). Las imágenes propias del portal no se bloquean:
+# las capturas de confirmación se guardan como soporte del radicado.
+#   tipos_bloqueados:          tipos de recurso abortados en cualquier host.
+#   tipos_bloqueados_terceros: abortados solo si el host no es de 'dominios_propios'.
+#   hosts_bloqueados:          hosts adicionales a FILTRO_HOSTS_BLOQUEADOS.
+FILTRO_RECURSOS_ACTIVO = True
+FILTRO_RECURSOS_POR_PORTAL = {
+    PREVISORA_ID: {
+        "dominios_propios": ["consorcioprevisora.com"],
+        "tipos_bloqueados": ["media"],
+        "tipos_bloqueados_terceros": ["image", "font"],
+        "hosts_bloqueados": [],
+    },
+    AXASOAT_ID: {
+        "dominios_propios": ["claimonline.com.co"],
+        "tipos_bloqueados": ["media", "font"],
+        "tipos_bloqueados_terceros": ["image"],
+        "hosts_bloqueados": [],
+    },
+    SURA_ARL_ID: {
+        "dominios_propios": ["sura.com", "arlsura.com"],
+        "tipos_bloqueados": ["media"],
+        "tipos_bloqueados_terceros": ["image", "font"],
+        "hosts_bloqueados": [],
+    },
+}
+# La ruta solo se registra para las URL que pueden bloquearse (hosts bloqueados y las
+# extensiones de los tipos bloqueados), así el documento, los XHR y los scripts del
+# portal no pasan por Python. Un tipo sin extensiones aquí obliga a revisar todo.
+FILTRO_EXTENSIONES_POR_TIPO = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp", "avif"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "ogg", "ogv", "mp3", "wav", "m4a", "mov", "avi"],
+}
+# Analítica, publicidad y widgets de chat: nunca son necesarios para radicar.
+FILTRO_HOSTS_BLOQUEADOS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "clarity.ms", "nr-data.net",
+    "newrelic.com", "tawk.to", "zdassets.com", "zopim.com", "livechatinc.com",
+    "intercom.io", "crisp.chat", "youtube.com", "ytimg.com",
+]
+# Tamaño promedio estimado por tipo de recurso, para reportar los bytes ahorrados
+# (una solicitud abortada nunca se descarga, así que su tamaño real no se conoce).
+FILTRO_BYTES_ESTIMADOS_POR_TIPO = {
+    "image": 35_000,
+    "font": 45_000,
+    "media": 250_000,
+    "script": 60_000,
+    "stylesheet": 20_000,
+}
+FILTRO_BYTES_ESTIMADOS_OTROS = 5_000
+
+# --- Cliente de la API de GEMA (Core/api_gema.py) ---
+# Sesión HTTP compartida: reutiliza las conexiones TCP/TLS del túnel ngrok entre consultas.
+GEMA_CONEXIONES_POR_HOST = 10
+GEMA_TIMEOUT_CONEXION_SEGUNDOS = 5
+GEMA_TIMEOUT_LECTURA_SEGUNDOS = 20
+# Reintentos ante timeouts, errores de conexión y respuestas 5xx, con espera exponencial
+# y aleatoria (base * 2^intento, hasta el máximo) para no reintentar todos a la vez.
+GEMA_REINTENTOS = 3
+GEMA_ESPERA_BASE_SEGUNDOS = 0.5
+GEMA_ESPERA_MAXIMA_SEGUNDOS = 8
+# Consultas por lotes (varias facturas o gl_docn en una sola petición): cada lote se parte
+# para que la URL no pase de este largo (los proxys suelen cortar cerca de 8 KB) ni
+# lleve más de GEMA_VALORES_POR_CONSULTA valores en sus listas IN.
+GEMA_LARGO_MAXIMO_URL = 6000
+GEMA_VALORES_POR_CONSULTA = 200
+# Tope global de peticiones simultáneas a GEMA (todas las hebras del proceso juntas) y
+# hilos por defecto de map_queries. No subirlo sin revisar la carga del servidor.
+GEMA_CONSULTAS_SIMULTANEAS = 4
+# Caché en disco de las respuestas (Core/cache_gema.py, en la carpeta 'Datos'). Cada
+# consulta vence según la tabla más volátil que toque: glo_cab casi no cambia, el
+# estatus de glo_det sí. '--sin-cache-gema' en la CLI la omite para una corrida.
+GEMA_CACHE_ACTIVO = True
+GEMA_ARCHIVO_CACHE = "cache_gema.sqlite3"
+GEMA_CACHE_TTL_SEGUNDOS = {
+    "glo_cab": 24 * 3600,
+    "glo_red": 6 * 3600,
+    "glo_det": 10 * 60,
+}
+GEMA_CACHE_TTL_POR_DEFECTO_SEGUNDOS = 10 * 60
+GEMA_CACHE_MAX_MB = 200
+# Memo en memoria: un SQL repetido dentro de este lapso se responde sin salir del proceso
+# (ni siquiera a la caché en disco). Las consultas idénticas en curso siempre se comparten.
+GEMA_MEMO_SEGUNDOS = 60
+GEMA_MEMO_MAX_ENTRADAS = 500
+# Lectura por páginas (iterar_api_gema) para resultados grandes, como todo glo_red de una
+# cuenta. GEMA es FoxPro (sin LIMIT/OFFSET): cada página es 'TOP n ... ORDER BY clave'
+# con la condición 'clave > última clave leída'.
+GEMA_FILAS_POR_PAGINA = 1000
+# Instantánea local (Core/instantanea_gema.py, en la carpeta 'Datos'). Con el modo sin
+# conexión activo (aquí o con '--gema-sin-conexion' en la CLI) query_api_gema responde
+# desde ese archivo en lugar de ir al túnel. El formato de fecha se usa al crearla por
+# rango de gl_fecha; por defecto es el literal de fecha estricto de FoxPro ({^AAAA-MM-DD}).
+GEMA_MODO_SIN_CONEXION = False
+GEMA_ARCHIVO_INSTANTANEA = "instantanea_gema.sqlite3"
+GEMA_FORMATO_FECHA_SQL = "{{^{fecha}}}"
+
 # --- Configuración del Procesamiento de Carpetas ---
 # Carpetas que contengan estas palabras clave serán ignoradas por el automatizador.
 PALABRAS_EXCLUSION_CARPETAS = [
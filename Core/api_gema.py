@@ -1,57 +1,222 @@
-# Core/api_ggema.py
+# Core/api_gema.py
+
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import quote_plus
+try:
+    import orjson  # Opcional: decodifica el JSON varias veces más rápido que json
+except ImportError:
+    orjson = None
+
 from Configuracion.constantes import MUNDIAL_ESCOLAR_API_BASE_URL # Importamos desde constantes
+from Configuracion.constantes import (
+    GEMA_CONEXIONES_POR_HOST,
+    GEMA_TIMEOUT_CONEXION_SEGUNDOS,
+    GEMA_TIMEOUT_LECTURA_SEGUNDOS,
+    GEMA_REINTENTOS,
+    GEMA_ESPERA_BASE_SEGUNDOS,
+    GEMA_ESPERA_MAXIMA_SEGUNDOS,
+    GEMA_LARGO_MAXIMO_URL,
+    GEMA_VALORES_POR_CONSULTA,
+    GEMA_CONSULTAS_SIMULTANEAS,
+    GEMA_CACHE_ACTIVO,
+    GEMA_MEMO_SEGUNDOS,
+    GEMA_MEMO_MAX_ENTRADAS,
+    GEMA_FILAS_POR_PAGINA,
+    GEMA_MODO_SIN_CONEXION,
+)
+from .cache_gema import CacheGema, normalizar_sql
 
 # Nota: Deberás añadir la URL base de tu API a tu archivo de constantes.
 # En Configuracion/constantes.py, añade:
 # MUNDIAL_ESCOLAR_API_BASE_URL = 'https://tu_dominio.ngrok.app/api-busqueda-gema/public/api'
 
 
-def query_api_gema(sql_query: str) -> list:
+# --- Sesión HTTP compartida ---
+# Una sola sesión por proceso: las consultas seguidas reutilizan la conexión TCP/TLS
+# con el túnel ngrok (keep-alive) en vez de pagar DNS + TCP + TLS cada vez.
+_sesion = None
+_lock_sesion = threading.Lock()
+# Tope de peticiones en vuelo para todo el proceso, sin importar cuántos hilos consulten
+_limite_global = threading.BoundedSemaphore(GEMA_CONSULTAS_SIMULTANEAS)
+
+
+def _obtener_sesion() -> requests.Session:
+    global _sesion
+    with _lock_sesion:
+        if _sesion is None:
+            sesion = requests.Session()
+            # Los reintentos se hacen en _get_con_reintentos, con espera aleatoria
+            adaptador = HTTPAdapter(
+                pool_connections=1, pool_maxsize=max(GEMA_CONEXIONES_POR_HOST, GEMA_CONSULTAS_SIMULTANEAS), max_retries=0
+            )
+            sesion.mount("https://", adaptador)
+            sesion.mount("http://", adaptador)
+            _sesion = sesion
+        return _sesion
+
+
+# --- Caché en disco (Core/cache_gema.py) ---
+_cache = None
+_cache_activa = GEMA_CACHE_ACTIVO
+_lock_cache = threading.Lock()
+
+
+def configurar_cache_gema(activa: bool):
+    """Activa o desactiva la caché para todo el proceso (por ejemplo, '--sin-cache-gema')."""
+    global _cache_activa
+    _cache_activa = activa
+
+
+def _obtener_cache() -> CacheGema | None:
+    """Caché compartida, creada al primer uso. Si el archivo no se puede abrir se sigue sin caché."""
+    global _cache, _cache_activa
+    with _lock_cache:
+        if _cache is None and _cache_activa:
+            try:
+                _cache = CacheGema()
+            except (sqlite3.Error, OSError):
+                _cache_activa = False
+        return _cache if _cache_activa else None
+
+
+# --- Modo sin conexión (Core/instantanea_gema.py) ---
+_instantanea = None
+_sin_conexion = GEMA_MODO_SIN_CONEXION
+_ruta_instantanea = None
+
+
+def configurar_modo_sin_conexion(activo: bool, ruta=None):
     """
-    Ejecuta una consulta SQL contra la API de GEMA y devuelve los resultados.
-    
-    Esta es una función de producción robusta que:
-    1. Codifica la consulta SQL para que sea segura en la URL.
-    2. Realiza la petición GET con timeouts adecuados.
-    3. Valida códigos de estado HTTP.
-    4. Valida que la respuesta sea un JSON válido.
-    5. Valida la estructura de la respuesta JSON de la API (status 'success' y clave 'data').
-    6. Lanza excepciones claras y específicas para cada tipo de error.
+    Con 'activo', todas las consultas se responden desde la instantánea local ('ruta' o
+    la de la carpeta 'Datos') sin tocar la red ni la caché en disco.
+    """
+    global _sin_conexion, _ruta_instantanea, _instantanea
+    with _lock_cache:
+        _sin_conexion = activo
+        _ruta_instantanea = ruta
+        _instantanea = None
+    with _lock_memo:
+        _memo.clear()  # Lo memorizado venía de la otra fuente
 
-    Args:
-        sql_query: La consulta SQL a ejecutar (sin la palabra "SELECT").
 
-    Returns:
-        Una lista de diccionarios, donde cada diccionario es una fila del resultado.
+def _obtener_instantanea():
+    global _instantanea
+    with _lock_cache:
+        if _instantanea is None:
+            from .instantanea_gema import InstantaneaGema
+            _instantanea = InstantaneaGema(_ruta_instantanea)
+        return _instantanea
 
-    Raises:
-        Exception: Si ocurre cualquier error de conexión, timeout, formato o lógico de la API.
+
+def resumen_cache_gema() -> str | None:
+    """Línea de aciertos/fallos de la caché y del memo en este proceso, para el log; None si no se usaron."""
+    cache = _cache
+    partes = []
+    if cache is not None and cache.aciertos + cache.fallos:
+        partes.append(cache.resumen())
+    if _contadores_memo["memo"] or _contadores_memo["compartidas"]:
+        partes.append(
+            f"[API GEMA] En memoria: {_contadores_memo['memo']} repetida(s), "
+            f"{_contadores_memo['compartidas']} compartida(s) con una consulta en curso."
+        )
+    return " ".join(partes) or None
+
+
+# --- Memo en proceso y coalescencia de consultas idénticas ---
+# Varias facturas con el mismo gl_docn, o varios hilos diagnosticando la misma factura,
+# generan el mismo SQL a la vez o seguido: se hace una sola petición y se reparte.
+_memo = OrderedDict()  # sql normalizado -> (instante, filas)
+_en_vuelo = {}  # (sql normalizado, usar_cache) -> Future de la petición en curso
+_contadores_memo = {"memo": 0, "compartidas": 0}
+_lock_memo = threading.Lock()
+
+
+def _copiar_filas(datos: list) -> list:
+    """Cada llamador recibe su propia lista y sus propios diccionarios (pueden modificarlos)."""
+    return [dict(fila) if isinstance(fila, dict) else fila for fila in datos]
+
+
+def _espera_reintento(intento: int) -> float:
+    """Espera exponencial con jitter completo: aleatoria entre 0 y base * 2^intento (acotada)."""
+    return random.uniform(0, min(GEMA_ESPERA_MAXIMA_SEGUNDOS, GEMA_ESPERA_BASE_SEGUNDOS * 2 ** intento))
+
+
+def _get_con_reintentos(url: str) -> requests.Response:
+    """
+    GET por la sesión compartida. Reintenta hasta GEMA_REINTENTOS veces ante timeouts,
+    errores de conexión y respuestas 5xx (típicas del túnel caído o saturado). Los
+    códigos 4xx no se reintentan. Tras el último intento se lanza la excepción original
+    o se devuelve la última respuesta.
+
+    Cada petición ocupa un cupo de GEMA_CONSULTAS_SIMULTANEAS; la espera entre
+    reintentos se hace sin cupo para no frenar a las demás consultas.
     """
+    for intento in range(GEMA_REINTENTOS + 1):
+        ultimo_intento = intento == GEMA_REINTENTOS
+        try:
+            with _limite_global:
+                response = _obtener_sesion().get(
+                    url, timeout=(GEMA_TIMEOUT_CONEXION_SEGUNDOS, GEMA_TIMEOUT_LECTURA_SEGUNDOS)
+                )
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if ultimo_intento:
+                raise
+        else:
+            if response.status_code < 500 or ultimo_intento:
+                return response
+        time.sleep(_espera_reintento(intento))
+
+
+def _url_consulta(sql_query: str) -> str:
+    return f"{MUNDIAL_ESCOLAR_API_BASE_URL}/select/?query={quote_plus(sql_query)}"
+
+
+def _consultar_api_gema(sql_query: str, usar_cache: bool) -> list:
+    """Instantánea, caché en disco y petición HTTP de query_api_gema, sin memo ni coalescencia."""
+    if _sin_conexion:
+        try:
+            return _obtener_instantanea().consultar(sql_query)
+        except FileNotFoundError as e:
+            raise ConnectionError(f"Modo sin conexión de GEMA: {e}")
+
+    cache = _obtener_cache()
+    if cache is not None and usar_cache:
+        try:
+            datos = cache.obtener(sql_query)
+            if datos is not None:
+                return datos
+        except (sqlite3.Error, ValueError):
+            pass  # Caché dañada u ocupada: se consulta al servidor
+
     try:
         # 1. Codificar la consulta y construir la URL completa
-        encoded_query = quote_plus(sql_query)
-        url = f"{MUNDIAL_ESCOLAR_API_BASE_URL}/select/?query={encoded_query}"
+        url = _url_consulta(sql_query)
 
-        # 2. Realizar la petición GET
-        # Se establece un timeout (conexión, lectura) como buena práctica.
-        response = requests.get(url, timeout=(5, 20)) # 5 seg para conectar, 20 seg para recibir respuesta
+        # 2. Realizar la petición GET (sesión compartida, timeouts y reintentos acotados)
+        response = _get_con_reintentos(url)
 
         # 3. Validar el código de estado HTTP (éxito si es 200)
         if response.status_code != 200:
             raise ConnectionError(f"Error en la respuesta del servidor API. Código: {response.status_code}. Respuesta: {response.text[:200]}...") # Limitamos la longitud de la respuesta en el log
 
-        # 4. Validar y decodificar la respuesta JSON
-        response_data = response.json()
+        # 4. Validar y decodificar la respuesta JSON (con orjson si está instalado)
+        response_data = orjson.loads(response.content) if orjson is not None else response.json()
 
     # Manejar errores de conexión, timeouts, DNS, etc.
     except requests.exceptions.Timeout:
         raise TimeoutError("Timeout en la API: La consulta tardó demasiado en responder.")
     except requests.exceptions.RequestException as e:
         raise ConnectionError(f"Error de conexión con la API de Gema: {e}")
-    # Manejar el caso en que la respuesta no es un JSON válido
+    # Manejar el caso en que la respuesta no es un JSON válido (orjson.JSONDecodeError hereda de ValueError)
     except ValueError:
         raise TypeError(f"La respuesta de la API no es un JSON válido. Respuesta recibida: {response.text[:200]}...")
 
@@ -67,5 +232,418 @@ def query_api_gema(sql_query: str) -> list:
     if data is None: # Se comprueba que la clave 'data' exista
         raise TypeError("La respuesta de la API tiene un formato inesperado (falta la clave 'data').")
 
-    # 6. Devolver los datos si todas las validaciones pasan
-    return data
\ No newline at end of file
+    # 6. Guardar en caché y devolver los datos si todas las validaciones pasan
+    if cache is not None:
+        try:
+            cache.guardar(sql_query, data)
+        except sqlite3.Error:
+            pass
+    return data
+
+
+def query_api_gema(sql_query: str, usar_cache: bool = True) -> list:
+    """
+    Ejecuta una consulta SQL contra la API de GEMA y devuelve los resultados.
+    
+    Esta es una función de producción robusta que:
+    0. Si el mismo SQL se respondió hace menos de GEMA_MEMO_SEGUNDOS, devuelve una copia
+       sin salir del proceso; si ya está en curso en otro hilo, espera y comparte esa
+       misma respuesta (una sola petición HTTP para todas las consultas idénticas).
+       En modo sin conexión (configurar_modo_sin_conexion) responde desde la instantánea
+       local de Core/instantanea_gema.py y no sigue con los pasos siguientes.
+       Si no, y la caché en disco está activa y 'usar_cache' es True, responde desde Core/cache_gema.py
+       cuando hay una respuesta vigente para el mismo SQL (y guarda las nuevas).
+    1. Codifica la consulta SQL para que sea segura en la URL.
+    2. Realiza la petición GET por la sesión compartida (keep-alive), con timeouts
+       y reintentos con espera aleatoria ante timeouts, caídas de conexión y 5xx.
+    3. Valida códigos de estado HTTP.
+    4. Valida que la respuesta sea un JSON válido.
+    5. Valida la estructura de la respuesta JSON de la API (status 'success' y clave 'data').
+    6. Lanza excepciones claras y específicas para cada tipo de error.
+
+    Args:
+        sql_query: La consulta SQL a ejecutar (sin la palabra "SELECT").
+        usar_cache: False para ir siempre al servidor (la respuesta igual se guarda).
+
+    Returns:
+        Una lista de diccionarios, donde cada diccionario es una fila del resultado.
+
+    Raises:
+        Exception: Si ocurre cualquier error de conexión, timeout, formato o lógico de la API.
+    """
+    clave = (normalizar_sql(sql_query), usar_cache)
+    with _lock_memo:
+        if usar_cache:
+            memo = _memo.get(clave[0])
+            if memo is not None and time.monotonic() - memo[0] <= GEMA_MEMO_SEGUNDOS:
+                _memo.move_to_end(clave[0])
+                _contadores_memo["memo"] += 1
+                return _copiar_filas(memo[1])
+        futuro = _en_vuelo.get(clave)
+        es_lider = futuro is None
+        if es_lider:
+            futuro = Future()
+            _en_vuelo[clave] = futuro
+        else:
+            _contadores_memo["compartidas"] += 1
+
+    if not es_lider:
+        # Relanza la misma excepción que recibió el hilo que hizo la petición
+        return _copiar_filas(futuro.result())
+
+    datos, error = None, None
+    try:
+        datos = _consultar_api_gema(sql_query, usar_cache)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # Pase lo que pase (incluso KeyboardInterrupt o SystemExit), el líder libera la
+        # clave y resuelve el Future: ningún hilo que comparte la consulta queda colgado
+        with _lock_memo:
+            _en_vuelo.pop(clave, None)
+            if error is None:
+                _memo[clave[0]] = (time.monotonic(), datos)
+                _memo.move_to_end(clave[0])
+                while len(_memo) > GEMA_MEMO_MAX_ENTRADAS:
+                    _memo.popitem(last=False)
+        if error is None:
+            futuro.set_result(datos)
+        elif isinstance(error, Exception):
+            futuro.set_exception(error)
+        else:
+            # Los que esperan reciben un error normal, no la interrupción de otro hilo
+            futuro.set_exception(RuntimeError(f"La consulta a GEMA compartida se interrumpió: {error!r}"))
+    return _copiar_filas(datos)
+
+
+def map_queries(queries: list[str], max_workers: int | None = None,
+                progreso_callback=None, usar_cache: bool = True) -> list[tuple[bool, list | Exception]]:
+    """
+    Ejecuta muchas consultas con query_api_gema en un pool de hilos.
+
+    - Conserva el orden: el resultado i corresponde a queries[i].
+    - Aísla los errores: cada resultado es (True, datos) o (False, excepción); una
+      consulta fallida no cancela las demás.
+    - Respeta el tope global GEMA_CONSULTAS_SIMULTANEAS aunque se pidan más hilos o
+      haya varios map_queries a la vez.
+
+    'progreso_callback(completadas, total)' se llama desde el hilo que invoca la función.
+    """
+    queries = list(queries)
+    resultados = [None] * len(queries)
+    if not queries:
+        return resultados
+
+    def ejecutar(sql):
+        try:
+            return True, query_api_gema(sql, usar_cache)
+        except Exception as e:
+            return False, e
+
+    hilos = max(1, min(max_workers or GEMA_CONSULTAS_SIMULTANEAS, len(queries)))
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="api_gema") as ejecutor:
+        futuros = {ejecutor.submit(ejecutar, sql): i for i, sql in enumerate(queries)}
+        for completadas, futuro in enumerate(as_completed(futuros), 1):
+            resultados[futuros[futuro]] = futuro.result()
+            if progreso_callback:
+                progreso_callback(completadas, len(queries))
+    return resultados
+
+
+def iterar_api_gema(columnas: str, tabla: str, condicion: str = "", clave: str = "gl_docn",
+                    tamano_pagina: int = GEMA_FILAS_POR_PAGINA, usar_cache: bool = True):
+    """
+    Generador que devuelve, página por página, las filas de
+    'columnas FROM tabla WHERE condicion' ordenadas por 'clave' (numérica).
+
+    GEMA es FoxPro: no hay LIMIT/OFFSET. Cada página se pide por rango de clave,
+    'TOP n ... WHERE condicion AND clave > última ORDER BY clave'. El TOP de FoxPro
+    incluye los empates de la última fila, así que una clave repetida (por ejemplo
+    gl_docn en glo_red) nunca queda partida entre dos páginas. La página siguiente
+    se pide en segundo plano mientras el llamador procesa la actual, y en memoria nunca
+    hay más de dos páginas: las páginas no pasan por el memo en proceso (sí por la
+    caché en disco).
+
+    Ejemplo: iterar_api_gema("gl_docn", TABLA_GLO_RED, f"gr_docn = {gr_docn}")
+
+    Los errores se lanzan igual que en query_api_gema, en la página que falle.
+    """
+    columnas_sql = columnas if columnas.strip() == "*" else _columnas_con(columnas, [clave])
+
+    def pedir_pagina(ultima):
+        condiciones = [f"({condicion})"] if condicion else []
+        if ultima is not None:
+            condiciones.append(f"{clave} > {ultima}")
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return _consultar_api_gema(f"TOP {tamano_pagina} {columnas_sql} FROM {tabla}{where} ORDER BY {clave}", usar_cache)
+
+    def ultima_clave(filas):
+        fila = filas[-1]
+        valor = next((v for c, v in fila.items() if c.lower() == clave.lower()), None)
+        try:
+            return int(float(str(valor).strip()))
+        except ValueError:
+            raise ValueError(f"La clave de paginación '{clave}' no es numérica en la fila: {fila}")
+
+    ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api_gema_pagina")
+    try:
+        siguiente = ejecutor.submit(pedir_pagina, None)
+        while True:
+            filas = siguiente.result()
+            completa = len(filas) >= tamano_pagina
+            if completa:
+                siguiente = ejecutor.submit(pedir_pagina, ultima_clave(filas))
+            yield from filas
+            if not completa:
+                return
+    finally:
+        # Si el llamador deja de iterar, no se espera a la página que venía en camino
+        ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+def _consultar_lotes(lotes: list[tuple[str, list]], usar_cache: bool = True, errores: dict | None = None) -> list[dict]:
+    """
+    map_queries para los lotes [(sql, lote)] de _armar_lotes; devuelve las filas de
+    todos, en orden. Sin 'errores', el primer lote fallido lanza su excepción. Con
+    'errores', cada valor de un lote fallido se anota como {valor: excepción} y los
+    demás lotes se conservan: una caída parcial no vacía todo el resultado.
+    """
+    filas = []
+    for (_, lote), (ok, datos) in zip(lotes, map_queries([sql for sql, _ in lotes], usar_cache=usar_cache)):
+        if ok:
+            filas.extend(datos)
+        elif errores is None:
+            raise datos
+        else:
+            errores.update(dict.fromkeys(lote, datos))
+    return filas
+
+
+# ======================================================================
+# CONSULTAS POR LOTES
+# ======================================================================
+# En lugar de una consulta a glo_cab y otra a glo_det por factura (2N peticiones),
+# se piden muchas facturas a la vez con listas IN y se agrupan los resultados en
+# Python. Cada lote se parte para respetar GEMA_LARGO_MAXIMO_URL y los lotes se
+# envían en paralelo con map_queries.
+
+TABLA_GLO_CAB = "[gema10.d/salud/datos/glo_cab]"
+TABLA_GLO_DET = "[gema10.d/salud/datos/glo_det]"
+TABLA_GLO_RED = "[gema10.d/salud/datos/glo_red]"
+
+
+def clave_factura(fc_serie, fc_docn) -> tuple[str, str]:
+    """Clave normalizada de una factura: ('COEX', '14393') sin espacios ni ceros a la izquierda."""
+    serie = str(fc_serie).strip().upper()
+    docn = str(fc_docn).strip()
+    try:
+        docn = str(int(float(docn)))
+    except ValueError:
+        pass
+    return serie, docn
+
+
+def _armar_lotes(valores: list, armar_sql) -> list[tuple[str, list]]:
+    """
+    Parte 'valores' en lotes y devuelve [(sql, lote)]. Un lote crece mientras su
+    URL quepa en GEMA_LARGO_MAXIMO_URL y no pase de GEMA_VALORES_POR_CONSULTA valores.
+    """
+    lotes, lote = [], []
+    for valor in valores:
+        candidato = lote + [valor]
+        if lote and (len(candidato) > GEMA_VALORES_POR_CONSULTA
+                     or len(_url_consulta(armar_sql(candidato))) > GEMA_LARGO_MAXIMO_URL):
+            lotes.append(lote)
+            lote = [valor]
+        else:
+            lote = candidato
+    if lote:
+        lotes.append(lote)
+    return [(armar_sql(l), l) for l in lotes]
+
+
+def _columnas_con(columnas: str, obligatorias: list[str]) -> str:
+    """Agrega a 'columnas' las que hacen falta para agrupar los resultados."""
+    presentes = {c.strip().lower() for c in columnas.split(",")}
+    faltantes = [c for c in obligatorias if c not in presentes]
+    return ", ".join(faltantes + [columnas])
+
+
+def consultar_en_lotes(plantilla: str, valores: list, usar_cache: bool = True, errores: dict | None = None) -> list[dict]:
+    """
+    Ejecuta 'plantilla' (SQL con '{valores}' donde va el contenido de una lista IN) para
+    muchos valores numéricos, partidos en lotes como las demás consultas por lotes.
+    Devuelve las filas de todos los lotes, en orden ('errores' como en _consultar_lotes).
+    Ejemplo: consultar_en_lotes(f"* FROM {TABLA_GLO_DET} WHERE gl_docn IN ({{valores}})", gl_docns)
+    """
+    def armar_sql(lote):
+        return plantilla.replace("{valores}", ", ".join(str(int(v)) for v in lote))
+
+    return _consultar_lotes(_armar_lotes(list(valores), armar_sql), usar_cache, errores)
+
+
+def consultar_glo_cab_por_facturas(facturas: list[tuple], columnas: str = "gl_docn, gl_fecha",
+                                   orden: str = "gl_fecha DESC",
+                                   errores: dict | None = None) -> dict[tuple[str, str], list[dict]]:
+    """
+    Consulta glo_cab para muchas facturas (pares (fc_serie, fc_docn)) con pocas peticiones.
+
+    Returns:
+        {clave_factura: [filas]} con una entrada por cada factura pedida (lista vacía si
+        no está en GEMA o si su serie/número no es válido). Dentro de cada factura las
+        filas conservan 'orden' (por defecto, la glosa más reciente primero).
+
+    Raises:
+        Las mismas excepciones que query_api_gema si falla alguna petición. Si se pasa
+        'errores', no se lanza: las facturas del lote fallido quedan con lista vacía y
+        se anotan en 'errores' como {clave_factura: excepción}.
+    """
+    resultados = {}
+    por_serie = {}
+    for fc_serie, fc_docn in facturas:
+        clave = clave_factura(fc_serie, fc_docn)
+        resultados.setdefault(clave, [])
+        serie, docn = clave
+        # Solo valores seguros dentro del SQL: serie alfanumérica y número entero
+        if re.fullmatch(r"[A-Z0-9]+", serie) and docn.isdigit():
+            por_serie.setdefault(serie, [])
+            if docn not in por_serie[serie]:
+                por_serie[serie].append(docn)
+
+    pares = [(serie, docn) for serie, docns in por_serie.items() for docn in docns]
+    columnas_sql = _columnas_con(columnas, ["fc_serie", "fc_docn"])
+
+    def armar_sql(lote):
+        series = {}
+        for serie, docn in lote:
+            series.setdefault(serie, []).append(docn)
+        condiciones = " OR ".join(
+            f"(fc_serie = '{serie}' AND fc_docn IN ({', '.join(docns)}))" for serie, docns in series.items()
+        )
+        sql = f"{columnas_sql} FROM {TABLA_GLO_CAB} WHERE {condiciones}"
+        return f"{sql} ORDER BY {orden}" if orden else sql
+
+    for fila in _consultar_lotes(_armar_lotes(pares, armar_sql), errores=errores):
+        clave = clave_factura(fila.get("fc_serie", ""), fila.get("fc_docn", ""))
+        if clave in resultados:
+            resultados[clave].append(fila)
+    return resultados
+
+
+def consultar_glo_det_por_gl_docn(gl_docns: list, columnas: str = "codigo, vr_glosa, motivo_res, estatus1",
+                                  filtro: str = "", orden: str = "", errores: dict | None = None) -> dict[int, list[dict]]:
+    """
+    Consulta glo_det para muchos gl_docn con pocas peticiones.
+
+    'filtro' es una condición SQL adicional común a todos (por ejemplo
+    "estatus1 IN ('C2', 'AI')"). Devuelve {gl_docn: [filas]} con una entrada por cada
+    gl_docn pedido; dentro de cada uno las filas conservan 'orden'. Con 'errores', los
+    gl_docn de un lote fallido se anotan como {gl_docn: excepción} en lugar de lanzar.
+    """
+    resultados = {}
+    for gl_docn in gl_docns:
+        resultados.setdefault(int(float(str(gl_docn).strip())), [])
+
+    columnas_sql = _columnas_con(columnas, ["gl_docn"])
+
+    plantilla = f"{columnas_sql} FROM {TABLA_GLO_DET} WHERE gl_docn IN ({{valores}})"
+    if filtro:
+        plantilla += f" AND ({filtro})"
+    if orden:
+        plantilla += f" ORDER BY {orden}"
+
+    for fila in consultar_en_lotes(plantilla, list(resultados), errores=errores):
+        try:
+            gl_docn = int(float(str(fila.get("gl_docn", "")).strip()))
+        except ValueError:
+            continue
+        if gl_docn in resultados:
+            resultados[gl_docn].append(fila)
+    return resultados
+
+
+def consultar_glosas_por_facturas(facturas: list[tuple], columnas_cab: str = "gl_docn, gl_fecha",
+                                  orden_cab: str = "gl_fecha DESC",
+                                  columnas_det: str = "codigo, vr_glosa, motivo_res, estatus1",
+                                  filtro_det: str = "", orden_det: str = "",
+                                  errores: dict | None = None) -> dict[tuple[str, str], dict]:
+    """
+    Cabecera más reciente e ítems de glo_det de muchas facturas: dos tandas de
+    peticiones por lotes en lugar de 2 consultas por factura.
+
+    Returns:
+        {clave_factura: {"cab": fila de glo_cab más reciente o None, "det": [filas de glo_det]}}
+        Con 'errores', las facturas cuyo lote de glo_cab o de glo_det falló se anotan
+        como {clave_factura: excepción} y sus datos no deben tomarse como completos.
+    """
+    errores_det = {} if errores is not None else None
+    cabeceras = consultar_glo_cab_por_facturas(facturas, columnas_cab, orden_cab, errores=errores)
+    maestras = {clave: filas[0] for clave, filas in cabeceras.items() if filas}
+    detalles = consultar_glo_det_por_gl_docn(
+        [fila["gl_docn"] for fila in maestras.values()], columnas_det, filtro_det, orden_det, errores=errores_det
+    ) if maestras else {}
+
+    resultados = {}
+    for clave in cabeceras:
+        cab = maestras.get(clave)
+        gl_docn = int(float(str(cab["gl_docn"]).strip())) if cab else None
+        if errores_det and gl_docn in errores_det:
+            errores[clave] = errores_det[gl_docn]
+        resultados[clave] = {"cab": cab, "det": detalles.get(gl_docn, []) if cab else []}
+    return resultados
+
+
+def consultar_items_de_glosas_api(glosas: list[tuple[str, str]], progreso_callback=None) -> tuple[dict, dict]:
+    """
+    Ítems de glo_det de todas las glosas (factura, estado) de procesador_glosas_excel y
+    Grupo SIS, con consultas por lotes: una tanda a glo_cab para el gl_docn más reciente
+    de cada factura y otra a glo_det.
+
+    Returns:
+        (items, errores): items es {(factura, estado): [ítems con ese estatus1]} y
+        errores es {(factura, estado): excepción} para las glosas cuyo lote falló en la
+        API. Así una caída no se confunde con "sin datos": las demás glosas conservan
+        sus ítems y las afectadas se reportan como error de la API.
+    """
+    avisar = progreso_callback or (lambda mensaje: None)
+    items = {glosa: [] for glosa in glosas}
+    facturas = {}
+    for factura, estado in glosas:
+        match = re.match(r'([A-Za-z]+)(\d+)', factura)
+        if match:
+            facturas[(factura, estado)] = match.groups()
+    if not facturas:
+        return items, {}
+
+    estados = ", ".join(sorted({f"'{estado}'" for _, estado in facturas if re.fullmatch(r'[A-Z0-9]+', estado)}))
+    avisar(f"  [API GEMA] Consultando {len(facturas)} factura(s) por lotes...")
+    errores_api = {}
+    try:
+        glosas_api = consultar_glosas_por_facturas(
+            list(facturas.values()),
+            columnas_cab="gl_docn, gl_fecha", orden_cab="gl_fecha DESC",
+            columnas_det="codigo, vr_glosa, motivo_res, estatus1",
+            filtro_det=f"estatus1 IN ({estados})" if estados else "",
+            errores=errores_api,
+        )
+    except Exception as e:
+        avisar(f"  - ERROR CRÍTICO durante la consulta a la API: {e}")
+        return items, dict.fromkeys(facturas, e)
+    if resumen_cache_gema():
+        avisar(f"  {resumen_cache_gema()}")
+
+    errores = {}
+    for (factura, estado), (prefijo, num) in facturas.items():
+        clave = clave_factura(prefijo, num)
+        if clave in errores_api:
+            errores[(factura, estado)] = errores_api[clave]
+            continue
+        glosa_api = glosas_api.get(clave)
+        if glosa_api and glosa_api["cab"]:
+            items[(factura, estado)] = [
+                item for item in glosa_api["det"] if str(item.get('estatus1', '')).strip().upper() == estado
+            ]
+    if errores:
+        avisar(f"  - ERROR en la API para {len(errores)} de {len(facturas)} factura(s): {next(iter(errores.values()))}")
+    return items, errores
@@ -0,0 +1,155 @@
+# Core/barrido_correos.py
+"""
+Barrido inverso de correos de AXA para recuperar ejecuciones pasadas.
+
+En lugar de buscar el correo de cada radicado, se arma un índice radicado -> carpeta
+con todos los 'resultados_automatizacion.json' bajo una carpeta raíz y se revisa el
+INBOX una sola vez: un SEARCH por todos los correos de AXA, sus cabeceras y
+BODYSTRUCTURE por lotes, y cada correo se cruza con el índice buscando sus palabras
+(asunto y nombres de PDF) en el diccionario. Se descargan y archivan todas las
+coincidencias en la misma pasada y los correos resueltos se mueven a procesados.
+
+Uso: python -m Core.cli --barrido-correos "D:/Cuentas"
+"""
+import imaplib
+import json
+import queue
+import re
+from pathlib import Path
+
+from .pendientes_email import TablaPendientesEmail
+from .trabajador_email import EmailListenerWorker
+from Configuracion.constantes import AXASOAT_EMAIL_SENDER
+
+ARCHIVO_RESULTADOS = "resultados_automatizacion.json"
+
+
+def indexar_resultados(raiz: Path) -> tuple[dict[str, Path], list[str]]:
+    """
+    Recorre 'raiz' y devuelve ({radicado: carpeta}, avisos). La carpeta de cada
+    radicado es la subcarpeta indicada en el JSON, junto al archivo de resultados.
+    """
+    indice, avisos = {}, []
+    for ruta_json in sorted(Path(raiz).rglob(ARCHIVO_RESULTADOS)):
+        try:
+            resultados = json.loads(ruta_json.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            avisos.append(f"No se pudo leer {ruta_json}: {e}")
+            continue
+        for resultado in resultados if isinstance(resultados, list) else []:
+            radicado = str(resultado.get("radicado") or "").strip()
+            subcarpeta = resultado.get("subcarpeta")
+            if not radicado or not subcarpeta:
+                continue
+            carpeta = ruta_json.parent / subcarpeta
+            if radicado in indice and indice[radicado] != carpeta:
+                avisos.append(f"Radicado {radicado} repetido: se usa {indice[radicado]} y se ignora {carpeta}")
+                continue
+            indice[radicado] = carpeta
+    return indice, avisos
+
+
+def _palabras(texto: str) -> set[str]:
+    """Palabras candidatas a radicado: 'RAD_123-4.pdf' -> {'RAD', '123-4', '123', '4', 'pdf'}."""
+    palabras = set()
+    for palabra in re.findall(r"[0-9A-Za-z]+(?:-[0-9A-Za-z]+)*", texto or ""):
+        palabras.add(palabra)
+        palabras.update(palabra.split("-"))
+    return palabras
+
+
+class BarridoCorreos(EmailListenerWorker):
+    """Reutiliza la conexión, el índice por lotes, la descarga parcial y el movimiento del listener."""
+
+    def __init__(self):
+        super().__init__(queue.Queue())
+
+    def _uids_nuevos(self) -> list[int]:
+        # El barrido revisa todo el INBOX, no solo lo llegado desde ayer
+        status, datos = self.imap.uid("SEARCH", None, f'(FROM "{AXASOAT_EMAIL_SENDER}")')
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Falló la búsqueda de correos de AXA: {datos}")
+        return sorted(int(u) for u in (datos[0] or b"").split())
+
+    def ejecutar(self, raiz: Path) -> dict:
+        raiz = Path(raiz).resolve()
+        self.progreso_update.emit(f"--- BARRIDO DE CORREOS: {raiz} ---")
+        indice, avisos = indexar_resultados(raiz)
+        for aviso in avisos:
+            self.progreso_update.emit(f"[BARRIDO] AVISO: {aviso}")
+        self.progreso_update.emit(f"[BARRIDO] {len(indice)} radicado(s) indexado(s) en los archivos de resultados.")
+
+        resumen = {
+            "raiz": str(raiz), "radicados_indexados": len(indice), "correos_revisados": 0,
+            "adjuntos_guardados": 0, "adjuntos_ya_existentes": 0, "correos_sin_coincidencia": 0,
+            "radicados_resueltos": [], "errores_criticos": [],
+        }
+        if not indice:
+            return resumen
+        if not self._connect():
+            resumen["errores_criticos"].append("No se pudo conectar a IMAP.")
+            return resumen
+
+        resueltos = set()
+        try:
+            self._iniciar_pool()
+            self._seleccionar_inbox()
+            uids = self._uids_nuevos()
+            self.progreso_update.emit(f"[BARRIDO] {len(uids)} correo(s) de AXA en el INBOX. Indexando cabeceras...")
+            correos = self._indexar_uids(uids)
+            resumen["correos_revisados"] = len(correos)
+
+            coincidencias = []
+            for uid, entrada in correos.items():
+                palabras = _palabras(entrada["asunto"])
+                for adjunto in entrada["adjuntos"]:
+                    palabras |= _palabras(adjunto["nombre"])
+                radicados = [r for r in palabras if r in indice]
+                if not radicados or not entrada["adjuntos"]:
+                    resumen["correos_sin_coincidencia"] += 1
+                    continue
+                for radicado in radicados:
+                    carpeta = indice[radicado]
+                    if not carpeta.is_dir():
+                        self.progreso_update.emit(f"[BARRIDO] AVISO: La carpeta de {radicado} ya no existe: {carpeta}")
+                        continue
+                    # Un PDF de 0 bytes no cuenta: se vuelve a descargar
+                    ya_guardado = any(
+                        (carpeta / a["nombre"]).is_file() and (carpeta / a["nombre"]).stat().st_size > 0
+                        for a in entrada["adjuntos"]
+                        if radicado in a["nombre"] or radicado in entrada["asunto"]
+                    )
+                    if ya_guardado:
+                        resumen["adjuntos_ya_existentes"] += 1
+                        resueltos.add(radicado)
+                        self.uids_por_mover.add(uid)
+                    else:
+                        coincidencias.append((radicado, uid, entrada, carpeta))
+
+            # Todas las descargas de la pasada van en paralelo por el pool de conexiones
+            for radicado, uid in self._descargar_coincidencias(coincidencias):
+                resumen["adjuntos_guardados"] += 1
+                resueltos.add(radicado)
+                self.uids_por_mover.add(uid)
+            self._mover_a_procesados()
+
+            # Lo resuelto aquí ya no tiene que esperarlo el servicio de correo
+            tabla = TablaPendientesEmail()
+            for radicado in resueltos:
+                tabla.quitar(radicado)
+        except Exception as e:
+            resumen["errores_criticos"].append(str(e))
+            self.progreso_update.emit(f"[BARRIDO] ERROR: {e}")
+        finally:
+            self._cerrar_pool()
+            try:
+                if self.imap: self.imap.logout()
+            except Exception: pass
+
+        resumen["radicados_resueltos"] = sorted(resueltos)
+        self.progreso_update.emit(
+            f"[BARRIDO] Fin: {resumen['adjuntos_guardados']} adjunto(s) guardado(s), "
+            f"{resumen['adjuntos_ya_existentes']} ya estaban, {resumen['correos_sin_coincidencia']} correo(s) sin coincidencia, "
+            f"{len(indice) - len(resueltos)} radicado(s) sin correo."
+        )
+        return resumen
@@ -0,0 +1,154 @@
+# Core/benchmark_email.py
+"""
+Benchmark del listener de email contra el servidor IMAP local (sin red ni Gmail).
+
+Cada escenario siembra N correos sintéticos de AXA que llegan al INBOX a intervalos
+fijos, encola sus radicados en un EmailListenerWorker (como lo haría run_automation)
+y mide:
+  - radicados resueltos por minuto,
+  - bytes que el servidor tuvo que enviar y bytes escritos en disco,
+  - latencia de punta a punta: desde que el correo llega al INBOX hasta que el PDF
+    queda completo en la carpeta (p50, p95 y máximo).
+
+Ejemplos:
+    python -m Core.benchmark_email
+    python -m Core.benchmark_email --radicados 40 --tamano-kb 2000 --intervalo 0.1 --latencia-ms 50 --conexiones 0 3 6
+    python -m Core.benchmark_email --json resultado.json
+"""
+import argparse
+import json
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Permite ejecutar el archivo directamente además de 'python -m Core.benchmark_email'
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Core.servidor_imap_prueba import ServidorImapPrueba, correo_axa
+from Core.trabajador_email import EmailListenerWorker
+
+
+def _percentil(valores: list[float], p: float) -> float | None:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def ejecutar_escenario(radicados: int = 20, tamano_kb: int = 500, intervalo: float = 0.2,
+                       latencia_ms: float = 0.0, conexiones: int = 0, timeout: float = 300,
+                       progreso=None) -> dict:
+    """Corre un escenario completo con un servidor nuevo y devuelve sus métricas."""
+    servidor = ServidorImapPrueba(latencia_fetch=latencia_ms / 1000)
+    puerto = servidor.iniciar()
+    carpeta = Path(tempfile.mkdtemp(prefix="benchmark_email_"))
+
+    job_queue = queue.Queue()
+    worker = EmailListenerWorker(job_queue)
+    worker.imap_servidor, worker.imap_puerto, worker.imap_ssl = "127.0.0.1", puerto, False
+    worker.conexiones_descarga = conexiones
+    if progreso is not None:
+        worker.progreso_update.connect(progreso)
+
+    nombres = [f"BM{i:05d}" for i in range(radicados)]
+    for radicado in nombres:
+        job_queue.put((radicado, carpeta))
+    job_queue.put(None)
+
+    inicio = time.time()
+    hilo = threading.Thread(target=worker.run, name="benchmark_email_listener", daemon=True)
+    hilo.start()
+    llegadas = servidor.programar_llegadas([
+        (i * intervalo, correo_axa(radicado, tamano_kb * 1024)) for i, radicado in enumerate(nombres)
+    ])
+    llegadas.join()
+    hilo.join(timeout=max(0.0, inicio + timeout - time.time()))
+    if hilo.is_alive():
+        # Los radicados sin resolver se cuentan como no encontrados
+        worker.is_running = False
+        hilo.join(timeout=30)
+    duracion = time.time() - inicio
+
+    # Llegada de cada correo al INBOX (la copia en procesados conserva el dato)
+    llegada_por_radicado = {}
+    with servidor.buzon.lock:
+        for mensajes in servidor.buzon.carpetas.values():
+            for m in mensajes:
+                llegada_por_radicado.setdefault(m["mensaje"]["X-Radicado"], m["llegada"])
+
+    latencias, bytes_en_disco = [], 0
+    for radicado in nombres:
+        pdf = carpeta / f"RAD_{radicado}.pdf"
+        if pdf.exists() and radicado in llegada_por_radicado:
+            estado = pdf.stat()
+            bytes_en_disco += estado.st_size
+            latencias.append(max(0.0, estado.st_mtime - llegada_por_radicado[radicado]))
+    servidor.detener()
+    shutil.rmtree(carpeta, ignore_errors=True)
+
+    resueltos = len(latencias)
+    return {
+        "radicados": radicados,
+        "conexiones_descarga": conexiones,
+        "tamano_kb": tamano_kb,
+        "intervalo_segundos": intervalo,
+        "latencia_fetch_ms": latencia_ms,
+        "resueltos": resueltos,
+        "duracion_segundos": round(duracion, 2),
+        "radicados_por_minuto": round(resueltos / (duracion / 60), 1) if duracion > 0 else None,
+        "bytes_servidos": servidor.bytes_servidos,
+        "bytes_en_disco": bytes_en_disco,
+        "latencia_p50_segundos": round(_percentil(latencias, 0.50), 3) if latencias else None,
+        "latencia_p95_segundos": round(_percentil(latencias, 0.95), 3) if latencias else None,
+        "latencia_max_segundos": round(max(latencias), 3) if latencias else None,
+    }
+
+
+def _formatear(resultados: list[dict]) -> str:
+    columnas = [
+        ("conexiones_descarga", "Conex."), ("resueltos", "Resueltos"), ("duracion_segundos", "Duración s"),
+        ("radicados_por_minuto", "Rad/min"), ("bytes_servidos", "Bytes servidos"), ("bytes_en_disco", "Bytes disco"),
+        ("latencia_p50_segundos", "p50 s"), ("latencia_p95_segundos", "p95 s"), ("latencia_max_segundos", "máx s"),
+    ]
+    filas = [[titulo for _, titulo in columnas]]
+    filas += [[str(r[clave]) if r[clave] is not None else "-" for clave, _ in columnas] for r in resultados]
+    anchos = [max(len(fila[i]) for fila in filas) for i in range(len(columnas))]
+    return "\n".join("  ".join(valor.rjust(ancho) for valor, ancho in zip(fila, anchos)) for fila in filas)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="benchmark_email",
+        description="Mide el listener de email contra un servidor IMAP local con correos sintéticos de AXA.",
+    )
+    parser.add_argument("--radicados", type=int, default=20, help="Correos (y radicados) por escenario.")
+    parser.add_argument("--tamano-kb", type=int, default=500, help="Tamaño de cada PDF adjunto.")
+    parser.add_argument("--intervalo", type=float, default=0.2, help="Segundos entre la llegada de un correo y el siguiente.")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia simulada por cada FETCH de contenido.")
+    parser.add_argument("--conexiones", type=int, nargs="+", default=[0, 3], help="Tamaños del pool de descargas a comparar.")
+    parser.add_argument("--timeout", type=float, default=300, help="Tiempo máximo por escenario.")
+    parser.add_argument("--detalle", action="store_true", help="Muestra el log del listener.")
+    parser.add_argument("--json", help="Guarda los resultados en este archivo JSON.")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for conexiones in args.conexiones:
+        print(f"Escenario: {args.radicados} radicados, {args.tamano_kb} KB, {conexiones} conexiones de descarga...", flush=True)
+        resultados.append(ejecutar_escenario(
+            radicados=args.radicados, tamano_kb=args.tamano_kb, intervalo=args.intervalo,
+            latencia_ms=args.latencia_ms, conexiones=conexiones, timeout=args.timeout,
+            progreso=print if args.detalle else None,
+        ))
+    print()
+    print(_formatear(resultados))
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultados, ensure_ascii=False, indent=4), encoding="utf-8")
+    return 0 if all(r["resueltos"] == r["radicados"] for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
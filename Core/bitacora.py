@@ -0,0 +1,81 @@
+# Core/bitacora.py
+"""
+Bitácora de trabajos a prueba de caídas.
+
+run_automation agrega una línea JSON por cada carpeta procesada en
+'bitacora_automatizacion.jsonl' dentro de la carpeta contenedora. Si la
+aplicación o Chromium mueren a mitad de la cuenta, el modo reanudar lee esta
+bitácora, omite las carpetas ya terminadas sin volver a revisarlas y
+reconstruye los reportes a partir de lo registrado. Una ejecución que termina
+sin fallos ni carpetas pendientes borra su bitácora.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+from Configuracion.constantes import ARCHIVO_BITACORA_AUTOMATIZACION
+
+
+class BitacoraTrabajos:
+    """Archivo JSONL de solo-agregar, seguro para varios contextos en paralelo."""
+
+    def __init__(self, carpeta_contenedora: Path, reanudar: bool = False):
+        self.ruta = Path(carpeta_contenedora) / ARCHIVO_BITACORA_AUTOMATIZACION
+        self._lock = threading.Lock()
+        if not reanudar and self.ruta.exists():
+            # Ejecución nueva: se empieza una bitácora limpia
+            self.ruta.unlink()
+        elif reanudar:
+            self._descartar_linea_incompleta()
+
+    def _descartar_linea_incompleta(self):
+        """
+        Si una caída dejó la última línea a medias (sin salto de línea final), se trunca
+        el archivo hasta la última línea completa; de lo contrario la siguiente entrada
+        quedaría pegada a ella y ambas se perderían al leer.
+        """
+        if not self.ruta.is_file():
+            return
+        with open(self.ruta, "r+b") as f:
+            contenido = f.read()
+            if not contenido or contenido.endswith(b"\n"):
+                return
+            f.truncate(contenido.rfind(b"\n") + 1)
+
+    def leer(self) -> list[dict]:
+        """
+        Devuelve las entradas registradas, en orden.
+        Una última línea incompleta (caída durante la escritura) se ignora.
+        """
+        entradas = []
+        if not self.ruta.is_file():
+            return entradas
+        with open(self.ruta, "r", encoding="utf-8") as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    entradas.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    continue
+        return entradas
+
+    def ultimas_por_carpeta(self) -> dict[str, dict]:
+        """Devuelve la entrada más reciente de cada carpeta (una carpeta fallida puede reintentarse)."""
+        return {entrada["carpeta"]: entrada for entrada in self.leer() if "carpeta" in entrada}
+
+    def descartar(self):
+        """Borra la bitácora al terminar una ejecución sin pendientes, para no ofrecer reanudarla."""
+        with self._lock:
+            self.ruta.unlink(missing_ok=True)
+
+    def registrar(self, entrada: dict):
+        """Agrega una entrada y la fuerza a disco antes de continuar."""
+        linea = json.dumps(entrada, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.ruta, "a", encoding="utf-8") as f:
+                f.write(linea)
+                f.flush()
+                os.fsync(f.fileno())
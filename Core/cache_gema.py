@@ -0,0 +1,144 @@
+# Core/cache_gema.py
+"""
+Caché persistente (SQLite) de los resultados de query_api_gema.
+
+Volver a correr procesador_glosas_excel o Grupo SIS sobre el mismo Excel repite las
+mismas consultas a glo_cab y glo_det; con la caché esas repeticiones se responden
+desde disco sin pasar por el túnel. La clave es el SQL normalizado (espacios
+colapsados fuera de las comillas) y cada entrada vence según la tabla consultada
+(GEMA_CACHE_TTL_SEGUNDOS): glo_cab casi no cambia, el estatus de glo_det sí.
+
+El archivo vive en la carpeta 'Datos' del proyecto y no pasa de GEMA_CACHE_MAX_MB:
+al llenarse se borran las entradas usadas hace más tiempo. Como en
+Core/pendientes_email.py, cada método abre su propia conexión para poder usarse
+desde varios hilos (map_queries) y procesos a la vez.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from Configuracion.constantes import (
+    GEMA_ARCHIVO_CACHE,
+    GEMA_CACHE_TTL_SEGUNDOS,
+    GEMA_CACHE_TTL_POR_DEFECTO_SEGUNDOS,
+    GEMA_CACHE_MAX_MB,
+)
+
+
+def ruta_cache_gema() -> Path:
+    # Directorio base del proyecto. Sube dos niveles desde este archivo (Core/cache_gema.py -> proyecto/)
+    project_root = Path(__file__).resolve().parents[1]
+    return project_root / "Datos" / GEMA_ARCHIVO_CACHE
+
+
+def normalizar_sql(sql: str) -> str:
+    """Colapsa espacios fuera de los literales '...' y quita el ';' final, para que SQL equivalente comparta clave."""
+    partes = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";").strip())
+    return "".join(parte if parte.startswith("'") else re.sub(r"\s+", " ", parte) for parte in partes)
+
+
+def tablas_de_consulta(sql: str) -> list[str]:
+    """Tablas referenciadas: '[gema10.d/salud/datos/glo_cab]' -> 'glo_cab'."""
+    return sorted({ruta.rsplit("/", 1)[-1].strip().lower() for ruta in re.findall(r"\[([^\]]+)\]", sql)})
+
+
+def ttl_de_consulta(sql: str) -> float:
+    """La consulta vence con la tabla más volátil que toque."""
+    return min(
+        (GEMA_CACHE_TTL_SEGUNDOS.get(tabla, GEMA_CACHE_TTL_POR_DEFECTO_SEGUNDOS) for tabla in tablas_de_consulta(sql)),
+        default=GEMA_CACHE_TTL_POR_DEFECTO_SEGUNDOS,
+    )
+
+
+class CacheGema:
+    def __init__(self, ruta: Path | None = None, max_mb: float = GEMA_CACHE_MAX_MB):
+        self.ruta = Path(ruta) if ruta else ruta_cache_gema()
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock_contadores = threading.Lock()
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as con:
+            # WAL: los hilos de map_queries leen mientras otro escribe
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS consultas ("
+                " sql TEXT PRIMARY KEY,"
+                " tablas TEXT NOT NULL,"
+                " datos TEXT NOT NULL,"
+                " bytes INTEGER NOT NULL,"
+                " creado REAL NOT NULL,"
+                " usado REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_consultas_usado ON consultas (usado)")
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión de corta duración: confirma al salir (o revierte si hubo error) y se cierra."""
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _contar(self, acierto: bool):
+        with self._lock_contadores:
+            if acierto:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+
+    def obtener(self, sql: str) -> list | None:
+        """Filas guardadas para 'sql' si siguen vigentes; None si no hay o ya vencieron."""
+        clave = normalizar_sql(sql)
+        ahora = time.time()
+        with self._conectar() as con:
+            fila = con.execute("SELECT datos, creado FROM consultas WHERE sql = ?", (clave,)).fetchone()
+            if fila is None or ahora - fila[1] > ttl_de_consulta(clave):
+                self._contar(False)
+                return None
+            con.execute("UPDATE consultas SET usado = ? WHERE sql = ?", (ahora, clave))
+        self._contar(True)
+        return json.loads(fila[0])
+
+    def guardar(self, sql: str, datos: list):
+        clave = normalizar_sql(sql)
+        texto = json.dumps(datos, ensure_ascii=False)
+        ahora = time.time()
+        with self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO consultas (sql, tablas, datos, bytes, creado, usado) VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, " " + " ".join(tablas_de_consulta(clave)) + " ", texto, len(texto.encode("utf-8")), ahora, ahora),
+            )
+            self._desalojar(con)
+
+    def _desalojar(self, con):
+        """Si la caché pasa del tamaño máximo, borra las entradas menos usadas hasta quedar en el 90 %."""
+        total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM consultas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        por_liberar = total - int(self.max_bytes * 0.9)
+        claves = []
+        for clave, bytes_entrada in con.execute("SELECT sql, bytes FROM consultas ORDER BY usado"):
+            if por_liberar <= 0:
+                break
+            claves.append((clave,))
+            por_liberar -= bytes_entrada
+        con.executemany("DELETE FROM consultas WHERE sql = ?", claves)
+
+    def invalidar(self, tabla: str | None = None) -> int:
+        """Borra las entradas que tocan 'tabla' (por ejemplo 'glo_det'), o todas. Devuelve cuántas."""
+        with self._conectar() as con:
+            if tabla is None:
+                return con.execute("DELETE FROM consultas").rowcount
+            return con.execute("DELETE FROM consultas WHERE tablas LIKE ?", (f"% {tabla.lower()} %",)).rowcount
+
+    def resumen(self) -> str:
+        total = self.aciertos + self.fallos
+        porcentaje = f" ({self.aciertos * 100 // total}% aciertos)" if total else ""
+        return f"[API GEMA] Caché: {self.aciertos} acierto(s), {self.fallos} fallo(s){porcentaje}."
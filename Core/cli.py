@@ -0,0 +1,283 @@
+# Core/cli.py
+"""
+Punto de entrada por línea de comandos, sin Qt.
+
+Ejecuta el mismo motor que la GUI (run_automation, run_grupo_sis_automation o
+run_mundial_escolar_automation) para poder programar cuentas desatendidas desde
+cron o el Programador de tareas de Windows.
+
+Ejemplos:
+    python -m Core.cli --area glosas --aseguradora sura_arl --carpeta "D:/Cuentas/123"
+    python -m Core.cli --area glosas --aseguradora grupo_sis --carpeta glosas.xlsx --archivo-glosas lista.txt
+    python -m Core.cli --lote cuentas.json
+    python -m Core.cli --servicio-correo
+    python -m Core.cli --barrido-correos "D:/Cuentas"
+    python -m Core.cli --instantanea-gema --desde 2024-01-01 --hasta 2024-06-30
+    python -m Core.cli --area glosas --aseguradora grupo_sis --carpeta glosas.xlsx --archivo-glosas lista.txt --gema-sin-conexion
+
+Con --lote se ejecutan varias cuentas en una sola corrida (ver Core/planificador_lotes.py).
+El archivo es una lista JSON de trabajos, por ejemplo:
+    [{"area": "glosas", "aseguradora": "sura_arl", "carpeta": "D:/Cuentas/123"},
+     {"area": "facturacion", "aseguradora": "previsora", "carpeta": "D:/Cuentas/456", "reanudar": true}]
+
+Con --servicio-correo se deja corriendo el servicio de correo (Core/servicio_correo.py)
+hasta Ctrl+C: adjunta los PDFs de AXA de los radicados que las ejecuciones dejaron
+pendientes, también los de las ejecuciones por CLI, que solo los anotan en la tabla.
+Con --barrido-correos se cruza todo el INBOX con los resultados_automatizacion.json
+bajo la carpeta indicada, en una sola pasada (ver Core/barrido_correos.py).
+Con --instantanea-gema se descargan glo_cab, glo_det y glo_red (por rango de gl_fecha
+o por --cuentas) a un SQLite local; con --gema-sin-conexion cualquier ejecución consulta
+GEMA desde ese archivo en lugar del túnel (ver Core/instantanea_gema.py).
+
+El progreso se escribe en stdout (o en --log). Al terminar se imprime un resumen
+JSON en una sola línea (o se guarda en --resumen-json). Código de salida:
+0 sin fallos, 1 si hubo carpetas fallidas, 2 si hubo un error crítico.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Permite ejecutar el archivo directamente además de 'python -m Core.cli'
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Configuracion.constantes import CONFIGURACION_AREAS
+from Core.motor_automatizacion import MotorAutomatizacion
+from Core.planificador_lotes import PlanificadorLotes
+from Core.servicio_correo import ServicioCorreo
+from Core.barrido_correos import BarridoCorreos
+from Core.api_gema import configurar_cache_gema, configurar_modo_sin_conexion
+from Core.instantanea_gema import crear_instantanea
+
+
+def _crear_parser() -> argparse.ArgumentParser:
+    aseguradoras = sorted({aseg_id for lista in CONFIGURACION_AREAS.values() for _, aseg_id in lista})
+    parser = argparse.ArgumentParser(
+        prog="python -m Core.cli",
+        description="Ejecuta una automatización sin interfaz gráfica.",
+    )
+    parser.add_argument("--area", choices=sorted(CONFIGURACION_AREAS), help="Área de la automatización.")
+    parser.add_argument("--aseguradora", choices=aseguradoras, help="Aseguradora a procesar.")
+    parser.add_argument("--carpeta", help="Carpeta contenedora (o archivo Excel para Grupo SIS).")
+    parser.add_argument("--lote", help="Archivo JSON con una lista de trabajos (área, aseguradora, carpeta) a ejecutar juntos.")
+    parser.add_argument("--servicio-correo", action="store_true", help="Ejecuta el servicio de correo en primer plano hasta Ctrl+C.")
+    parser.add_argument("--barrido-correos", metavar="RAIZ", help="Archiva los PDFs de AXA de todas las cuentas bajo RAIZ en una sola pasada.")
+    parser.add_argument("--sin-cache-gema", action="store_true", help="Consulta GEMA sin usar la caché en disco.")
+    parser.add_argument("--instantanea-gema", action="store_true", help="Descarga glo_cab, glo_det y glo_red a un SQLite local.")
+    parser.add_argument("--desde", help="Instantánea: primera gl_fecha (AAAA-MM-DD).")
+    parser.add_argument("--hasta", help="Instantánea: última gl_fecha (AAAA-MM-DD).")
+    parser.add_argument("--cuentas", type=int, nargs="+", help="Instantánea: cuentas de cobro (gr_docn) en lugar de fechas.")
+    parser.add_argument("--archivo-instantanea", help="Ruta de la instantánea de GEMA (por defecto, en la carpeta Datos).")
+    parser.add_argument("--gema-sin-conexion", action="store_true", help="Responde las consultas a GEMA desde la instantánea local.")
+    parser.add_argument("--con-ventana", action="store_true", help="Muestra el navegador (por defecto es headless).")
+    parser.add_argument("--contextos", type=int, default=None, help="Contextos de navegador en paralelo.")
+    parser.add_argument("--reanudar", action="store_true", help="Reanuda desde la bitácora de una ejecución interrumpida.")
+    parser.add_argument("--archivo-glosas", help="Grupo SIS: archivo de texto con la lista de glosas.")
+    parser.add_argument("--modo-grupo-sis", default="glosas", help="Grupo SIS: modo de procesamiento.")
+    parser.add_argument("--log", help="Escribe el progreso en este archivo en lugar de stdout.")
+    parser.add_argument("--resumen-json", help="Guarda el resumen JSON en este archivo en lugar de imprimirlo.")
+    return parser
+
+
+def ejecutar(args) -> dict:
+    """Ejecuta una automatización y devuelve el resumen como diccionario."""
+    if args.aseguradora not in [aseg_id for _, aseg_id in CONFIGURACION_AREAS[args.area]]:
+        raise ValueError(f"La aseguradora '{args.aseguradora}' no está disponible en el área '{args.area}'.")
+
+    carpeta = Path(args.carpeta)
+    if not carpeta.exists():
+        raise FileNotFoundError(f"No existe la carpeta o archivo: {carpeta}")
+
+    input_glosas = None
+    if args.archivo_glosas:
+        input_glosas = Path(args.archivo_glosas).read_text(encoding="utf-8")
+
+    destino_log = open(args.log, "a", encoding="utf-8") if args.log else sys.stdout
+    resultado = {}
+    errores_criticos = []
+
+    def escribir(mensaje):
+        destino_log.write(f"{mensaje}\n")
+        destino_log.flush()
+
+    def al_finalizar(exitos, fallos, omit_rad, omit_dup, email_fallos):
+        resultado.update({
+            "exitos": exitos,
+            "fallos": fallos,
+            "omitidas_radicadas": omit_rad,
+            "omitidas_duplicadas": omit_dup,
+            "correos_no_encontrados": email_fallos,
+        })
+
+    def al_error(mensaje):
+        errores_criticos.append(mensaje)
+        escribir(mensaje)
+
+    motor = MotorAutomatizacion(
+        args.area, args.aseguradora, str(carpeta), not args.con_ventana,
+        input_glosas=input_glosas,
+        modo_grupo_sis=args.modo_grupo_sis,
+        num_contextos=args.contextos,
+        reanudar=args.reanudar,
+    )
+    motor.progreso_update.connect(escribir)
+    motor.finalizado.connect(al_finalizar)
+    motor.error_critico.connect(al_error)
+
+    inicio = time.time()
+    try:
+        motor.run_automation()
+    except Exception as e:
+        al_error(f"ERROR CRÍTICO NO CONTROLADO: {e}")
+    finally:
+        if destino_log is not sys.stdout:
+            destino_log.close()
+
+    return {
+        "area": args.area,
+        "aseguradora": args.aseguradora,
+        "carpeta": str(carpeta.resolve()),
+        **resultado,
+        "errores_criticos": errores_criticos,
+        "duracion_segundos": round(time.time() - inicio, 1),
+    }
+
+
+def ejecutar_lote(args) -> dict:
+    """Ejecuta el lote descrito en --lote y devuelve el resumen consolidado."""
+    trabajos = json.loads(Path(args.lote).read_text(encoding="utf-8"))
+    if not isinstance(trabajos, list) or not trabajos:
+        raise ValueError(f"El archivo de lote debe contener una lista de trabajos: {args.lote}")
+    for trabajo in trabajos:
+        if "archivo_glosas" in trabajo:
+            trabajo["input_glosas"] = Path(trabajo.pop("archivo_glosas")).read_text(encoding="utf-8")
+
+    destino_log = open(args.log, "a", encoding="utf-8") if args.log else sys.stdout
+    errores_criticos = []
+
+    def escribir(mensaje):
+        destino_log.write(f"{mensaje}\n")
+        destino_log.flush()
+
+    def al_error(mensaje):
+        errores_criticos.append(mensaje)
+        escribir(mensaje)
+
+    planificador = PlanificadorLotes(trabajos, not args.con_ventana)
+    planificador.progreso_update.connect(escribir)
+    planificador.error_critico.connect(al_error)
+    try:
+        resumen = planificador.ejecutar()
+    finally:
+        if destino_log is not sys.stdout:
+            destino_log.close()
+
+    errores_criticos.extend(e for r in resumen["trabajos"] for e in r["errores_criticos"])
+    return {**resumen, "fallos": resumen["totales"]["fallos"], "errores_criticos": errores_criticos}
+
+
+def ejecutar_servicio_correo(args) -> int:
+    """Mantiene el servicio de correo activo hasta Ctrl+C. Lo no resuelto queda en la tabla."""
+    destino_log = open(args.log, "a", encoding="utf-8") if args.log else sys.stdout
+
+    def escribir(mensaje):
+        destino_log.write(f"{mensaje}\n")
+        destino_log.flush()
+
+    servicio = ServicioCorreo()
+    servicio.progreso_update.connect(escribir)
+    servicio.iniciar()
+    try:
+        while servicio.esta_activo():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        escribir("Deteniendo el servicio de correo...")
+    finally:
+        servicio.detener()
+        escribir(f"Radicados que siguen esperando correo: {servicio.pendientes()}")
+        if destino_log is not sys.stdout:
+            destino_log.close()
+    return 0
+
+
+def ejecutar_barrido_correos(args) -> dict:
+    """Barre el INBOX contra todas las cuentas bajo --barrido-correos y devuelve el resumen."""
+    destino_log = open(args.log, "a", encoding="utf-8") if args.log else sys.stdout
+
+    def escribir(mensaje):
+        destino_log.write(f"{mensaje}\n")
+        destino_log.flush()
+
+    barrido = BarridoCorreos()
+    barrido.progreso_update.connect(escribir)
+    try:
+        return barrido.ejecutar(Path(args.barrido_correos))
+    finally:
+        if destino_log is not sys.stdout:
+            destino_log.close()
+
+
+def ejecutar_instantanea_gema(args) -> dict:
+    """Crea la instantánea de GEMA pedida con --desde/--hasta o --cuentas y devuelve el resumen."""
+    destino_log = open(args.log, "a", encoding="utf-8") if args.log else sys.stdout
+
+    def escribir(mensaje):
+        destino_log.write(f"{mensaje}\n")
+        destino_log.flush()
+
+    try:
+        return crear_instantanea(
+            desde=args.desde, hasta=args.hasta, cuentas=args.cuentas,
+            ruta=Path(args.archivo_instantanea) if args.archivo_instantanea else None,
+            progreso=escribir,
+        )
+    except Exception as e:
+        escribir(f"[INSTANTÁNEA GEMA] ERROR: {e}")
+        return {"instantanea": args.archivo_instantanea, "errores_criticos": [str(e)]}
+    finally:
+        if destino_log is not sys.stdout:
+            destino_log.close()
+
+
+def main(argv=None) -> int:
+    parser = _crear_parser()
+    args = parser.parse_args(argv)
+    if args.sin_cache_gema:
+        configurar_cache_gema(False)
+    if args.gema_sin_conexion:
+        configurar_modo_sin_conexion(True, Path(args.archivo_instantanea) if args.archivo_instantanea else None)
+    if args.servicio_correo:
+        return ejecutar_servicio_correo(args)
+    if args.instantanea_gema and args.gema_sin_conexion:
+        parser.error("--instantanea-gema descarga de GEMA en línea; no se combina con --gema-sin-conexion")
+    if not args.lote and not args.barrido_correos and not args.instantanea_gema and not (args.area and args.aseguradora and args.carpeta):
+        parser.error("se requiere --lote, --servicio-correo, --barrido-correos, --instantanea-gema o bien --area, --aseguradora y --carpeta")
+    try:
+        if args.instantanea_gema:
+            resumen = ejecutar_instantanea_gema(args)
+        elif args.barrido_correos:
+            resumen = ejecutar_barrido_correos(args)
+        else:
+            resumen = ejecutar_lote(args) if args.lote else ejecutar(args)
+    except (ValueError, FileNotFoundError, OSError) as e:
+        if args.barrido_correos:
+            resumen = {"raiz": args.barrido_correos, "errores_criticos": [str(e)]}
+        elif args.lote:
+            resumen = {"lote": args.lote, "errores_criticos": [str(e)]}
+        else:
+            resumen = {"area": args.area, "aseguradora": args.aseguradora, "carpeta": args.carpeta, "errores_criticos": [str(e)]}
+
+    texto = json.dumps(resumen, ensure_ascii=False)
+    if args.resumen_json:
+        Path(args.resumen_json).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+
+    if resumen["errores_criticos"]:
+        return 2
+    return 1 if resumen.get("fallos") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# Core/esperas.py
+"""
+Esperas basadas en eventos para los módulos de portales.
+
+Reemplazan los time.sleep fijos y los bucles de sondeo con is_visible: cada
+función termina en el momento en que el DOM cambia (o se cumple la condición)
+y solo agota su tiempo máximo cuando de verdad no pasa nada.
+
+Todas aceptan un Page o un Frame de Playwright y nunca lanzan por timeout:
+devuelven un valor que el módulo interpreta, igual que el resto de funciones
+del proyecto.
+"""
+from playwright.sync_api import Locator, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+# Resuelve con true en la primera mutación bajo el selector, o false al agotar el tiempo.
+_JS_ESPERAR_MUTACION = """([selector, timeout]) => new Promise(resolve => {
+    const objetivo = document.querySelector(selector);
+    if (!objetivo) { resolve(false); return; }
+    const observador = new MutationObserver(() => {
+        observador.disconnect(); clearTimeout(limite); resolve(true);
+    });
+    const limite = setTimeout(() => { observador.disconnect(); resolve(false); }, timeout);
+    observador.observe(objetivo, { childList: true, subtree: true, attributes: true, characterData: true });
+})"""
+
+# Resuelve con true cuando pasan 'quietud' ms sin mutaciones, o false al agotar el tiempo.
+_JS_ESPERAR_DOM_ESTABLE = """([selector, quietud, timeout]) => new Promise(resolve => {
+    const objetivo = document.querySelector(selector) || document.body;
+    let calma = null, limite = null;
+    const terminar = (valor) => {
+        observador.disconnect(); clearTimeout(calma); clearTimeout(limite); resolve(valor);
+    };
+    const observador = new MutationObserver(() => {
+        clearTimeout(calma); calma = setTimeout(() => terminar(true), quietud);
+    });
+    calma = setTimeout(() => terminar(true), quietud);
+    limite = setTimeout(() => terminar(false), timeout);
+    observador.observe(objetivo, { childList: true, subtree: true, attributes: true, characterData: true });
+})"""
+
+
+def esperar_primero(opciones: dict[str, Locator], timeout_ms: int = 30000) -> str | None:
+    """
+    Espera a que CUALQUIERA de los localizadores sea visible y devuelve su nombre.
+    Si hay varios visibles gana el primero del diccionario. None si se agotó el tiempo.
+    """
+    # Solo las coincidencias visibles: un elemento oculto que aparezca antes en el DOM
+    # (plantilla, modal cerrado) no debe tapar a la opción que sí se muestra.
+    visibles = {nombre: locator.filter(visible=True) for nombre, locator in opciones.items()}
+    nombres = list(visibles)
+    combinado = visibles[nombres[0]]
+    for nombre in nombres[1:]:
+        combinado = combinado.or_(visibles[nombre])
+    try:
+        combinado.first.wait_for(state="visible", timeout=timeout_ms)
+    except PlaywrightTimeoutError:
+        return None
+    for nombre in nombres:
+        if visibles[nombre].count() > 0:
+            return nombre
+    return None
+
+
+def esperar_valor_vacio(locator: Locator, timeout_ms: int = 1500) -> bool:
+    """
+    Espera a que el campo quede sin valor. Vaciar un input no muta el DOM, así que
+    esperar_dom_estable no lo detecta; aquí se vigila el valor mismo. False si al
+    agotar el tiempo el campo sigue con valor.
+    """
+    try:
+        handle = locator.element_handle(timeout=timeout_ms)
+        locator.page.wait_for_function("campo => !campo.value", arg=handle, timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def esperar_oculto(locator: Locator, timeout_ms: int = 5000) -> bool:
+    """Espera a que el elemento desaparezca (o no exista). False si sigue visible."""
+    try:
+        locator.first.wait_for(state="hidden", timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def esperar_condicion(page, expresion_js: str, arg=None, timeout_ms: int = 30000, polling="raf"):
+    """
+    Espera a que la expresión JS devuelva un valor verdadero (wait_for_function).
+    Devuelve ese valor ya convertido a Python, o None si se agotó el tiempo.
+    """
+    try:
+        handle = page.wait_for_function(expresion_js, arg=arg, timeout=timeout_ms, polling=polling)
+        return handle.json_value()
+    except PlaywrightTimeoutError:
+        return None
+
+
+def esperar_mutacion(page, selector: str = "body", timeout_ms: int = 1000) -> bool:
+    """
+    Espera el primer cambio del DOM bajo 'selector' (MutationObserver). Útil tras un clic
+    que dispara un overlay o un re-render: termina apenas el portal reacciona.
+    """
+    try:
+        return bool(page.evaluate(_JS_ESPERAR_MUTACION, [selector, timeout_ms]))
+    except PlaywrightError:
+        # El contexto de ejecución se destruyó: hubo navegación, es decir, el DOM cambió.
+        return True
+
+
+def esperar_dom_estable(page, quietud_ms: int = 300, timeout_ms: int = 3000, selector: str = "body") -> bool:
+    """
+    Espera a que el DOM bajo 'selector' deje de cambiar durante 'quietud_ms'.
+    Reemplaza las pausas fijas tras postbacks, animaciones y recargas.
+    """
+    try:
+        return bool(page.evaluate(_JS_ESPERAR_DOM_ESTABLE, [selector, quietud_ms, timeout_ms]))
+    except PlaywrightError:
+        # Navegación en curso: se espera a que la nueva página cargue.
+        try:
+            page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+            return True
+        except PlaywrightError:
+            return False
@@ -0,0 +1,155 @@
+# Core/filtro_recursos.py
+"""
+Filtro de solicitudes de los portales (context.route).
+
+Al crear el contexto de navegador se instala una ruta que aborta los tipos de
+recurso no esenciales (videos, fuentes, imágenes de terceros) y los hosts de
+analítica y chat, según FILTRO_RECURSOS_POR_PORTAL. Cada recarga y navegación
+descarga menos, lo que acorta los reintentos de los módulos.
+
+La ruta no es '**/*': se registran expresiones regulares solo para los hosts
+bloqueados y las extensiones de los tipos bloqueados (FILTRO_EXTENSIONES_POR_TIPO).
+Playwright las evalúa sin pasar por Python, así que el documento, los XHR y los
+scripts del portal nunca llegan al handler.
+
+Como con el ritmo adaptativo, hay un filtro compartido por portal que cuenta lo
+bloqueado entre todos sus contextos; al final de la ejecución se reporta el total
+y los bytes ahorrados (estimados por tipo de recurso).
+"""
+import re
+import threading
+from urllib.parse import urlsplit
+
+from Configuracion.constantes import (
+    FILTRO_RECURSOS_ACTIVO,
+    FILTRO_RECURSOS_POR_PORTAL,
+    FILTRO_HOSTS_BLOQUEADOS,
+    FILTRO_BYTES_ESTIMADOS_POR_TIPO,
+    FILTRO_BYTES_ESTIMADOS_OTROS,
+    FILTRO_EXTENSIONES_POR_TIPO,
+)
+
+
+def _host_coincide(host: str, dominios) -> bool:
+    """True si el host es alguno de los dominios o un subdominio de ellos."""
+    return any(host == d or host.endswith("." + d) for d in dominios)
+
+
+class FiltroRecursos:
+    """Decide qué solicitudes abortar para un portal y cuenta lo bloqueado."""
+
+    def __init__(self, portal: str, config: dict):
+        self.portal = portal
+        self.dominios_propios = list(config.get("dominios_propios", []))
+        self.tipos_bloqueados = set(config.get("tipos_bloqueados", []))
+        self.tipos_bloqueados_terceros = set(config.get("tipos_bloqueados_terceros", []))
+        self.hosts_bloqueados = list(FILTRO_HOSTS_BLOQUEADOS) + list(config.get("hosts_bloqueados", []))
+        self._lock = threading.Lock()
+        self._bloqueadas = {}
+        self._permitidas = 0
+
+    def motivo_bloqueo(self, url: str, tipo: str) -> str | None:
+        """Devuelve el motivo para abortar la solicitud, o None si debe continuar."""
+        host = (urlsplit(url).hostname or "").lower()
+        if not host:
+            return None
+        if _host_coincide(host, self.hosts_bloqueados):
+            return "host"
+        if tipo in self.tipos_bloqueados:
+            return tipo
+        if tipo in self.tipos_bloqueados_terceros and not _host_coincide(host, self.dominios_propios):
+            return tipo
+        return None
+
+    def patrones_ruta(self) -> list:
+        """
+        Expresiones regulares de las URL que el handler debe revisar: los hosts bloqueados
+        (y sus subdominios) y las extensiones de los tipos bloqueados. Si un tipo bloqueado
+        no tiene extensiones conocidas no hay forma de acotarlo por URL y se revisa todo.
+        """
+        tipos = self.tipos_bloqueados | self.tipos_bloqueados_terceros
+        if any(tipo not in FILTRO_EXTENSIONES_POR_TIPO for tipo in tipos):
+            return [re.compile(r".*")]
+        patrones = []
+        if self.hosts_bloqueados:
+            hosts = "|".join(re.escape(h) for h in self.hosts_bloqueados)
+            patrones.append(re.compile(rf"^[a-z]+://([^/?#]*\.)?({hosts})(:\d+)?([/?#]|$)", re.IGNORECASE))
+        extensiones = sorted({ext for tipo in tipos for ext in FILTRO_EXTENSIONES_POR_TIPO[tipo]})
+        if extensiones:
+            patrones.append(re.compile(rf"^[^?#]*\.({'|'.join(extensiones)})([?#]|$)", re.IGNORECASE))
+        return patrones
+
+    def manejar_ruta(self, route):
+        """Handler de context.route: aborta o deja pasar la solicitud."""
+        request = route.request
+        tipo = request.resource_type
+        motivo = self.motivo_bloqueo(request.url, tipo)
+        if motivo is None:
+            with self._lock:
+                self._permitidas += 1
+            route.continue_()
+            return
+        with self._lock:
+            self._bloqueadas[tipo] = self._bloqueadas.get(tipo, 0) + 1
+        route.abort("blockedbyclient")
+
+    def bytes_ahorrados(self) -> int:
+        with self._lock:
+            return sum(
+                cantidad * FILTRO_BYTES_ESTIMADOS_POR_TIPO.get(tipo, FILTRO_BYTES_ESTIMADOS_OTROS)
+                for tipo, cantidad in self._bloqueadas.items()
+            )
+
+    def resumen(self) -> str | None:
+        """Una línea con lo bloqueado por tipo y los bytes estimados, o None si no se bloqueó nada."""
+        with self._lock:
+            if not self._bloqueadas:
+                return None
+            total = sum(self._bloqueadas.values())
+            detalle = ", ".join(f"{tipo}: {n}" for tipo, n in sorted(self._bloqueadas.items()))
+            permitidas = self._permitidas
+        mb = self.bytes_ahorrados() / (1024 * 1024)
+        return (
+            f"[FILTRO] {self.portal} -> {total} solicitudes bloqueadas de {total + permitidas} revisadas "
+            f"(~{mb:.1f} MB ahorrados, estimado) | {detalle}"
+        )
+
+
+_filtros: dict[str, FiltroRecursos] = {}
+_lock_registro = threading.Lock()
+
+
+def obtener_filtro(portal: str) -> FiltroRecursos | None:
+    """Devuelve el filtro compartido del portal, o None si el portal no tiene filtro configurado."""
+    if not FILTRO_RECURSOS_ACTIVO or portal not in FILTRO_RECURSOS_POR_PORTAL:
+        return None
+    with _lock_registro:
+        if portal not in _filtros:
+            _filtros[portal] = FiltroRecursos(portal, FILTRO_RECURSOS_POR_PORTAL[portal])
+        return _filtros[portal]
+
+
+def instalar_filtro(context, portal: str | None) -> str | None:
+    """Instala el filtro del portal en el contexto. Devuelve un mensaje de log o None si no aplica."""
+    filtro = obtener_filtro(portal) if portal else None
+    if filtro is None:
+        return None
+    for patron in filtro.patrones_ruta():
+        context.route(patron, filtro.manejar_ruta)
+    return f"[FILTRO] Filtro de recursos activo para '{portal}'."
+
+
+def reiniciar_filtros(portal: str | None = None):
+    """Descarta los contadores (de todos los portales o solo del indicado)."""
+    with _lock_registro:
+        if portal is None:
+            _filtros.clear()
+        else:
+            _filtros.pop(portal, None)
+
+
+def resumen_filtros(portal: str | None = None) -> list[str]:
+    """Líneas de resumen de los portales (o del portal indicado) que bloquearon solicitudes."""
+    with _lock_registro:
+        filtros = [f for p, f in _filtros.items() if portal is None or p == portal]
+    return [linea for linea in (f.resumen() for f in filtros) if linea]
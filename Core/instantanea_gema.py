@@ -0,0 +1,200 @@
+# Core/instantanea_gema.py
+"""
+Instantánea local de GEMA (glo_cab, glo_det y glo_red) en un archivo SQLite.
+
+Cuando el túnel ngrok a GEMA está caído o lento, Grupo SIS, el diagnóstico de
+Mundial Escolar y los scripts consultar_tipo_glosa se detienen. Con una instantánea
+tomada antes (por rango de fechas de glo_cab o por cuentas de cobro de glo_red) y el
+modo sin conexión activo (GEMA_MODO_SIN_CONEXION o '--gema-sin-conexion'),
+query_api_gema responde desde este archivo con el mismo SQL: se quita la ruta de la
+tabla ('[gema10.d/salud/datos/glo_cab]' -> glo_cab) y se ejecuta en SQLite.
+
+Al guardar, los textos se recortan (GEMA rellena los campos Character con espacios)
+y las claves numéricas (gl_docn, gr_docn, fc_docn) quedan como enteros, para que
+condiciones como 'fc_docn = 123' o 'gl_docn IN (...)' funcionen igual que en línea.
+
+La instantánea solo conoce lo que se descargó: una factura fuera del rango sale como
+inexistente. Sirve también como conjunto de datos reproducible para benchmarks.
+
+Uso: python -m Core.cli --instantanea-gema --desde 2024-01-01 --hasta 2024-06-30
+     python -m Core.cli --instantanea-gema --cuentas 1234 1235
+"""
+import datetime
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from Configuracion.constantes import GEMA_ARCHIVO_INSTANTANEA, GEMA_FORMATO_FECHA_SQL
+
+TABLAS_INSTANTANEA = ("glo_cab", "glo_det", "glo_red")
+COLUMNAS_CLAVE = ("gl_docn", "gr_docn", "fc_docn")
+INDICES = {
+    "glo_cab": [("fc_serie", "fc_docn"), ("gl_docn",), ("gl_fecha",)],
+    "glo_det": [("gl_docn",)],
+    "glo_red": [("gr_docn",), ("gl_docn",)],
+}
+
+
+def ruta_instantanea_gema() -> Path:
+    # Directorio base del proyecto. Sube dos niveles desde este archivo (Core/instantanea_gema.py -> proyecto/)
+    project_root = Path(__file__).resolve().parents[1]
+    return project_root / "Datos" / GEMA_ARCHIVO_INSTANTANEA
+
+
+def _identificador(nombre: str) -> str:
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _normalizar_valor(columna: str, valor):
+    if isinstance(valor, str):
+        valor = valor.strip()
+    if columna.lower() in COLUMNAS_CLAVE and valor not in (None, ""):
+        try:
+            return int(float(valor))
+        except (TypeError, ValueError):
+            pass
+    return valor
+
+
+def _sql_local(sql: str) -> str:
+    """
+    'cols FROM [gema10.d/salud/datos/glo_cab] WHERE ...' -> 'SELECT cols FROM "glo_cab" WHERE ...'.
+    El 'TOP n' de FoxPro (páginas de iterar_api_gema) se quita: SQLite no lo conoce y su
+    LIMIT no incluye empates, así que la primera página trae todo y la siguiente sale vacía.
+    """
+    def tabla_local(match):
+        tabla = match.group(1).rsplit("/", 1)[-1].strip().lower()
+        if tabla not in TABLAS_INSTANTANEA:
+            raise ValueError(f"La tabla '{tabla}' no está en la instantánea de GEMA.")
+        return f'"{tabla}"'
+    sql = re.sub(r"^TOP\s+\d+\s+", "", sql.strip().rstrip(";"), flags=re.IGNORECASE)
+    return "SELECT " + re.sub(r"\[([^\]]+)\]", tabla_local, sql)
+
+
+class InstantaneaGema:
+    """Lectura de una instantánea ya creada. Cada consulta abre su propia conexión (solo lectura)."""
+
+    def __init__(self, ruta: Path | None = None):
+        self.ruta = Path(ruta) if ruta else ruta_instantanea_gema()
+        if not self.ruta.exists():
+            raise FileNotFoundError(
+                f"No existe la instantánea de GEMA: {self.ruta}. Créala con 'python -m Core.cli --instantanea-gema'."
+            )
+
+    def consultar(self, sql_query: str) -> list[dict]:
+        """Responde una consulta de query_api_gema desde la instantánea."""
+        con = sqlite3.connect(f"{self.ruta.as_uri()}?mode=ro", uri=True, timeout=30)
+        try:
+            con.row_factory = sqlite3.Row
+            try:
+                return [dict(fila) for fila in con.execute(_sql_local(sql_query))]
+            except sqlite3.Error as e:
+                raise ValueError(f"La instantánea de GEMA no pudo responder la consulta: {e}")
+        finally:
+            con.close()
+
+    def metadatos(self) -> dict:
+        con = sqlite3.connect(f"{self.ruta.as_uri()}?mode=ro", uri=True, timeout=30)
+        try:
+            return dict(con.execute("SELECT clave, valor FROM instantanea").fetchall())
+        finally:
+            con.close()
+
+
+def _escribir_tabla(con, tabla: str, filas: list[dict]):
+    columnas = list(dict.fromkeys(c for fila in filas for c in fila)) or list(INDICES[tabla][0])
+    # Sin tipo declarado: SQLite guarda cada valor con el tipo que trae (como GEMA)
+    con.execute(f"CREATE TABLE {_identificador(tabla)} ({', '.join(_identificador(c) for c in columnas)})")
+    marcadores = ", ".join("?" for _ in columnas)
+    con.executemany(
+        f"INSERT INTO {_identificador(tabla)} VALUES ({marcadores})",
+        ([_normalizar_valor(c, fila.get(c)) for c in columnas] for fila in filas),
+    )
+    for indice in INDICES[tabla]:
+        if all(c in columnas for c in indice):
+            con.execute(
+                f"CREATE INDEX {_identificador('idx_' + tabla + '_' + '_'.join(indice))} "
+                f"ON {_identificador(tabla)} ({', '.join(_identificador(c) for c in indice)})"
+            )
+
+
+def crear_instantanea(desde: str | None = None, hasta: str | None = None, cuentas: list[int] | None = None,
+                      ruta: Path | None = None, progreso=None) -> dict:
+    """
+    Descarga de GEMA (sin caché) las filas de glo_cab, glo_det y glo_red de las glosas
+    con gl_fecha entre 'desde' y 'hasta' (AAAA-MM-DD), o de las cuentas de cobro
+    indicadas, y las guarda indexadas en 'ruta'. Se escribe en un archivo temporal y
+    se reemplaza al final: una instantánea en uso nunca queda a medias.
+
+    Returns:
+        Resumen con la ruta, el filtro usado y las filas por tabla.
+
+    Raises:
+        ValueError si no se da un rango completo de fechas ni cuentas (o el formato es
+        inválido), y las excepciones de query_api_gema si falla la descarga.
+    """
+    # Importación diferida: api_gema importa este módulo para el modo sin conexión
+    from .api_gema import TABLA_GLO_CAB, TABLA_GLO_DET, TABLA_GLO_RED, consultar_en_lotes, iterar_api_gema
+
+    avisar = progreso or (lambda mensaje: None)
+    ruta = Path(ruta) if ruta else ruta_instantanea_gema()
+    cuentas = sorted({int(c) for c in cuentas or []})
+    if not cuentas and not (desde and hasta):
+        raise ValueError("Indica un rango de fechas (desde y hasta) o al menos una cuenta de cobro.")
+    inicio = time.time()
+
+    if cuentas:
+        avisar(f"[INSTANTÁNEA GEMA] Leyendo glo_red de {len(cuentas)} cuenta(s)...")
+        filas_red = consultar_en_lotes(f"* FROM {TABLA_GLO_RED} WHERE gr_docn IN ({{valores}})", cuentas, usar_cache=False)
+        gl_docns = sorted({int(float(f["gl_docn"])) for f in filas_red if str(f.get("gl_docn") or "").strip()})
+        avisar(f"[INSTANTÁNEA GEMA] {len(gl_docns)} glosa(s). Leyendo glo_cab...")
+        filas_cab = consultar_en_lotes(f"* FROM {TABLA_GLO_CAB} WHERE gl_docn IN ({{valores}})", gl_docns, usar_cache=False)
+    else:
+        fecha_desde = datetime.date.fromisoformat(desde).isoformat()
+        fecha_hasta = datetime.date.fromisoformat(hasta).isoformat()
+        avisar(f"[INSTANTÁNEA GEMA] Leyendo glo_cab del {fecha_desde} al {fecha_hasta}...")
+        filas_cab = list(iterar_api_gema(
+            "*", TABLA_GLO_CAB,
+            f"gl_fecha BETWEEN {GEMA_FORMATO_FECHA_SQL.format(fecha=fecha_desde)} "
+            f"AND {GEMA_FORMATO_FECHA_SQL.format(fecha=fecha_hasta)}",
+            clave="gl_docn", usar_cache=False,
+        ))
+        gl_docns = sorted({int(float(f["gl_docn"])) for f in filas_cab if str(f.get("gl_docn") or "").strip()})
+        avisar(f"[INSTANTÁNEA GEMA] {len(gl_docns)} glosa(s). Leyendo glo_red...")
+        filas_red = consultar_en_lotes(f"* FROM {TABLA_GLO_RED} WHERE gl_docn IN ({{valores}})", gl_docns, usar_cache=False)
+
+    avisar(f"[INSTANTÁNEA GEMA] Leyendo glo_det de {len(gl_docns)} glosa(s)...")
+    filas_det = consultar_en_lotes(f"* FROM {TABLA_GLO_DET} WHERE gl_docn IN ({{valores}})", gl_docns, usar_cache=False)
+
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    temporal.unlink(missing_ok=True)
+    filtro = f"cuentas {', '.join(map(str, cuentas))}" if cuentas else f"gl_fecha {desde} a {hasta}"
+    con = sqlite3.connect(temporal)
+    try:
+        with con:
+            for tabla, filas in (("glo_cab", filas_cab), ("glo_det", filas_det), ("glo_red", filas_red)):
+                _escribir_tabla(con, tabla, filas)
+            con.execute("CREATE TABLE instantanea (clave TEXT PRIMARY KEY, valor TEXT)")
+            con.executemany("INSERT INTO instantanea VALUES (?, ?)", [
+                ("creada", datetime.datetime.now().isoformat(timespec="seconds")),
+                ("filtro", filtro),
+            ])
+    finally:
+        con.close()
+    os.replace(temporal, ruta)
+
+    resumen = {
+        "ruta": str(ruta),
+        "filtro": filtro,
+        "filas": {"glo_cab": len(filas_cab), "glo_det": len(filas_det), "glo_red": len(filas_red)},
+        "duracion_segundos": round(time.time() - inicio, 1),
+        "errores_criticos": [],
+    }
+    avisar(
+        f"[INSTANTÁNEA GEMA] Guardada en {ruta}: {len(filas_cab)} glo_cab, "
+        f"{len(filas_det)} glo_det, {len(filas_red)} glo_red."
+    )
+    return resumen
@@ -0,0 +1,152 @@
+# Core/linea_tiempo.py
+"""
+Línea de tiempo de la ejecución: tramos medidos por fase, carpeta y portal.
+
+Los módulos envuelven cada fase con `with tramo("subida"):`. Si no hay una
+ejecución activa (por ejemplo al llamar un módulo desde una prueba manual),
+tramo() no hace nada. La línea activa y la carpeta actual se guardan por hilo:
+así los contextos de navegador y los hilos de preparación no se mezclan, y el
+planificador de lotes puede correr varios portales a la vez, cada uno con su
+propia línea de tiempo.
+
+Al terminar, run_automation exporta la línea de tiempo completa (JSONL) y un
+resumen por portal y fase (CSV) junto a resultados_automatizacion.json.
+"""
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from Configuracion.constantes import ARCHIVO_LINEA_TIEMPO, ARCHIVO_RESUMEN_LINEA_TIEMPO
+
+
+class LineaTiempo:
+    """Acumula los tramos de una ejecución. Seguro para varios hilos."""
+
+    def __init__(self, portal: str):
+        self.portal = portal
+        self._lock = threading.Lock()
+        self._tramos = []
+
+    def registrar(self, fase: str, inicio: float, fin: float, ok: bool = True):
+        tramo = {
+            "portal": self.portal,
+            "carpeta": getattr(_local, "carpeta", None),
+            "hilo": threading.current_thread().name,
+            "fase": fase,
+            "inicio": round(inicio, 3),
+            "fin": round(fin, 3),
+            "duracion_segundos": round(fin - inicio, 3),
+            "ok": ok,
+        }
+        with self._lock:
+            self._tramos.append(tramo)
+
+    def resumen(self) -> list[dict]:
+        """Agrega los tramos por portal y fase: cantidad, total, promedio y máximo."""
+        with self._lock:
+            tramos = list(self._tramos)
+        grupos = {}
+        for t in tramos:
+            grupos.setdefault((t["portal"], t["fase"]), []).append(t)
+        filas = []
+        for (portal, fase), lista in sorted(grupos.items()):
+            duraciones = [t["duracion_segundos"] for t in lista]
+            filas.append({
+                "portal": portal,
+                "fase": fase,
+                "cantidad": len(lista),
+                "fallidos": sum(1 for t in lista if not t["ok"]),
+                "total_segundos": round(sum(duraciones), 2),
+                "promedio_segundos": round(sum(duraciones) / len(duraciones), 2),
+                "maximo_segundos": round(max(duraciones), 2),
+            })
+        return filas
+
+    def exportar(self, carpeta_destino: Path) -> str:
+        """Escribe la línea de tiempo (JSONL) y el resumen (CSV). Devuelve un mensaje de log."""
+        with self._lock:
+            tramos = sorted(self._tramos, key=lambda t: t["inicio"])
+        if not tramos:
+            return "[INFO] Línea de tiempo vacía: no se exportó."
+        try:
+            ruta_jsonl = Path(carpeta_destino) / ARCHIVO_LINEA_TIEMPO
+            with open(ruta_jsonl, "w", encoding="utf-8") as f:
+                for t in tramos:
+                    f.write(json.dumps(t, ensure_ascii=False) + "\n")
+
+            filas = self.resumen()
+            ruta_csv = Path(carpeta_destino) / ARCHIVO_RESUMEN_LINEA_TIEMPO
+            with open(ruta_csv, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(filas[0].keys()))
+                writer.writeheader()
+                writer.writerows(filas)
+            return f"[INFO] Línea de tiempo guardada en: {ruta_jsonl.name} y {ruta_csv.name}"
+        except OSError as e:
+            return f"[ADVERTENCIA] No se pudo exportar la línea de tiempo: {e}"
+
+
+_local = threading.local()
+
+
+def iniciar_linea_tiempo(portal: str) -> LineaTiempo:
+    """Comienza una línea de tiempo nueva y la activa en este hilo."""
+    linea = LineaTiempo(portal)
+    _local.linea = linea
+    return linea
+
+
+def activar_linea_tiempo(linea: LineaTiempo | None):
+    """Registra los tramos de este hilo en 'linea' (para los hilos que lanza la ejecución)."""
+    _local.linea = linea
+
+
+def finalizar_linea_tiempo():
+    """Deja de registrar tramos en este hilo."""
+    _local.linea = None
+
+
+def establecer_carpeta(carpeta: str | None):
+    """Asocia los tramos de este hilo a una carpeta (None para tramos generales)."""
+    _local.carpeta = carpeta
+
+
+@contextmanager
+def tramo(fase: str):
+    """Mide la fase en la línea de tiempo activa. Si la fase lanza, queda marcada como fallida."""
+    linea = getattr(_local, "linea", None)
+    if linea is None:
+        yield
+        return
+    inicio = time.time()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        linea.registrar(fase, inicio, time.time(), ok)
+
+
+class FasesSecuenciales:
+    """
+    Para funciones largas y lineales: cada iniciar() cierra la fase anterior, así
+    no hace falta anidar todo el cuerpo en bloques 'with'. Llamar cerrar() al final.
+    """
+
+    def __init__(self):
+        self._fase = None
+        self._inicio = None
+
+    def iniciar(self, fase: str):
+        self.cerrar()
+        self._fase, self._inicio = fase, time.time()
+
+    def cerrar(self, ok: bool = True):
+        linea = getattr(_local, "linea", None)
+        if self._fase and linea is not None:
+            linea.registrar(self._fase, self._inicio, time.time(), ok)
+        self._fase = None
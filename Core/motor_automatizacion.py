@@ -0,0 +1,667 @@
+# Core/motor_automatizacion.py
+"""
+Motor de automatización sin dependencias de Qt.
+
+Contiene toda la lógica de run_automation, run_grupo_sis_automation y
+run_mundial_escolar_automation. Lo usan tanto la GUI (a través del adaptador
+TrabajadorAutomatizacion) como la línea de comandos (Core/cli.py).
+"""
+
+import os
+import time
+import traceback
+import importlib
+from pathlib import Path
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Automatizaciones.glosas import mundial_escolar
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
+from Configuracion.constantes import MUNDIAL_ESCOLAR_URL
+
+# Importaciones de configuración y otros trabajadores
+from Configuracion.constantes import (
+    AREA_GLOSAS_ID,
+    AREA_FACTURACION_ID,
+    ASEGURADORAS_CON_EMAIL_LISTENER,
+    EMAIL_MODO_SERVICIO,
+    PREVISORA_ID,
+    MUNDIAL_ESCOLAR_ID,
+    GRUPO_SIS_ID,
+    MUNDIAL_ESCOLAR_SEDE1_USER,
+    MUNDIAL_ESCOLAR_SEDE1_PASS,
+    MUNDIAL_ESCOLAR_SEDE2_USER,
+    MUNDIAL_ESCOLAR_SEDE2_PASS,
+    CONTEXTOS_NAVEGADOR_POR_ASEGURADORA,
+    CONTEXTOS_NAVEGADOR_POR_DEFECTO,
+    HILOS_PREPARACION_CARPETAS
+)
+from .senales import Senal
+from .trabajador_email import EmailListenerWorker
+from .servicio_correo import registrar_radicado_pendiente
+from .utilidades import consolidar_radicados_pdf, separar_carpetas_por_sede
+from .sesiones import ruta_estado_sesion, crear_contexto, guardar_estado_sesion
+from .bitacora import BitacoraTrabajos
+from .ritmo import reiniciar_ritmos, resumen_ritmos
+from .filtro_recursos import reiniciar_filtros, resumen_filtros
+from .api_gema import resumen_cache_gema
+from .linea_tiempo import iniciar_linea_tiempo, activar_linea_tiempo, finalizar_linea_tiempo, establecer_carpeta, tramo
+from Automatizaciones.glosas import mundial_escolar
+
+class MotorAutomatizacion:
+    def __init__(self, area_id, aseguradora_id, carpeta_contenedora, modo_headless, input_glosas=None, modo_grupo_sis="glosas", num_contextos=None, reanudar=False):
+        # --- Señales de progreso (mismas firmas que las señales Qt de la GUI) ---
+        self.progreso_update = Senal()                 # (str)
+        self.finalizado = Senal()                      # (exitos, fallos, omit_rad, omit_dup, email_fallos)
+        self.error_critico = Senal()                   # (str)
+
+        self.area_id = area_id
+        self.aseguradora_id = aseguradora_id
+        self.carpeta_contenedora_path = Path(carpeta_contenedora).resolve()
+        self.headless_mode = modo_headless
+        self.input_glosas = input_glosas
+        self.modo_grupo_sis = modo_grupo_sis
+        self.email_job_queue = queue.Queue()
+        self.email_final_failures = []
+        self.email_thread = None
+        self.email_worker = None
+        # Modo servicio: radicados anotados en la tabla de pendientes de correo en esta ejecución
+        self.email_registrados = 0
+
+        # Número de contextos de navegador (sesiones) que procesan carpetas en paralelo
+        if num_contextos is None:
+            num_contextos = CONTEXTOS_NAVEGADOR_POR_ASEGURADORA.get(aseguradora_id, CONTEXTOS_NAVEGADOR_POR_DEFECTO)
+        self.num_contextos = max(1, int(num_contextos))
+        # Protege contadores y listas de reporte cuando varios contextos escriben a la vez
+        self._lock_resultados = threading.Lock()
+        self.contadores = {"exitos": 0, "fallos": 0, "omit_rad": 0, "omit_dup": 0}
+        self._estados = {}
+
+        # Bitácora a prueba de caídas y modo reanudar
+        self.reanudar = reanudar
+        self.bitacora = None
+        # Línea de tiempo de esta ejecución; los hilos que lanza el motor la activan para sí
+        self.linea_tiempo = None
+
+        # Listas para la nueva reportería estructurada
+        self.resultados_exitosos = []
+        self.reporte_fallos = []
+        self.reporte_omitidos = []
+
+    def handle_email_failures(self, failed_jobs):
+        """Recibe la lista de fallos definitivos del hilo de email."""
+        self.email_final_failures = failed_jobs
+
+    def _iniciar_email_listener_si_es_necesario(self):
+        """Inicia el hilo de escucha de email solo para las aseguradoras que lo requieren."""
+        if self.aseguradora_id in ASEGURADORAS_CON_EMAIL_LISTENER and EMAIL_MODO_SERVICIO:
+            # El servicio de correo (Core/servicio_correo.py) adjunta los PDFs; la ejecución no lo espera
+            self.progreso_update.emit("[INFO] Los correos de esta aseguradora los resuelve el servicio de correo en segundo plano.")
+        elif self.aseguradora_id in ASEGURADORAS_CON_EMAIL_LISTENER:
+            self.progreso_update.emit("[INFO] Esta aseguradora requiere el listener de email. Iniciando hilo...")
+            self.email_worker = EmailListenerWorker(self.email_job_queue)
+            self.email_worker.progreso_update.connect(self.progreso_update.emit)
+            self.email_worker.finished.connect(self.handle_email_failures)
+            self.email_thread = threading.Thread(target=self.email_worker.run, name="email_listener", daemon=True)
+            self.email_thread.start()
+        else:
+            self.progreso_update.emit("[INFO] Esta aseguradora no requiere el listener de email.")
+
+    def _formatear_tiempo(self, total_segundos: float) -> str:
+        """Formatea segundos en un string legible (horas, minutos, segundos)."""
+        if total_segundos < 0: return "0 segundos"
+        segundos_enteros = int(total_segundos)
+        horas = segundos_enteros // 3600; segundos_enteros %= 3600
+        minutos = segundos_enteros // 60; segundos = segundos_enteros % 60
+        partes = []
+        if horas > 0: partes.append(f"{horas} hora{'s' if horas != 1 else ''}")
+        if minutos > 0: partes.append(f"{minutos} minuto{'s' if minutos != 1 else ''}")
+        if segundos > 0 or not partes: partes.append(f"{segundos} segundo{'s' if segundos != 1 else ''}")
+        return ", ".join(partes)
+
+    def _cargar_modulo_automatizacion(self):
+        """Importa el módulo de la aseguradora y guarda sus estados para clasificar resultados."""
+        module_path = f"Automatizaciones.{self.area_id}.{self.aseguradora_id}"
+        try:
+            automation_module = importlib.import_module(module_path)
+            # Validamos que existan las funciones requeridas antes de abrir navegadores
+            automation_module.login
+            automation_module.navegar_a_inicio
+            automation_module.procesar_carpeta
+            self._estados = {
+                "exito": automation_module.ESTADO_EXITO,
+                "fallo": automation_module.ESTADO_FALLO,
+                "omit_rad": getattr(automation_module, 'ESTADO_OMITIDO_RADICADO', 'OMITIDO_RAD'),
+                "omit_dup": getattr(automation_module, 'ESTADO_OMITIDO_DUPLICADA', 'OMITIDO_DUP'),
+            }
+        except (ImportError, AttributeError) as e:
+            raise Exception(f"No se pudo cargar la implementación para '{self.area_id}/{self.aseguradora_id}': {e}")
+        return automation_module
+
+    def _descubrir_trabajos(self) -> list[tuple[Path, str]]:
+        """Lista las subcarpetas a procesar junto con su contexto ('default' o 'aceptadas')."""
+        jobs = []
+        root_path = self.carpeta_contenedora_path
+        self.progreso_update.emit(f"Analizando carpetas en: {root_path}")
+
+        for item in root_path.iterdir():
+            if not item.is_dir():
+                continue
+
+            # Caso especial para la carpeta 'aceptadas'
+            if item.name.lower() == 'aceptadas':
+                self.progreso_update.emit("  -> Carpeta 'aceptadas' encontrada. Buscando subcarpetas...")
+                for sub_item in item.iterdir():
+                    if sub_item.is_dir():
+                        jobs.append((sub_item, 'aceptadas'))
+            else:
+                # Caso para las carpetas normales en la raíz
+                jobs.append((item, 'default'))
+        
+        # Ordenar los trabajos para asegurar que 'default' se procese antes que 'aceptadas'
+        sort_order = {'default': 0, 'aceptadas': 1}
+        jobs.sort(key=lambda x: (sort_order.get(x[1], 99), int(x[0].name) if x[0].name.isdigit() else float('inf')))
+
+        self.progreso_update.emit(f"Se procesarán {len(jobs)} subcarpetas en total." if jobs else "No hay subcarpetas para procesar.")
+        return jobs
+
+    def _clave_carpeta(self, subfolder_path: Path) -> str:
+        """Ruta relativa a la carpeta contenedora (p. ej. '123' o 'aceptadas/123')."""
+        return subfolder_path.relative_to(self.carpeta_contenedora_path).as_posix()
+
+    def _preparar_carpeta_medida(self, preparar_func, subfolder_path: Path, context: str):
+        """Ejecuta preparar_carpeta en el pool registrando sus tramos a nombre de la carpeta."""
+        activar_linea_tiempo(self.linea_tiempo)
+        establecer_carpeta(self._clave_carpeta(subfolder_path))
+        try:
+            with tramo("preparacion"):
+                return preparar_func(subfolder_path, subfolder_path.name, context)
+        finally:
+            establecer_carpeta(None)
+            activar_linea_tiempo(None)
+
+    def _clasificar_estado(self, estado) -> str | None:
+        """Traduce el estado devuelto por el módulo a 'exito', 'fallo', 'omit_rad' u 'omit_dup'."""
+        for clase, valor in self._estados.items():
+            if estado == valor:
+                return clase
+        return None
+
+    def _pdf_correo_guardado(self, subfolder_path: Path, radicado) -> bool:
+        """True si la carpeta ya tiene el PDF (no vacío) del correo de ese radicado."""
+        return any(
+            str(radicado) in pdf.name and pdf.stat().st_size > 0
+            for pdf in subfolder_path.glob("*.pdf") if pdf.is_file()
+        )
+
+    def _registrar_resultado(self, subfolder_path: Path, estado, radicado, codigo_factura, log_carpeta,
+                             context='default', inicio=None, fin=None, desde_bitacora=False):
+        """
+        Clasifica el resultado de una carpeta. Es seguro llamarlo desde varios contextos a la vez.
+        Los resultados nuevos se escriben primero en la bitácora; los recuperados de ella no se reescriben.
+        """
+        clase = self._clasificar_estado(estado)
+        with self._lock_resultados:
+            if self.bitacora and not desde_bitacora:
+                self.bitacora.registrar({
+                    "carpeta": self._clave_carpeta(subfolder_path),
+                    "contexto": context,
+                    "estado": estado,
+                    "clase": clase,
+                    "radicado": radicado,
+                    "factura": codigo_factura,
+                    "inicio": inicio,
+                    "fin": fin,
+                    "duracion_segundos": round(fin - inicio, 2) if inicio and fin else None,
+                    "log": log_carpeta,
+                })
+
+            if not desde_bitacora:
+                self.progreso_update.emit(log_carpeta)
+
+            # Clasificación de resultados para reportes separados
+            if clase == "exito":
+                self.contadores["exitos"] += 1
+                # Un éxito recuperado de la bitácora vuelve a esperar su correo si el PDF aún no está en la carpeta
+                esperar_correo = not desde_bitacora or (radicado and not self._pdf_correo_guardado(subfolder_path, radicado))
+                if esperar_correo and self.email_thread and self.email_thread.is_alive():
+                    self.email_job_queue.put((radicado, subfolder_path))
+                elif esperar_correo and radicado and EMAIL_MODO_SERVICIO and self.aseguradora_id in ASEGURADORAS_CON_EMAIL_LISTENER:
+                    try:
+                        registrar_radicado_pendiente(radicado, subfolder_path)
+                        self.email_registrados += 1
+                    except Exception as e:
+                        self.progreso_update.emit(f"[ADVERTENCIA] No se pudo anotar el radicado {radicado} para el servicio de correo: {e}")
+                self.resultados_exitosos.append({"subcarpeta": subfolder_path.name, "factura": codigo_factura, "radicado": radicado})
+            elif clase == "fallo":
+                self.contadores["fallos"] += 1
+                self.reporte_fallos.append(log_carpeta)
+            elif clase == "omit_rad":
+                self.contadores["omit_rad"] += 1
+                motivo = log_carpeta.strip().split('\n')[-1]
+                self.reporte_omitidos.append(f"Carpeta: {subfolder_path.name:<15} -> {motivo}")
+            elif clase == "omit_dup":
+                self.contadores["omit_dup"] += 1
+                motivo = log_carpeta.strip().split('\n')[-1]
+                self.reporte_omitidos.append(f"Carpeta: {subfolder_path.name:<15} -> {motivo}")
+
+    def _recuperar_de_bitacora(self, jobs: list[tuple[Path, str]]) -> list[tuple[Path, str]]:
+        """
+        Modo reanudar: reconstruye los resultados de las carpetas ya terminadas según la
+        bitácora y devuelve solo los trabajos pendientes. Las carpetas fallidas se reintentan.
+        """
+        entradas = self.bitacora.ultimas_por_carpeta()
+        pendientes = []
+        recuperadas = 0
+        for subfolder_path, context in jobs:
+            clave = self._clave_carpeta(subfolder_path)
+            entrada = entradas.get(clave)
+            if entrada and entrada.get("clase") in ("exito", "omit_rad", "omit_dup"):
+                self._registrar_resultado(
+                    subfolder_path, self._estados[entrada["clase"]], entrada.get("radicado"),
+                    entrada.get("factura"), entrada.get("log", ""), context=context, desde_bitacora=True
+                )
+                recuperadas += 1
+            else:
+                pendientes.append((subfolder_path, context))
+        self.progreso_update.emit(f"[REANUDAR] {recuperadas} carpetas recuperadas de la bitácora. Pendientes: {len(pendientes)}.")
+        return pendientes
+
+    def _trabajador_navegador(self, id_contexto, num_contextos, cola_trabajos, automation_module, total_trabajos):
+        """
+        Abre un navegador con su propio contexto, inicia sesión y consume carpetas
+        de la cola compartida hasta vaciarla.
+
+        Cada contexto usa su propia instancia de Playwright porque la API síncrona
+        no puede compartirse entre hilos.
+        """
+        prefijo = f"[Contexto {id_contexto}] " if num_contextos > 1 else ""
+        with sync_playwright() as p:
+            # Sin slow_mo: las pausas solo se aplican a los pasos inestables (ver Core/ritmo.py)
+            browser = p.chromium.launch(headless=self.headless_mode)
+            try:
+                # Sesión persistida: solo los módulos que saben verificarla la reutilizan
+                verificar_sesion_func = getattr(automation_module, 'verificar_sesion', None)
+                ruta_sesion = None
+                if verificar_sesion_func:
+                    usuario_sesion = getattr(automation_module, 'USUARIO_SESION', 'default')
+                    ruta_sesion = ruta_estado_sesion(self.aseguradora_id, usuario_sesion)
+
+                context, sesion_cargada, sesion_log = crear_contexto(browser, ruta_sesion, portal=self.aseguradora_id)
+                self.progreso_update.emit(prefijo + sesion_log)
+                page = context.new_page()
+
+                sesion_ok = False
+                if sesion_cargada:
+                    with tramo("verificar_sesion"):
+                        sesion_ok, verif_log = verificar_sesion_func(page)
+                    self.progreso_update.emit(prefijo + verif_log)
+
+                if not sesion_ok:
+                    with tramo("login"):
+                        login_ok, login_log = automation_module.login(page)
+                    self.progreso_update.emit(prefijo + login_log)
+                    if not login_ok: raise Exception(f"{prefijo}Login fallido.")
+                    if ruta_sesion:
+                        self.progreso_update.emit(prefijo + guardar_estado_sesion(context, ruta_sesion))
+
+                with tramo("navegar_a_inicio"):
+                    nav_ok, nav_log = automation_module.navegar_a_inicio(page)
+                self.progreso_update.emit(prefijo + nav_log)
+                if not nav_ok: raise Exception(f"{prefijo}Navegación inicial fallida.")
+
+                while True:
+                    try:
+                        indice, (subfolder_path, context, preparacion_futura) = cola_trabajos.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    self.progreso_update.emit(f"\n>>> {prefijo}Procesando Carpeta {indice}/{total_trabajos}: '{subfolder_path.name}' (Contexto: {context})")
+                    
+                    inicio = time.time()
+                    establecer_carpeta(self._clave_carpeta(subfolder_path))
+                    kwargs_preparacion = {}
+                    if preparacion_futura is not None:
+                        # La etapa local ya corre en el pool; normalmente ya terminó.
+                        try:
+                            with tramo("espera_preparacion"):
+                                preparacion = preparacion_futura.result()
+                        except Exception as e:
+                            traceback.print_exc()
+                            preparacion = (self._estados["fallo"], None, None, f"ERROR preparando la carpeta '{subfolder_path.name}': {e}")
+                        # Si la carpeta quedó omitida o fallida, procesar_carpeta retorna sin usar el navegador.
+                        kwargs_preparacion["preparacion"] = preparacion
+
+                    # Llamada a la función con el nuevo argumento de contexto
+                    try:
+                        with tramo("procesar_carpeta"):
+                            estado, radicado, codigo_factura, log_carpeta = automation_module.procesar_carpeta(page, subfolder_path, subfolder_path.name, context=context, **kwargs_preparacion)
+                    except Exception as e:
+                        # El navegador de este contexto quedó inservible: la carpeta se reporta como fallo
+                        log_error = f"{prefijo}ERROR CRÍTICO procesando '{subfolder_path.name}': {e}"
+                        self._registrar_resultado(subfolder_path, self._estados["fallo"], None, None, log_error,
+                                                  context=context, inicio=inicio, fin=time.time())
+                        raise
+                    self._registrar_resultado(subfolder_path, estado, radicado, codigo_factura, log_carpeta,
+                                              context=context, inicio=inicio, fin=time.time())
+                    establecer_carpeta(None)
+            finally:
+                establecer_carpeta(None)
+                browser.close()
+
+    def _ejecutar_trabajador_navegador(self, id_contexto, num_contextos, cola_trabajos, automation_module, total_trabajos, errores):
+        """Envoltorio para hilos: un contexto que falla no detiene a los demás."""
+        activar_linea_tiempo(self.linea_tiempo)
+        try:
+            self._trabajador_navegador(id_contexto, num_contextos, cola_trabajos, automation_module, total_trabajos)
+        except Exception as e:
+            traceback.print_exc()
+            errores.append(f"  - Contexto {id_contexto}: {e}")
+        finally:
+            activar_linea_tiempo(None)
+
+    def run_automation(self):
+        """El método principal que orquesta todo el proceso de automatización."""
+        self.progreso_update.emit(f"--- INICIANDO AUTOMATIZACIÓN ---")
+        self.progreso_update.emit(f"Área: '{self.area_id}', Aseguradora: '{self.aseguradora_id}'")
+
+        # Inicializar contadores y listas de reporte para esta ejecución
+        self.contadores = {"exitos": 0, "fallos": 0, "omit_rad": 0, "omit_dup": 0}
+        start_time = time.time()
+        self.resultados_exitosos = []
+        self.reporte_fallos = []
+        self.reporte_omitidos = []
+
+        if self.aseguradora_id == MUNDIAL_ESCOLAR_ID:
+            self.run_mundial_escolar_automation()
+            return
+
+        if self.aseguradora_id == GRUPO_SIS_ID:
+            self.run_grupo_sis_automation()
+            return
+
+        self._iniciar_email_listener_si_es_necesario()
+        reiniciar_ritmos(self.aseguradora_id)
+        reiniciar_filtros(self.aseguradora_id)
+        self.linea_tiempo = linea_tiempo = iniciar_linea_tiempo(self.aseguradora_id)
+        pool_preparacion = None
+        
+        try:
+            # Carga dinámica del módulo de automatización específico
+            automation_module = self._cargar_modulo_automatizacion()
+
+            with tramo("descubrimiento"):
+                jobs = self._descubrir_trabajos()
+            self.bitacora = BitacoraTrabajos(self.carpeta_contenedora_path, reanudar=self.reanudar)
+            if self.reanudar:
+                jobs = self._recuperar_de_bitacora(jobs)
+
+            if jobs:
+                # Etapa de preparación: la parte local de cada carpeta corre por adelantado en un pool,
+                # en el mismo orden en que el navegador consumirá la cola.
+                preparar_func = getattr(automation_module, 'preparar_carpeta', None)
+                if preparar_func:
+                    pool_preparacion = ThreadPoolExecutor(max_workers=HILOS_PREPARACION_CARPETAS, thread_name_prefix="preparacion")
+                    self.progreso_update.emit(f"[INFO] Preparación anticipada de carpetas con {HILOS_PREPARACION_CARPETAS} hilos.")
+
+                # Cola compartida: cada contexto de navegador toma el siguiente trabajo libre.
+                cola_trabajos = queue.Queue()
+                for i, (subfolder_path, context) in enumerate(jobs):
+                    preparacion_futura = None
+                    if pool_preparacion:
+                        preparacion_futura = pool_preparacion.submit(self._preparar_carpeta_medida, preparar_func, subfolder_path, context)
+                    cola_trabajos.put((i + 1, (subfolder_path, context, preparacion_futura)))
+
+                num_contextos = max(1, min(self.num_contextos, len(jobs)))
+                self.progreso_update.emit(f"[INFO] Contextos de navegador en paralelo: {num_contextos}")
+
+                if num_contextos == 1:
+                    # Un solo contexto: se ejecuta en este mismo hilo, como siempre.
+                    self._trabajador_navegador(1, num_contextos, cola_trabajos, automation_module, len(jobs))
+                else:
+                    errores_contextos = []
+                    hilos = []
+                    for id_contexto in range(1, num_contextos + 1):
+                        hilo = threading.Thread(
+                            target=self._ejecutar_trabajador_navegador,
+                            args=(id_contexto, num_contextos, cola_trabajos, automation_module, len(jobs), errores_contextos),
+                            daemon=True,
+                        )
+                        hilos.append(hilo)
+                        hilo.start()
+                    for hilo in hilos:
+                        hilo.join()
+
+                    if errores_contextos:
+                        self.progreso_update.emit("[ADVERTENCIA] Contextos con error:\n" + "\n".join(errores_contextos))
+                    # Si todos los contextos fallaron, ninguna carpeta pendiente será procesada.
+                    if len(errores_contextos) == num_contextos and not cola_trabajos.empty():
+                        raise Exception("Todos los contextos de navegador fallaron:\n" + "\n".join(errores_contextos))
+
+            # Ejecución completa y sin fallos: no queda nada que reanudar
+            if (not jobs or cola_trabajos.empty()) and self.contadores["fallos"] == 0:
+                self.bitacora.descartar()
+
+        except Exception as e:
+            self.error_critico.emit(f"ERROR CRÍTICO DURANTE AUTOMATIZACIÓN:\n{e}\n{traceback.format_exc()}")
+        
+        finally:
+            if pool_preparacion:
+                # Si la ejecución se cortó, no tiene sentido seguir preparando carpetas
+                pool_preparacion.shutdown(wait=True, cancel_futures=True)
+
+            # Esperar a que el hilo de email termine si fue iniciado
+            if self.email_thread and self.email_thread.is_alive():
+                self.email_job_queue.put(None)
+                self.email_thread.join(timeout=600)
+                if self.email_thread.is_alive():
+                    self.progreso_update.emit("[ADVERTENCIA] El hilo de email tardó demasiado en terminar.")
+                self.progreso_update.emit("Listener de email finalizado.")
+            
+            exitos, fallos = self.contadores["exitos"], self.contadores["fallos"]
+            omit_rad, omit_dup = self.contadores["omit_rad"], self.contadores["omit_dup"]
+
+            # --- Generación de Reportes Estructurados ---
+            self.progreso_update.emit("\nGenerando archivos de reporte...")
+
+            if self.resultados_exitosos:
+                ruta_json = self.carpeta_contenedora_path / "resultados_automatizacion.json"
+                with open(ruta_json, "w", encoding="utf-8") as f: json.dump(self.resultados_exitosos, f, indent=4)
+                self.progreso_update.emit("[INFO] Reporte de éxitos (JSON) guardado.")
+
+            if self.reporte_fallos:
+                ruta_fallos = self.carpeta_contenedora_path / "reporte_FALLOS.txt"
+                with open(ruta_fallos, "w", encoding="utf-8") as f:
+                    f.write(f"--- REPORTE DE {len(self.reporte_fallos)} CARPETAS CON ERRORES ---\n")
+                    f.write("\n" + ("=" * 70) + "\n\n")
+                    f.write(("\n" + ("=" * 70) + "\n\n").join(self.reporte_fallos))
+                self.progreso_update.emit(f"[INFO] Reporte de fallos guardado en: reporte_FALLOS.txt")
+
+            if self.reporte_omitidos:
+                ruta_omitidos = self.carpeta_contenedora_path / "reporte_OMITIDOS.txt"
+                with open(ruta_omitidos, "w", encoding="utf-8") as f:
+                    f.write(f"--- REPORTE DE {omit_rad + omit_dup} CARPETAS OMITIDAS ---\n\n")
+                    f.write("\n".join(self.reporte_omitidos))
+                self.progreso_update.emit(f"[INFO] Reporte de omisiones guardado en: reporte_OMITIDOS.txt")
+            
+            # Línea de tiempo por fase, carpeta y portal
+            finalizar_linea_tiempo()
+            self.progreso_update.emit(linea_tiempo.exportar(self.carpeta_contenedora_path))
+
+            # Consolidación condicional de PDFs
+            if self.area_id == AREA_FACTURACION_ID and self.aseguradora_id == PREVISORA_ID and self.resultados_exitosos:
+                _, log_consolidacion = consolidar_radicados_pdf(self.carpeta_contenedora_path)
+                self.progreso_update.emit(log_consolidacion)
+            
+            # Compilación del resumen final para la GUI
+            total_time = time.time() - start_time
+            tiempo_formateado = self._formatear_tiempo(total_time)
+            email_fallos_count = len(self.email_final_failures)
+            
+            linea_sep = '\n' + ('=' * 45)
+            summary_lines = [
+                linea_sep,
+                "--- FIN DEL PROCESO DE AUTOMATIZACIÓN ---",
+                "\nResultados del Proceso Web:",
+                f"  - Éxitos: \t\t{exitos}",
+                f"  - Fallos: \t\t{fallos}",
+                f"  - Omitidas (ya radicadas): {omit_rad}",
+                f"  - Omitidas (factura duplicada): {omit_dup}",
+            ]
+
+            if self.aseguradora_id in ASEGURADORAS_CON_EMAIL_LISTENER and EMAIL_MODO_SERVICIO:
+                summary_lines.append("\nResultados del Proceso Email:")
+                summary_lines.append(f"  - Radicados en espera de correo (servicio en segundo plano): {self.email_registrados}")
+            elif self.aseguradora_id in ASEGURADORAS_CON_EMAIL_LISTENER:
+                summary_lines.append("\nResultados del Proceso Email:")
+                summary_lines.append(f"  - Correos no encontrados: {email_fallos_count}")
+            
+            lineas_ritmo = resumen_ritmos(self.aseguradora_id)
+            summary_lines.append("\nRetraso inyectado por ritmo adaptativo:")
+            summary_lines.extend([f"  {linea}" for linea in lineas_ritmo] or ["  - Ninguno"])
+
+            lineas_filtro = resumen_filtros(self.aseguradora_id)
+            summary_lines.append("\nRecursos bloqueados por el filtro de solicitudes:")
+            summary_lines.extend([f"  {linea}" for linea in lineas_filtro] or ["  - Ninguno"])
+
+            summary_lines.extend([
+                f"\n\nTiempo Total de Ejecución: {tiempo_formateado}",
+                linea_sep
+            ])
+            summary_msg = "\n".join(summary_lines)
+            self.progreso_update.emit(summary_msg)
+            
+            # Envío de la señal final a la GUI para reactivar botones
+            self.finalizado.emit(exitos, fallos, omit_rad, omit_dup, email_fallos_count)
+
+    def run_mundial_escolar_automation(self):
+        self.progreso_update.emit("--- INICIANDO MODO DE PRUEBA DE LÓGICA (SIN NAVEGADOR) ---")
+        start_time = time.time()
+        exitos, fallos, omitidos = 0, 0, 0
+
+        try:
+            # Esta parte no cambia: clasificación, ordenamiento y preparación de datos
+            sede_1, sede_2, no_reconocidas = separar_carpetas_por_sede(self.carpeta_contenedora_path)
+            omitidos = len(no_reconocidas)
+
+            try:
+                sede_1.sort(key=lambda glosa: int(glosa['factura']))
+                sede_2.sort(key=lambda glosa: int(glosa['factura']))
+                self.progreso_update.emit("[INFO] Listas de glosas ordenadas por número de factura.")
+            except (ValueError, KeyError) as e:
+                self.progreso_update.emit(f"[ADVERTENCIA] No se pudo ordenar las listas de glosas: {e}")
+
+            for glosa_list in [sede_1, sede_2]:
+                for glosa in glosa_list:
+                    glosa['factura_completa'] = f"{glosa['prefijo'].strip()}{glosa['factura'].strip()}"
+
+            self.progreso_update.emit("\n--- Clasificación de Carpetas (ordenadas) ---")
+            self.progreso_update.emit(f"Sede 1 ({len(sede_1)} carpetas): " + ", ".join([os.path.basename(g['ruta']) for g in sede_1]))
+            self.progreso_update.emit(f"Sede 2 ({len(sede_2)} carpetas): " + ", ".join([os.path.basename(g['ruta']) for g in sede_2]))
+            # ... resto del log de clasificación ...
+
+            # --- MODO DE PRUEBA: SOLO LLAMADAS A LA API Y LÓGICA ---
+            self.progreso_update.emit("\n--- EJECUTANDO DIAGNÓSTICO DE DATOS ---")
+            
+            # Combinamos ambas sedes en una sola lista para la prueba
+            todas_las_glosas = sede_1 + sede_2
+
+            if not todas_las_glosas:
+                self.progreso_update.emit("No hay glosas para diagnosticar.")
+
+            # Una tanda de consultas por lotes para todas las facturas en vez de 2 por factura
+            historiales = None
+            if todas_las_glosas:
+                try:
+                    historiales = mundial_escolar.consultar_historiales_gema(todas_las_glosas)
+                    self.progreso_update.emit(f"[INFO] Historiales de GEMA precargados para {len(historiales)} factura(s).")
+                    if resumen_cache_gema():
+                        self.progreso_update.emit(resumen_cache_gema())
+                except Exception as e:
+                    self.progreso_update.emit(f"[ADVERTENCIA] No se pudo precargar GEMA por lotes ({e}). Se consultará factura por factura.")
+            
+            for glosa in todas_las_glosas:
+                self.progreso_update.emit(f"\nProcesando glosa de carpeta: {os.path.basename(glosa['ruta'])}")
+                
+                # Llamada a la nueva función de diagnóstico
+                es_radicable, log_diagnostico, lote_para_procesar = mundial_escolar.diagnosticar_factura_desde_gema(glosa, historiales)
+                
+                # Imprimimos el resultado del diagnóstico
+                self.progreso_update.emit(log_diagnostico)
+                
+                if es_radicable:
+                    self.progreso_update.emit("  -> Veredicto: PROCEDER A RADICACIÓN (cuando se active el navegador).")
+                    exitos += 1
+                else:
+                    self.progreso_update.emit("  -> Veredicto: NO RADICAR / OMITIR.")
+                    fallos += 1 # Contamos los "no radicables" como fallos en esta prueba
+
+        except Exception as e:
+            self.error_critico.emit(f"!!! ERROR CRÍTICO !!!\nERROR CRÍTICO DURANTE MODO DE PRUEBA:\n{e}\n{traceback.format_exc()}")
+        
+        finally:
+            total_time = time.time() - start_time
+            tiempo_formateado = self._formatear_tiempo(total_time)
+            
+            summary_msg = (
+                f"\n--- FIN DEL MODO DE PRUEBA ---\n"
+                f"Facturas Radicables: {exitos}\n"
+                f"Facturas No Radicables/Error: {fallos}\n"
+                f"Omitidas (nombre de carpeta): {omitidos}\n"
+                f"Tiempo Total: {tiempo_formateado}"
+            )
+            self.progreso_update.emit(summary_msg)
+            self.finalizado.emit(exitos, fallos, omitidos, 0, 0)
+
+    def run_grupo_sis_automation(self):
+        self.progreso_update.emit("--- INICIANDO PROCESAMIENTO GRUPO SIS (EXCEL) ---")
+        start_time = time.time()
+        
+        try:
+            from Automatizaciones.glosas.grupo_sis import procesar_glosas_grupo_sis
+            
+            # Buscar o validar el archivo Excel
+            if self.carpeta_contenedora_path.is_file():
+                ruta_excel = str(self.carpeta_contenedora_path)
+            else:
+                archivos_excel = list(self.carpeta_contenedora_path.glob("*.xlsx"))
+                if not archivos_excel:
+                    raise Exception(f"No se encontró ningún archivo .xlsx en {self.carpeta_contenedora_path}")
+                ruta_excel = str(archivos_excel[0])
+            self.progreso_update.emit(f"[INFO] Usando archivo Excel: {os.path.basename(ruta_excel)}")
+            
+            # Ejecutar procesamiento
+            exitos, fallos, reporte = procesar_glosas_grupo_sis(
+                ruta_excel, 
+                self.input_glosas or "", 
+                lambda msg: self.progreso_update.emit(msg),
+                modo=self.modo_grupo_sis
+            )
+            
+            # Guardar reporte de fallos si existen
+            if fallos > 0:
+                ruta_fallos = self.carpeta_contenedora_path / "reporte_FALLOS_grupo_sis.txt"
+                with open(ruta_fallos, "w", encoding="utf-8") as f:
+                    f.write(f"--- REPORTE DE ERRORES GRUPO SIS ({fallos}) ---\n\n")
+                    f.write("\n".join(reporte))
+                self.progreso_update.emit(f"[INFO] Reporte de fallos guardado en: {ruta_fallos.name}")
+
+        except Exception as e:
+            self.error_critico.emit(f"ERROR CRÍTICO EN GRUPO SIS:\n{e}\n{traceback.format_exc()}")
+            return
+        
+        finally:
+            total_time = time.time() - start_time
+            tiempo_formateado = self._formatear_tiempo(total_time)
+            
+            summary_msg = (
+                f"\n--- FIN DEL PROCESO GRUPO SIS ---\n"
+                f"Éxitos (Facturas OK): {exitos}\n"
+                f"Fallos/Inconsistencias: {fallos}\n"
+                f"Tiempo Total: {tiempo_formateado}\n"
+                f"{'='*45}"
+            )
+            self.progreso_update.emit(summary_msg)
+            self.finalizado.emit(exitos, fallos, 0, 0, 0)
+
@@ -0,0 +1,71 @@
+# Core/pendientes_email.py
+"""
+Tabla persistente de radicados que esperan su correo de AXA (SQLite).
+
+run_automation registra aquí cada radicado exitoso y el servicio de correo
+(Core/servicio_correo.py) los va resolviendo en segundo plano, aunque el correo
+llegue horas después o la aplicación se reinicie entre medio. El archivo vive en
+la carpeta 'Datos' del proyecto, junto a 'Sesiones'.
+
+Cada método abre su propia conexión: la GUI, el motor y el hilo del servicio
+pueden usar la tabla a la vez (y también otro proceso, como la CLI).
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from Configuracion.constantes import EMAIL_ARCHIVO_PENDIENTES
+
+
+def ruta_tabla_pendientes() -> Path:
+    # Directorio base del proyecto. Sube dos niveles desde este archivo (Core/pendientes_email.py -> proyecto/)
+    project_root = Path(__file__).resolve().parents[1]
+    return project_root / "Datos" / EMAIL_ARCHIVO_PENDIENTES
+
+
+class TablaPendientesEmail:
+    def __init__(self, ruta: Path | None = None):
+        self.ruta = Path(ruta) if ruta else ruta_tabla_pendientes()
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS pendientes ("
+                " radicado TEXT PRIMARY KEY,"
+                " carpeta TEXT NOT NULL,"
+                " creado REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión de corta duración: confirma al salir (o revierte si hubo error) y se cierra."""
+        # timeout: otro hilo o proceso puede estar escribiendo en ese momento
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def agregar(self, radicado: str, carpeta: Path):
+        """Registra (o actualiza la carpeta de) un radicado pendiente."""
+        with self._conectar() as con:
+            con.execute(
+                "INSERT INTO pendientes (radicado, carpeta, creado) VALUES (?, ?, ?) "
+                "ON CONFLICT(radicado) DO UPDATE SET carpeta = excluded.carpeta",
+                (str(radicado), str(carpeta), time.time()),
+            )
+
+    def quitar(self, radicado: str):
+        with self._conectar() as con:
+            con.execute("DELETE FROM pendientes WHERE radicado = ?", (str(radicado),))
+
+    def listar(self) -> list[tuple[str, Path, float]]:
+        """(radicado, carpeta, creado) de todos los pendientes, del más antiguo al más nuevo."""
+        with self._conectar() as con:
+            filas = con.execute("SELECT radicado, carpeta, creado FROM pendientes ORDER BY creado").fetchall()
+        return [(radicado, Path(carpeta), creado) for radicado, carpeta, creado in filas]
+
+    def contar(self) -> int:
+        with self._conectar() as con:
+            return con.execute("SELECT COUNT(*) FROM pendientes").fetchone()[0]
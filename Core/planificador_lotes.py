@@ -0,0 +1,215 @@
+# Core/planificador_lotes.py
+"""
+Planificador de lotes: varias cuentas (área, aseguradora, carpeta) en una sola ejecución.
+
+Los trabajos se agrupan por portal (aseguradora). Cada portal corre en su propio
+hilo, así los portales distintos avanzan en paralelo; dentro de un mismo portal
+los trabajos se ejecutan uno tras otro, en el orden en que se encolaron, y
+reutilizan la sesión guardada por el anterior (ver Core/sesiones.py), por lo que
+solo el primero inicia sesión.
+
+Cada trabajo es un MotorAutomatizacion normal: escribe sus propios reportes,
+bitácora y línea de tiempo en su carpeta. El planificador solo reenvía el
+progreso con un prefijo por cuenta y al final arma un resumen consolidado.
+"""
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from Configuracion.constantes import CONFIGURACION_AREAS, GRUPO_SIS_ID
+
+from .motor_automatizacion import MotorAutomatizacion
+from .senales import Senal
+
+
+def validar_trabajo(trabajo: dict) -> tuple[bool, str]:
+    """Comprueba que un trabajo del lote tenga área, aseguradora y carpeta válidas."""
+    area_id = trabajo.get("area")
+    aseguradora_id = trabajo.get("aseguradora")
+    carpeta = trabajo.get("carpeta")
+
+    if area_id not in CONFIGURACION_AREAS:
+        return False, f"Área desconocida: '{area_id}'."
+    if aseguradora_id not in [aseg_id for _, aseg_id in CONFIGURACION_AREAS[area_id]]:
+        return False, f"La aseguradora '{aseguradora_id}' no está disponible en el área '{area_id}'."
+    if not carpeta or not Path(carpeta).exists():
+        return False, f"No existe la carpeta o archivo: {carpeta}"
+    if aseguradora_id != GRUPO_SIS_ID and not Path(carpeta).is_dir():
+        return False, f"La ruta no es una carpeta: {carpeta}"
+    return True, ""
+
+
+class PlanificadorLotes:
+    def __init__(self, trabajos: list[dict], modo_headless: bool):
+        """
+        trabajos: lista de diccionarios con 'area', 'aseguradora' y 'carpeta', y
+        opcionalmente 'reanudar', 'contextos', 'input_glosas' y 'modo_grupo_sis'.
+        """
+        # --- Señales de progreso ---
+        self.progreso_update = Senal()                 # (str)
+        self.finalizado = Senal()                      # (resumen: dict)
+        self.error_critico = Senal()                   # (str)
+
+        self.trabajos = list(trabajos)
+        self.headless_mode = modo_headless
+        self._lock_resultados = threading.Lock()
+        self.resultados = []
+
+    def _agrupar_por_portal(self) -> dict[str, list[tuple[int, dict]]]:
+        """Agrupa los trabajos por aseguradora conservando el orden de la cola."""
+        grupos = {}
+        for indice, trabajo in enumerate(self.trabajos, start=1):
+            grupos.setdefault(trabajo.get("aseguradora"), []).append((indice, trabajo))
+        return grupos
+
+    def _prefijo_y_resultado(self, indice: int, trabajo: dict) -> tuple[str, dict]:
+        """Prefijo de log y resultado vacío de un trabajo; tolera trabajos con claves faltantes."""
+        carpeta = trabajo.get("carpeta")
+        prefijo = f"[{indice}/{len(self.trabajos)} {trabajo.get('aseguradora')} | {Path(carpeta).name if carpeta else '-'}] "
+        resultado = {
+            "indice": indice,
+            "area": trabajo.get("area"),
+            "aseguradora": trabajo.get("aseguradora"),
+            "carpeta": str(Path(carpeta).resolve()) if carpeta else "",
+            "exitos": 0, "fallos": 0, "omitidas_radicadas": 0,
+            "omitidas_duplicadas": 0, "correos_no_encontrados": 0,
+            "errores_criticos": [],
+        }
+        return prefijo, resultado
+
+    def _resultado_invalido(self, indice: int, trabajo: dict, motivo: str) -> dict:
+        prefijo, resultado = self._prefijo_y_resultado(indice, trabajo)
+        resultado["errores_criticos"].append(motivo)
+        self.progreso_update.emit(f"{prefijo}[ERROR] Trabajo omitido: {motivo}")
+        return resultado
+
+    def _ejecutar_trabajo(self, indice: int, trabajo: dict) -> dict:
+        """Ejecuta un trabajo (ya validado) con su propio motor y devuelve su resultado."""
+        prefijo, resultado = self._prefijo_y_resultado(indice, trabajo)
+
+        def al_progresar(mensaje):
+            # Se prefija cada línea para poder seguir los portales entrelazados en un solo log
+            self.progreso_update.emit("\n".join(prefijo + linea if linea else linea for linea in str(mensaje).split("\n")))
+
+        def al_finalizar(exitos, fallos, omit_rad, omit_dup, email_fallos):
+            resultado.update({
+                "exitos": exitos, "fallos": fallos,
+                "omitidas_radicadas": omit_rad, "omitidas_duplicadas": omit_dup,
+                "correos_no_encontrados": email_fallos,
+            })
+
+        def al_error(mensaje):
+            resultado["errores_criticos"].append(mensaje)
+            al_progresar(mensaje)
+
+        motor = MotorAutomatizacion(
+            trabajo["area"], trabajo["aseguradora"], trabajo["carpeta"], self.headless_mode,
+            input_glosas=trabajo.get("input_glosas"),
+            modo_grupo_sis=trabajo.get("modo_grupo_sis", "glosas"),
+            num_contextos=trabajo.get("contextos"),
+            reanudar=trabajo.get("reanudar", False),
+        )
+        motor.progreso_update.connect(al_progresar)
+        motor.finalizado.connect(al_finalizar)
+        motor.error_critico.connect(al_error)
+
+        inicio = time.time()
+        try:
+            motor.run_automation()
+        except Exception as e:
+            traceback.print_exc()
+            al_error(f"ERROR CRÍTICO NO CONTROLADO: {e}")
+        resultado["duracion_segundos"] = round(time.time() - inicio, 1)
+        return resultado
+
+    def _ejecutar_portal(self, aseguradora_id: str, trabajos: list[tuple[int, dict]]):
+        """Hilo de un portal: sus trabajos van en secuencia para compartir la sesión guardada."""
+        for indice, trabajo in trabajos:
+            try:
+                resultado = self._ejecutar_trabajo(indice, trabajo)
+            except Exception as e:
+                # Un error al preparar el trabajo no debe llevarse consigo al resto del portal
+                traceback.print_exc()
+                resultado = self._resultado_invalido(indice, trabajo, f"ERROR CRÍTICO NO CONTROLADO: {e}")
+            with self._lock_resultados:
+                self.resultados.append(resultado)
+
+    def _armar_resumen(self, duracion: float) -> dict:
+        resultados = sorted(self.resultados, key=lambda r: r["indice"])
+        totales = {clave: sum(r.get(clave, 0) for r in resultados) for clave in (
+            "exitos", "fallos", "omitidas_radicadas", "omitidas_duplicadas", "correos_no_encontrados")}
+        return {
+            "trabajos": resultados,
+            "totales": totales,
+            "trabajos_con_error_critico": sum(1 for r in resultados if r["errores_criticos"]),
+            "duracion_segundos": round(duracion, 1),
+        }
+
+    def _formatear_resumen(self, resumen: dict) -> str:
+        linea_sep = '\n' + ('=' * 45)
+        lineas = [linea_sep, "--- RESUMEN CONSOLIDADO DEL LOTE ---"]
+        for r in resumen["trabajos"]:
+            estado = "ERROR CRÍTICO" if r["errores_criticos"] else "OK"
+            lineas.append(
+                f"  {r['indice']}. {r['area']}/{r['aseguradora']} '{Path(r['carpeta']).name}' -> {estado} | "
+                f"Éxitos: {r['exitos']}, Fallos: {r['fallos']}, "
+                f"Omitidas: {r['omitidas_radicadas'] + r['omitidas_duplicadas']}"
+            )
+        t = resumen["totales"]
+        lineas.extend([
+            "\nTotales:",
+            f"  - Éxitos: \t\t{t['exitos']}",
+            f"  - Fallos: \t\t{t['fallos']}",
+            f"  - Omitidas (ya radicadas): {t['omitidas_radicadas']}",
+            f"  - Omitidas (factura duplicada): {t['omitidas_duplicadas']}",
+            f"  - Correos no encontrados: {t['correos_no_encontrados']}",
+            f"\nTiempo Total del Lote: {resumen['duracion_segundos']} s",
+            linea_sep,
+        ])
+        return "\n".join(lineas)
+
+    def ejecutar(self) -> dict:
+        """Ejecuta todo el lote y devuelve el resumen consolidado."""
+        inicio = time.time()
+        self.resultados = []
+        grupos = self._agrupar_por_portal()
+
+        # Los trabajos inválidos quedan en el resumen como error crítico y no llegan a los hilos
+        for aseguradora_id in list(grupos):
+            validos = []
+            for indice, trabajo in grupos[aseguradora_id]:
+                trabajo_ok, motivo = validar_trabajo(trabajo)
+                if trabajo_ok:
+                    validos.append((indice, trabajo))
+                else:
+                    self.resultados.append(self._resultado_invalido(indice, trabajo, motivo))
+            if validos:
+                grupos[aseguradora_id] = validos
+            else:
+                del grupos[aseguradora_id]
+        self.progreso_update.emit(
+            f"--- INICIANDO LOTE: {len(self.trabajos)} trabajos en {len(grupos)} portales "
+            f"({', '.join(str(aseguradora_id) for aseguradora_id in grupos)}) ---"
+        )
+
+        try:
+            hilos = []
+            for aseguradora_id, trabajos in grupos.items():
+                hilo = threading.Thread(
+                    target=self._ejecutar_portal,
+                    args=(aseguradora_id, trabajos),
+                    name=f"lote_{aseguradora_id}",
+                    daemon=True,
+                )
+                hilos.append(hilo)
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        except Exception as e:
+            self.error_critico.emit(f"ERROR CRÍTICO EN EL LOTE:\n{e}\n{traceback.format_exc()}")
+
+        resumen = self._armar_resumen(time.time() - inicio)
+        self.progreso_update.emit(self._formatear_resumen(resumen))
+        self.finalizado.emit(resumen)
+        return resumen
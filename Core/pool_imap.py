@@ -0,0 +1,102 @@
+# Core/pool_imap.py
+"""
+Pool de conexiones IMAP para descargar adjuntos en paralelo.
+
+El listener de email conserva su conexión para vigilar el buzón (SEARCH, FETCH de
+cabeceras, IDLE y movimientos) y delega las descargas a este pool: cada hilo del
+pool tiene su propia conexión autenticada con INBOX seleccionado, de modo que un
+PDF grande no frena a los demás. Como imaplib no es seguro entre hilos, una
+conexión nunca se comparte.
+
+Cada conexión se mantiene por su cuenta: si pasa EMAIL_NOOP_SEGUNDOS sin tareas
+envía un NOOP, y si se cae se reconecta y la tarea se reintenta una vez.
+"""
+import imaplib
+import queue
+import threading
+from concurrent.futures import Future
+
+from Configuracion.constantes import EMAIL_NOOP_SEGUNDOS
+
+
+class PoolImap:
+    def __init__(self, tamano: int, conectar, progreso_update=None, nombre: str = "imap_descarga"):
+        """
+        'conectar' es una función sin argumentos que devuelve una conexión imaplib
+        autenticada y con el buzón seleccionado. Se llama desde el hilo que la usará.
+        """
+        self.tamano = max(1, int(tamano))
+        self.conectar = conectar
+        self.progreso_update = progreso_update
+        self.nombre = nombre
+        self._tareas = queue.Queue()
+        self._hilos = []
+
+    def _avisar(self, mensaje: str):
+        if self.progreso_update is not None:
+            self.progreso_update.emit(mensaje)
+
+    def iniciar(self):
+        for i in range(self.tamano):
+            hilo = threading.Thread(target=self._trabajar, name=f"{self.nombre}_{i + 1}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def enviar(self, tarea) -> Future:
+        """Encola 'tarea(imap)'; el Future recibe su resultado o la excepción que lance."""
+        futuro = Future()
+        self._tareas.put((futuro, tarea))
+        return futuro
+
+    def cerrar(self, timeout: float = 30):
+        """Termina los hilos tras las tareas ya encoladas y cierra sus conexiones."""
+        for _ in self._hilos:
+            self._tareas.put(None)
+        for hilo in self._hilos:
+            hilo.join(timeout=timeout)
+        self._hilos = []
+
+    def _desconectar(self, imap):
+        try:
+            if imap: imap.logout()
+        except Exception: pass
+
+    def _trabajar(self):
+        nombre = threading.current_thread().name
+        imap = None
+        while True:
+            try:
+                item = self._tareas.get(timeout=EMAIL_NOOP_SEGUNDOS)
+            except queue.Empty:
+                # Keep-alive de esta conexión; si falló, se reconecta con la próxima tarea
+                if imap is not None:
+                    try:
+                        imap.noop()
+                    except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError):
+                        self._desconectar(imap)
+                        imap = None
+                continue
+            if item is None:
+                break
+
+            futuro, tarea = item
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            for intento in (1, 2):
+                try:
+                    if imap is None:
+                        imap = self.conectar()
+                    futuro.set_result(tarea(imap))
+                    break
+                except (imaplib.IMAP4.abort, OSError) as e:
+                    # Conexión caída: se descarta, se abre otra y se reintenta una vez
+                    self._desconectar(imap)
+                    imap = None
+                    if intento == 2:
+                        futuro.set_exception(e)
+                    else:
+                        self._avisar(f"[EMAIL_LISTENER] ADVERTENCIA: Se perdió la conexión de {nombre} ({e}). Reconectando...")
+                except Exception as e:
+                    futuro.set_exception(e)
+                    break
+        self._desconectar(imap)
@@ -0,0 +1,107 @@
+# Core/ritmo.py
+"""
+Ritmo adaptativo de acciones por portal (reemplaza el slow_mo global del navegador).
+
+Cada portal arranca sin retraso artificial. Solo los pasos declarados en
+RITMO_POR_PORTAL pueden recibir pausa, y esta solo crece cuando el módulo
+reporta que el paso falló (por ejemplo un dropdown que no abrió o un teclado
+virtual que perdió una tecla). Tras varias repeticiones exitosas la pausa
+vuelve a bajar. Al final de la ejecución se reporta cuánto retraso se inyectó.
+"""
+import threading
+import time
+
+from Configuracion.constantes import (
+    RITMO_POR_PORTAL,
+    RITMO_INCREMENTO_MS,
+    RITMO_MAXIMO_MS,
+    RITMO_EXITOS_PARA_REDUCIR,
+)
+
+
+class RitmoPortal:
+    """Pausas por paso de un portal. Compartido por todos los contextos del mismo portal."""
+
+    def __init__(self, portal: str, pasos_iniciales: dict[str, int] | None = None):
+        self.portal = portal
+        self._lock = threading.Lock()
+        self._pausas_ms = dict(pasos_iniciales or {})
+        self._exitos_seguidos = {}
+        self._fallos = {}
+        self._inyectado_ms = {}
+
+    def pausa(self, page, paso: str):
+        """Aplica la pausa vigente del paso (normalmente 0, es decir, nada)."""
+        with self._lock:
+            ms = self._pausas_ms.get(paso, 0)
+            if ms:
+                self._inyectado_ms[paso] = self._inyectado_ms.get(paso, 0) + ms
+        if ms:
+            if page is not None:
+                page.wait_for_timeout(ms)
+            else:
+                time.sleep(ms / 1000)
+
+    def registrar_fallo(self, paso: str) -> int:
+        """El paso falló: se aumenta su pausa para el siguiente intento. Devuelve la pausa nueva en ms."""
+        with self._lock:
+            nueva = min(self._pausas_ms.get(paso, 0) + RITMO_INCREMENTO_MS, RITMO_MAXIMO_MS)
+            self._pausas_ms[paso] = nueva
+            self._exitos_seguidos[paso] = 0
+            self._fallos[paso] = self._fallos.get(paso, 0) + 1
+            return nueva
+
+    def registrar_exito(self, paso: str):
+        """El paso funcionó: tras varias veces seguidas se reduce su pausa."""
+        with self._lock:
+            if not self._pausas_ms.get(paso):
+                return
+            seguidos = self._exitos_seguidos.get(paso, 0) + 1
+            if seguidos >= RITMO_EXITOS_PARA_REDUCIR:
+                self._pausas_ms[paso] = max(self._pausas_ms[paso] - RITMO_INCREMENTO_MS, 0)
+                seguidos = 0
+            self._exitos_seguidos[paso] = seguidos
+
+    def resumen(self) -> str | None:
+        """Una línea con el retraso inyectado por paso, o None si no se inyectó nada."""
+        with self._lock:
+            if not self._inyectado_ms and not self._fallos:
+                return None
+            partes = []
+            for paso in sorted(set(self._inyectado_ms) | set(self._fallos)):
+                partes.append(
+                    f"{paso}: {self._inyectado_ms.get(paso, 0) / 1000:.1f}s inyectados, "
+                    f"{self._fallos.get(paso, 0)} fallos, pausa final {self._pausas_ms.get(paso, 0)} ms"
+                )
+            return f"[RITMO] {self.portal} -> " + "; ".join(partes)
+
+
+_ritmos: dict[str, RitmoPortal] = {}
+_lock_registro = threading.Lock()
+
+
+def obtener_ritmo(portal: str) -> RitmoPortal:
+    """Devuelve el ritmo compartido del portal, creándolo con la configuración inicial."""
+    with _lock_registro:
+        if portal not in _ritmos:
+            _ritmos[portal] = RitmoPortal(portal, RITMO_POR_PORTAL.get(portal))
+        return _ritmos[portal]
+
+
+def reiniciar_ritmos(portal: str | None = None):
+    """
+    Descarta las pausas aprendidas. Se llama al inicio de cada ejecución solo con
+    su portal, para no borrar las de otro portal que corre en paralelo en un lote.
+    """
+    with _lock_registro:
+        if portal is None:
+            _ritmos.clear()
+        else:
+            _ritmos.pop(portal, None)
+
+
+def resumen_ritmos(portal: str | None = None) -> list[str]:
+    """Líneas de resumen de los portales (o del portal indicado) que inyectaron retraso."""
+    with _lock_registro:
+        ritmos = [r for p, r in _ritmos.items() if portal is None or p == portal]
+    return [linea for linea in (r.resumen() for r in ritmos) if linea]
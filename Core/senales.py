@@ -0,0 +1,33 @@
+# Core/senales.py
+"""
+Señales mínimas sin Qt.
+
+El motor de automatización y el listener de email notifican su progreso con
+`.emit(...)`, igual que las señales de Qt, pero sin depender de PySide6. La GUI
+las reenvía a señales Qt reales (ver Core/trabajador_automatizacion.py) y la
+CLI las conecta directamente a stdout.
+"""
+import threading
+
+
+class Senal:
+    """Lista de callbacks que se llaman, en orden, en el hilo que emite."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def connect(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def disconnect(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def emit(self, *args):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(*args)
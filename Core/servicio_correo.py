@@ -0,0 +1,84 @@
+# Core/servicio_correo.py
+"""
+Servicio de correo en segundo plano (EMAIL_MODO_SERVICIO).
+
+En lugar de arrancar un listener por ejecución y esperarlo al final, run_automation
+solo anota cada radicado exitoso en la tabla persistente (Core/pendientes_email.py).
+Este servicio vive mientras la aplicación esté abierta (o 'cli.py --servicio-correo'),
+vigila el buzón con un EmailListenerWorker en modo servicio y adjunta los PDFs a
+medida que llegan, aunque sea horas después o tras reiniciar la aplicación.
+"""
+import queue
+import threading
+from pathlib import Path
+
+from .senales import Senal
+from .pendientes_email import TablaPendientesEmail
+from .trabajador_email import EmailListenerWorker
+
+
+class ServicioCorreo:
+    def __init__(self, tabla: TablaPendientesEmail | None = None):
+        self.progreso_update = Senal()  # (str)
+        self.tabla = tabla or TablaPendientesEmail()
+        self.job_queue = queue.Queue()
+        self.worker = None
+        self.hilo = None
+
+    def esta_activo(self) -> bool:
+        return self.hilo is not None and self.hilo.is_alive()
+
+    def iniciar(self):
+        """Arranca el hilo del listener (retoma lo que haya quedado en la tabla)."""
+        global _servicio_activo
+        if self.esta_activo():
+            return
+        self.job_queue = queue.Queue()
+        self.worker = EmailListenerWorker(self.job_queue, tabla_pendientes=self.tabla)
+        self.worker.progreso_update.connect(self.progreso_update.emit)
+        self.hilo = threading.Thread(target=self.worker.run, name="servicio_correo", daemon=True)
+        self.hilo.start()
+        with _lock_registro:
+            _servicio_activo = self
+
+    def agregar(self, radicado: str, carpeta: Path):
+        """Anota el radicado en la tabla y avisa al listener para que no espere a la próxima relectura."""
+        self.tabla.agregar(radicado, carpeta)
+        if self.esta_activo():
+            self.job_queue.put((radicado, Path(carpeta)))
+
+    def pendientes(self) -> int:
+        return self.tabla.contar()
+
+    def detener(self, timeout: float = 30) -> bool:
+        """Pide al listener que termine. Lo no resuelto queda en la tabla. Devuelve True si terminó."""
+        global _servicio_activo
+        with _lock_registro:
+            if _servicio_activo is self:
+                _servicio_activo = None
+        if not self.esta_activo():
+            return True
+        self.job_queue.put(None)
+        self.hilo.join(timeout=timeout)
+        return not self.hilo.is_alive()
+
+
+_servicio_activo: ServicioCorreo | None = None
+_lock_registro = threading.Lock()
+
+
+def servicio_activo() -> ServicioCorreo | None:
+    with _lock_registro:
+        return _servicio_activo
+
+
+def registrar_radicado_pendiente(radicado: str, carpeta: Path):
+    """
+    Deja un radicado a la espera de su correo. Si el servicio corre en este proceso se
+    le avisa directamente; si no, queda en la tabla y lo tomará el próximo servicio que arranque.
+    """
+    servicio = servicio_activo()
+    if servicio is not None:
+        servicio.agregar(radicado, carpeta)
+    else:
+        TablaPendientesEmail().agregar(radicado, carpeta)
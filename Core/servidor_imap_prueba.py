@@ -0,0 +1,365 @@
+# Core/servidor_imap_prueba.py
+"""
+Servidor IMAP local en memoria para probar y medir el listener de email sin Gmail.
+
+Implementa solo lo que usa EmailListenerWorker: CAPABILITY (IMAP4rev1 IDLE; MOVE y
+UIDPLUS solo tras LOGIN, como Gmail), LOGIN (acepta cualquier usuario),
+SELECT/EXAMINE, NOOP, IDLE con avisos EXISTS, EXPUNGE y UID SEARCH (criterios UID y FROM; el resto, como SINCE, se
+ignora), UID FETCH (UID, BODYSTRUCTURE, HEADER.FIELDS, BODY.PEEK[n]<ini.largo> y
+RFC822), UID COPY/MOVE/STORE/EXPUNGE. Sin TLS: el worker se conecta con
+imap_ssl = False.
+
+Uso (ver Core/benchmark_email.py):
+    servidor = ServidorImapPrueba(latencia_fetch=0.05)
+    puerto = servidor.iniciar()
+    servidor.programar_llegadas([(0.0, correo_axa("123")), (1.5, correo_axa("456"))])
+"""
+import email
+import os
+import re
+import socketserver
+import threading
+import time
+from email import policy
+from email.message import EmailMessage
+
+from Configuracion.constantes import AXASOAT_EMAIL_SENDER, EMAIL_PROCESSED_FOLDER
+
+
+def correo_axa(radicado: str, tamano_pdf: int = 500_000, con_imagen: bool = True) -> bytes:
+    """Correo sintético como los de AXA: asunto con el radicado y un PDF 'RAD_<radicado>.pdf'."""
+    mensaje = EmailMessage()
+    mensaje["From"] = f"AXA Colpatria <{AXASOAT_EMAIL_SENDER}>"
+    mensaje["To"] = "radicacion@example.com"
+    mensaje["Subject"] = f"Notificación de radicación {radicado}"
+    # Solo para el benchmark: relaciona el correo con su radicado sin parsear el asunto
+    mensaje["X-Radicado"] = str(radicado)
+    mensaje.set_content(f"Se adjunta el soporte de radicación {radicado}.")
+    if con_imagen:
+        # Otra parte que el listener no debe descargar
+        mensaje.add_attachment(os.urandom(50_000), maintype="image", subtype="png", filename="logo.png")
+    mensaje.add_attachment(
+        b"%PDF-1.4\n" + os.urandom(max(0, tamano_pdf - 9)),
+        maintype="application", subtype="pdf", filename=f"RAD_{radicado}.pdf",
+    )
+    return mensaje.as_bytes()
+
+
+# --- Representación IMAP de los mensajes ---
+
+def _cadena(valor) -> str:
+    if valor is None:
+        return "NIL"
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _cuerpo_seccion(parte) -> bytes:
+    """Contenido de la parte tal como viaja (sin decodificar), con saltos CRLF."""
+    contenido = parte.get_payload(decode=False)
+    if isinstance(contenido, str):
+        return contenido.encode("ascii", errors="replace").replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+    return b""
+
+
+def _bodystructure(parte) -> str:
+    if parte.is_multipart():
+        hijos = "".join(_bodystructure(p) for p in parte.get_payload())
+        return f"({hijos} {_cadena(parte.get_content_subtype().upper())})"
+    principal, subtipo = parte.get_content_maintype(), parte.get_content_subtype()
+    parametros = parte.get_params()[1:] if parte.get_params() else []
+    texto_parametros = (
+        "(" + " ".join(f"{_cadena(k.upper())} {_cadena(v)}" for k, v in parametros) + ")" if parametros else "NIL"
+    )
+    cuerpo = _cuerpo_seccion(parte)
+    campos = [
+        _cadena(principal.upper()), _cadena(subtipo.upper()), texto_parametros, "NIL", "NIL",
+        _cadena((parte.get("Content-Transfer-Encoding") or "7bit").upper()), str(len(cuerpo)),
+    ]
+    if principal == "text":
+        campos.append(str(cuerpo.count(b"\n")))
+    disposicion = parte.get_content_disposition()
+    if disposicion:
+        nombre = parte.get_filename()
+        extension = f"({_cadena('FILENAME')} {_cadena(nombre)})" if nombre else "NIL"
+        campos += ["NIL", f"({_cadena(disposicion.upper())} {extension})"]
+    return "(" + " ".join(campos) + ")"
+
+
+def _parte_por_seccion(mensaje, seccion: str):
+    parte = mensaje
+    for numero in seccion.split("."):
+        if parte.is_multipart():
+            parte = parte.get_payload()[int(numero) - 1]
+        elif numero != "1":
+            return None
+    return parte
+
+
+class BuzonPrueba:
+    """Carpetas en memoria. 'lock' es una Condition: notifica a las sesiones en IDLE."""
+
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.carpetas = {"INBOX": [], EMAIL_PROCESSED_FOLDER: []}
+        self.siguiente_uid = {"INBOX": 1, EMAIL_PROCESSED_FOLDER: 1}
+        self.uidvalidity = 1
+
+    def agregar(self, crudo: bytes, carpeta: str = "INBOX") -> int:
+        with self.lock:
+            self.carpetas.setdefault(carpeta, [])
+            self.siguiente_uid.setdefault(carpeta, 1)
+            uid = self.siguiente_uid[carpeta]
+            self.siguiente_uid[carpeta] += 1
+            self.carpetas[carpeta].append({
+                "uid": uid, "crudo": crudo, "mensaje": email.message_from_bytes(crudo, policy=policy.compat32),
+                "flags": set(), "llegada": time.time(),
+            })
+            self.lock.notify_all()
+            return uid
+
+
+class _SesionImap(socketserver.StreamRequestHandler):
+    def _enviar(self, linea):
+        if isinstance(linea, str):
+            linea = linea.encode()
+        self.wfile.write(linea + b"\r\n")
+
+    def handle(self):
+        self.buzon = self.server.buzon
+        self.seleccionada = None
+        self.vistos = 0
+        self.autenticado = False
+        self._enviar("* OK [CAPABILITY IMAP4rev1 IDLE] Servidor IMAP de prueba listo")
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            tag, _, resto = linea.rstrip(b"\r\n").decode().partition(" ")
+            comando, _, argumentos = resto.partition(" ")
+            comando = comando.upper()
+            if comando == "UID":
+                subcomando, _, argumentos = argumentos.partition(" ")
+                metodo = getattr(self, "uid_" + subcomando.lower(), None)
+            else:
+                metodo = getattr(self, "cmd_" + comando.lower(), None)
+            if metodo is None:
+                self._enviar(f"{tag} BAD Comando no soportado")
+            else:
+                if self.seleccionada and comando not in ("IDLE", "LOGOUT", "SELECT", "EXAMINE"):
+                    # Como un servidor real, avisa los correos nuevos antes de responder cualquier comando
+                    self._avisar_nuevos()
+                metodo(tag, argumentos.strip())
+            if comando == "LOGOUT":
+                return
+
+    # --- Comandos ---
+
+    def cmd_capability(self, tag, argumentos):
+        # Como Gmail: MOVE y UIDPLUS solo se anuncian a una sesión autenticada
+        self._enviar("* CAPABILITY IMAP4rev1 IDLE MOVE UIDPLUS" if self.autenticado else "* CAPABILITY IMAP4rev1 IDLE")
+        self._enviar(f"{tag} OK CAPABILITY completado")
+
+    def cmd_login(self, tag, argumentos):
+        self.autenticado = True
+        self._enviar(f"{tag} OK Sesion iniciada")
+
+    def cmd_logout(self, tag, argumentos):
+        self._enviar("* BYE Cerrando sesion")
+        self._enviar(f"{tag} OK LOGOUT completado")
+
+    def cmd_noop(self, tag, argumentos):
+        self._enviar(f"{tag} OK NOOP completado")
+
+    def cmd_select(self, tag, argumentos, modo="READ-WRITE"):
+        self.seleccionada = argumentos.strip('"')
+        with self.buzon.lock:
+            self.buzon.carpetas.setdefault(self.seleccionada, [])
+            self.buzon.siguiente_uid.setdefault(self.seleccionada, 1)
+            self.vistos = len(self.buzon.carpetas[self.seleccionada])
+            self._enviar(f"* {self.vistos} EXISTS")
+            self._enviar(f"* OK [UIDVALIDITY {self.buzon.uidvalidity}] UIDs validos")
+            self._enviar(f"* OK [UIDNEXT {self.buzon.siguiente_uid[self.seleccionada]}] Proximo UID")
+        self._enviar(f"{tag} OK [{modo}] Carpeta seleccionada")
+
+    def cmd_examine(self, tag, argumentos):
+        self.cmd_select(tag, argumentos, modo="READ-ONLY")
+
+    def _avisar_nuevos(self) -> bool:
+        with self.buzon.lock:
+            total = len(self.buzon.carpetas[self.seleccionada]) if self.seleccionada else 0
+        if total != self.vistos:
+            self.vistos = total
+            self._enviar(f"* {total} EXISTS")
+            return True
+        return False
+
+    def cmd_idle(self, tag, argumentos):
+        self._enviar("+ idling")
+        terminar = threading.Event()
+
+        def vigilar():
+            while not terminar.is_set():
+                with self.buzon.lock:
+                    self.buzon.lock.wait(0.2)
+                if not terminar.is_set():
+                    self._avisar_nuevos()
+
+        vigia = threading.Thread(target=vigilar, daemon=True)
+        vigia.start()
+        self.rfile.readline()  # DONE
+        terminar.set()
+        vigia.join()
+        self._enviar(f"{tag} OK IDLE terminado")
+
+    def cmd_expunge(self, tag, argumentos):
+        self._expunge(None)
+        self._enviar(f"{tag} OK EXPUNGE completado")
+
+    def uid_expunge(self, tag, argumentos):
+        self._expunge(self._uids(argumentos))
+        self._enviar(f"{tag} OK UID EXPUNGE completado")
+
+    def _expunge(self, uids):
+        with self.buzon.lock:
+            mensajes = self.buzon.carpetas[self.seleccionada]
+            for i in range(len(mensajes) - 1, -1, -1):
+                if "\\Deleted" in mensajes[i]["flags"] and (uids is None or mensajes[i]["uid"] in uids):
+                    del mensajes[i]
+                    self._enviar(f"* {i + 1} EXPUNGE")
+                    # Los correos llegados mientras tanto se siguen avisando después
+                    self.vistos -= 1
+
+    def _uids(self, conjunto: str) -> set[int]:
+        """Interpreta '1,3:5,7:*' sobre la carpeta seleccionada."""
+        maximo = max((m["uid"] for m in self.buzon.carpetas[self.seleccionada]), default=0)
+        uids = set()
+        for trozo in conjunto.split(","):
+            inicio, _, fin = trozo.partition(":")
+            inicio = maximo if inicio == "*" else int(inicio)
+            fin = inicio if not fin else (maximo if fin == "*" else int(fin))
+            uids.update(range(min(inicio, fin), max(inicio, fin) + 1))
+        return uids
+
+    def uid_search(self, tag, argumentos):
+        with self.buzon.lock:
+            mensajes = list(self.buzon.carpetas[self.seleccionada])
+            criterio_uid = re.search(r"UID (\S+)", argumentos)
+            uids = self._uids(criterio_uid.group(1).rstrip(")")) if criterio_uid else None
+        criterio_from = re.search(r'FROM "([^"]+)"', argumentos)
+        resultado = [
+            m["uid"] for m in mensajes
+            if (uids is None or m["uid"] in uids)
+            and (not criterio_from or criterio_from.group(1) in (m["mensaje"]["From"] or ""))
+        ]
+        self._enviar("* SEARCH" + "".join(f" {uid}" for uid in resultado))
+        self._enviar(f"{tag} OK SEARCH completado")
+
+    def uid_fetch(self, tag, argumentos):
+        conjunto, _, items = argumentos.partition(" ")
+        with self.buzon.lock:
+            uids = self._uids(conjunto)
+            mensajes = [(i, m) for i, m in enumerate(self.buzon.carpetas[self.seleccionada]) if m["uid"] in uids]
+        if self.server.latencia_fetch and "BODY.PEEK[" in items.replace("BODY.PEEK[HEADER", ""):
+            # Simula el tiempo de ida y vuelta de un servidor remoto en cada bloque descargado
+            time.sleep(self.server.latencia_fetch)
+        for i, m in mensajes:
+            partes = [f"UID {m['uid']}".encode()]
+            if "BODYSTRUCTURE" in items:
+                partes.append(b"BODYSTRUCTURE " + _bodystructure(m["mensaje"]).encode())
+            for campos in re.findall(r"BODY\.PEEK\[HEADER\.FIELDS \(([^)]*)\)\]", items):
+                cabeceras = b"".join(
+                    f"{campo}: {m['mensaje'][campo]}\r\n".encode()
+                    for campo in campos.split() if m["mensaje"][campo] is not None
+                ) + b"\r\n"
+                partes.append(f"BODY[HEADER.FIELDS ({campos})] {{{len(cabeceras)}}}\r\n".encode() + cabeceras)
+            for seccion, inicio, largo in re.findall(r"BODY\.PEEK\[([\d.]+)\](?:<(\d+)\.(\d+)>)?", items):
+                parte = _parte_por_seccion(m["mensaje"], seccion)
+                datos = _cuerpo_seccion(parte) if parte is not None else b""
+                clave = f"BODY[{seccion}]"
+                if inicio:
+                    datos = datos[int(inicio):int(inicio) + int(largo)]
+                    clave += f"<{inicio}>"
+                partes.append(f"{clave} {{{len(datos)}}}\r\n".encode() + datos)
+                self.server.contar_bytes(len(datos))
+            if re.search(r"\bRFC822\b", items):
+                partes.append(f"RFC822 {{{len(m['crudo'])}}}\r\n".encode() + m["crudo"])
+                self.server.contar_bytes(len(m["crudo"]))
+            self.wfile.write(f"* {i + 1} FETCH (".encode() + b" ".join(partes) + b")\r\n")
+        self._enviar(f"{tag} OK FETCH completado")
+
+    def uid_copy(self, tag, argumentos):
+        self._copiar(tag, argumentos, mover=False)
+
+    def uid_move(self, tag, argumentos):
+        self._copiar(tag, argumentos, mover=True)
+
+    def _copiar(self, tag, argumentos, mover: bool):
+        conjunto, _, destino = argumentos.partition(" ")
+        destino = destino.strip('"')
+        with self.buzon.lock:
+            uids = self._uids(conjunto)
+            self.buzon.carpetas.setdefault(destino, [])
+            self.buzon.siguiente_uid.setdefault(destino, 1)
+            for m in self.buzon.carpetas[self.seleccionada]:
+                if m["uid"] not in uids:
+                    continue
+                self.buzon.carpetas[destino].append(dict(m, uid=self.buzon.siguiente_uid[destino], flags=set()))
+                self.buzon.siguiente_uid[destino] += 1
+                if mover:
+                    m["flags"].add("\\Deleted")
+        if mover:
+            self._expunge(uids)
+        self._enviar(f"{tag} OK {'MOVE' if mover else 'COPY'} completado")
+
+    def uid_store(self, tag, argumentos):
+        conjunto, _, cambios = argumentos.partition(" ")
+        with self.buzon.lock:
+            uids = self._uids(conjunto)
+            for m in self.buzon.carpetas[self.seleccionada]:
+                if m["uid"] in uids and "\\Deleted" in cambios:
+                    m["flags"].add("\\Deleted")
+        self._enviar(f"{tag} OK STORE completado")
+
+
+class ServidorImapPrueba(socketserver.ThreadingTCPServer):
+    """Servidor en 127.0.0.1 (puerto libre por defecto). Cada conexión se atiende en su hilo."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, direccion=("127.0.0.1", 0), latencia_fetch: float = 0.0):
+        super().__init__(direccion, _SesionImap)
+        self.buzon = BuzonPrueba()
+        self.latencia_fetch = latencia_fetch
+        self.bytes_servidos = 0
+        self._lock_bytes = threading.Lock()
+
+    def contar_bytes(self, cantidad: int):
+        with self._lock_bytes:
+            self.bytes_servidos += cantidad
+
+    def iniciar(self) -> int:
+        """Atiende en un hilo de fondo y devuelve el puerto."""
+        threading.Thread(target=self.serve_forever, name="servidor_imap_prueba", daemon=True).start()
+        return self.server_address[1]
+
+    def detener(self):
+        self.shutdown()
+        self.server_close()
+
+    def programar_llegadas(self, llegadas: list[tuple[float, bytes]]) -> threading.Thread:
+        """
+        Entrega cada correo a INBOX a los 'segundos' indicados desde ahora
+        (lista de (segundos, crudo)). Devuelve el hilo que los va entregando.
+        """
+        inicio = time.time()
+
+        def entregar():
+            for segundos, crudo in sorted(llegadas, key=lambda llegada: llegada[0]):
+                espera = inicio + segundos - time.time()
+                if espera > 0:
+                    time.sleep(espera)
+                self.buzon.agregar(crudo)
+
+        hilo = threading.Thread(target=entregar, name="llegadas_imap_prueba", daemon=True)
+        hilo.start()
+        return hilo
@@ -0,0 +1,71 @@
+# Core/sesiones.py
+"""
+Persistencia de sesiones autenticadas de Playwright (cookies y localStorage).
+
+Cada aseguradora guarda su 'storage_state' en la carpeta 'Sesiones' del proyecto,
+un archivo por aseguradora y usuario. Así una ejecución nueva puede reutilizar la
+sesión de la anterior y solo repetir el login completo cuando la sesión expiró.
+"""
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from .filtro_recursos import instalar_filtro
+
+
+def ruta_estado_sesion(aseguradora_id: str, usuario: str) -> Path:
+    """Devuelve la ruta del archivo de sesión para una aseguradora y usuario."""
+    # Directorio base del proyecto. Sube dos niveles desde este archivo (Core/sesiones.py -> proyecto/)
+    project_root = Path(__file__).resolve().parents[1]
+    sesiones_dir = project_root / "Sesiones"
+    usuario_limpio = re.sub(r"[^A-Za-z0-9_-]", "_", str(usuario))
+    return sesiones_dir / f"{aseguradora_id}_{usuario_limpio}.json"
+
+
+def crear_contexto(browser, ruta_sesion: Path | None = None, portal: str | None = None):
+    """
+    Crea un contexto de navegador cargando la sesión guardada si existe, e
+    instala el filtro de recursos del portal (ver Core/filtro_recursos.py).
+
+    Returns:
+        (contexto, sesion_cargada, mensaje_log)
+    """
+    context, sesion_cargada, log = _nuevo_contexto(browser, ruta_sesion)
+    log_filtro = instalar_filtro(context, portal)
+    if log_filtro:
+        log = f"{log}\n{log_filtro}"
+    return context, sesion_cargada, log
+
+
+def _nuevo_contexto(browser, ruta_sesion: Path | None):
+    if ruta_sesion and ruta_sesion.is_file():
+        try:
+            context = browser.new_context(storage_state=str(ruta_sesion))
+            return context, True, f"[SESIÓN] Sesión guardada cargada desde '{ruta_sesion.name}'."
+        except Exception as e:
+            # Un archivo corrupto no debe impedir la ejecución: se descarta y se hace login completo.
+            try:
+                ruta_sesion.unlink()
+            except OSError:
+                pass
+            return browser.new_context(), False, f"[SESIÓN] ADVERTENCIA: No se pudo cargar la sesión guardada ({e}). Se descartó."
+    return browser.new_context(), False, "[SESIÓN] No hay sesión guardada. Se hará login completo."
+
+
+def guardar_estado_sesion(context, ruta_sesion: Path) -> str:
+    """
+    Guarda el storage_state del contexto de forma atómica (varios contextos
+    en paralelo pueden escribir el mismo archivo).
+    """
+    try:
+        estado = context.storage_state()
+        ruta_sesion.parent.mkdir(exist_ok=True)
+        fd, ruta_temporal = tempfile.mkstemp(dir=ruta_sesion.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(ruta_temporal, ruta_sesion)
+        return f"[SESIÓN] Sesión autenticada guardada en '{ruta_sesion.name}'."
+    except Exception as e:
+        return f"[SESIÓN] ADVERTENCIA: No se pudo guardar la sesión: {e}"
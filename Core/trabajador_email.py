@@ -1,47 +1,121 @@
 # Core/trabajador_email.py
 
-from PySide6 import QtCore
 import queue
 import traceback
 import time
 import imaplib
+import os
+import select
+import ssl
 import email
 from email.header import decode_header
 from email.utils import parsedate_to_datetime
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 import locale
 
 # Importamos las constantes necesarias
+from .senales import Senal
+from .utilidades_imap import parsear_respuesta_fetch, partes_adjuntas, DecodificadorIncremental
+from .pool_imap import PoolImap
 from Configuracion.constantes import (
-    EMAIL_IMAP_SERVER, EMAIL_USER_ADDRESS, EMAIL_APP_PASSWORD,
+    EMAIL_IMAP_SERVER, EMAIL_IMAP_PUERTO, EMAIL_IMAP_SSL, EMAIL_USER_ADDRESS, EMAIL_APP_PASSWORD,
     AXASOAT_EMAIL_SENDER, EMAIL_SEARCH_RETRIES, EMAIL_SEARCH_DELAY_SECONDS,
-    EMAIL_PROCESSED_FOLDER
+    EMAIL_PROCESSED_FOLDER, EMAIL_IDLE_RENOVAR_SEGUNDOS, EMAIL_LOTE_FETCH,
+    EMAIL_BLOQUE_DESCARGA_BYTES, EMAIL_SERVICIO_ESPERA_MAXIMA_HORAS,
+    EMAIL_CONEXIONES_DESCARGA, EMAIL_NOOP_SEGUNDOS
 )
 
-class EmailListenerWorker(QtCore.QObject):
-    progreso_update = QtCore.Signal(str)
-    finished = QtCore.Signal(list)
+class EmailListenerWorker:
+    """
+    Escucha la cola de radicados y descarga sus correos. Se ejecuta en un threading.Thread.
 
-    def __init__(self, job_queue: queue.Queue):
-        super().__init__()
+    Los radicados recibidos quedan en un conjunto de pendientes en lugar de buscarse
+    uno a uno con reintentos: si el servidor soporta IDLE, el listener espera el aviso
+    EXISTS de un correo nuevo y solo entonces repasa los pendientes. Si no lo soporta,
+    repasa cada EMAIL_SEARCH_DELAY_SECONDS. Un radicado que no llega dentro de
+    EMAIL_SEARCH_RETRIES * EMAIL_SEARCH_DELAY_SECONDS pasa al repaso final.
+
+    Los PDFs se descargan en paralelo con un pool de EMAIL_CONEXIONES_DESCARGA
+    conexiones propias (Core/pool_imap.py); la conexión principal solo vigila el buzón.
+
+    Con 'tabla_pendientes' trabaja en modo servicio (ver Core/servicio_correo.py):
+    los pendientes se leen de la tabla persistente y se quitan de ella al resolverse,
+    esperan hasta EMAIL_SERVICIO_ESPERA_MAXIMA_HORAS y el listener no termina hasta
+    que se le pide (None en la cola); lo no resuelto queda en la tabla para la próxima vez.
+    """
+
+    def __init__(self, job_queue: queue.Queue, tabla_pendientes=None):
+        self.progreso_update = Senal()  # (str)
+        self.finished = Senal()         # (list de trabajos no encontrados)
         self.job_queue = job_queue
         self.is_running = True
         self.failed_jobs = []
         self.imap = None
+        self.recibir_trabajos = True
+        # radicado -> (trabajo, instante límite para encontrar su correo)
+        self.pendientes = {}
+        self._idle_tag = 0
+        # Índice local de los correos de AXA aún no procesados: uid -> asunto y nombres de PDF
+        self.indice_correos = {}
+        self.ultimo_uid = 0
+        self.uidvalidity = None
+        self.inbox_seleccionado = False
+        # Correos ya descargados pendientes de mover a EMAIL_PROCESSED_FOLDER
+        self.uids_por_mover = set()
+        self.tabla_pendientes = tabla_pendientes
+        self._ultima_lectura_tabla = 0.0
+        self.pool_descargas = None
+        # Servidor y tamaño del pool; Core/benchmark_email.py los cambia para usar el servidor local
+        self.imap_servidor = EMAIL_IMAP_SERVER
+        self.imap_puerto = EMAIL_IMAP_PUERTO
+        self.imap_ssl = EMAIL_IMAP_SSL
+        self.conexiones_descarga = EMAIL_CONEXIONES_DESCARGA
 
     def _connect(self):
         try:
             self.progreso_update.emit("[EMAIL_LISTENER] Estableciendo conexión IMAP...")
-            self.imap = imaplib.IMAP4_SSL(EMAIL_IMAP_SERVER)
-            self.imap.login(EMAIL_USER_ADDRESS, EMAIL_APP_PASSWORD)
+            self.imap = self._abrir_conexion()
             self.progreso_update.emit("[EMAIL_LISTENER] Conexión establecida con éxito.")
             return True
         except Exception as e:
             self.progreso_update.emit(f"[EMAIL_LISTENER] ERROR CRÍTICO al conectar a IMAP: {e}")
-            self.is_running = False
+            self.imap = None
+            # En modo servicio se sigue reintentando; durante una ejecución normal se abandona
+            if self.tabla_pendientes is None:
+                self.is_running = False
             return False
 
+    def _abrir_conexion(self) -> imaplib.IMAP4:
+        if self.imap_ssl:
+            imap = imaplib.IMAP4_SSL(self.imap_servidor, self.imap_puerto)
+        else:
+            imap = imaplib.IMAP4(self.imap_servidor, self.imap_puerto)
+        imap.login(EMAIL_USER_ADDRESS, EMAIL_APP_PASSWORD)
+        # Gmail anuncia MOVE y UIDPLUS solo después de autenticarse: se vuelven a pedir
+        status, datos = imap.capability()
+        if status == "OK" and datos and datos[-1]:
+            imap.capabilities = tuple(datos[-1].decode().upper().split())
+        return imap
+
+    def _conexion_descarga(self) -> imaplib.IMAP4:
+        """Conexión para el pool de descargas: INBOX en solo lectura (EXAMINE), solo hace FETCH."""
+        imap = self._abrir_conexion()
+        status, _ = imap.select("INBOX", readonly=True)
+        if status != "OK":
+            raise imaplib.IMAP4.error("No se pudo seleccionar INBOX en la conexión de descarga.")
+        return imap
+
+    def _iniciar_pool(self):
+        if self.conexiones_descarga > 0 and self.pool_descargas is None:
+            self.pool_descargas = PoolImap(self.conexiones_descarga, self._conexion_descarga, self.progreso_update)
+            self.pool_descargas.iniciar()
+
+    def _cerrar_pool(self):
+        if self.pool_descargas is not None:
+            self.pool_descargas.cerrar()
+            self.pool_descargas = None
+
     def _decode_header_value(self, value):
         """Decodifica cabeceras que pueden venir en formatos como =?utf-8?B?...?="""
         if not value: return ""
@@ -57,157 +131,456 @@ class EmailListenerWorker(QtCore.QObject):
         except Exception:
             return str(value)
 
-    def _search_single_email(self, radicado_number, folder_path):
-        """Busca un único email usando la conexión persistente con lógica mejorada."""
-        try:
-            # Seleccionar INBOX en cada búsqueda refresca la vista del servidor
-            self.imap.select("INBOX")
-            
-            # --- MEJORA 1: Búsqueda Filtrada en el Servidor (Optimización) ---
-            # Buscamos desde ayer para cubrir cambios de fecha o retrasos.
-            from datetime import timedelta
-            yesterday_str = (datetime.now() - timedelta(days=1)).strftime("%d-%b-%Y")
-            
-            # Criterio de búsqueda: remitente, fecha (desde ayer) y texto específico (radicado)
-            # El criterio TEXT busca en el cuerpo y asunto, lo que es muy potente.
-            search_query = f'(FROM "{AXASOAT_EMAIL_SENDER}" SINCE {yesterday_str} TEXT "{radicado_number}")'
-            status, messages = self.imap.search(None, search_query)
-            
-            if status != "OK" or not messages[0]:
-                self.progreso_update.emit(f"  [EMAIL] No se encontraron correos con el radicado {radicado_number} desde el {yesterday_str}")
-                return False
-
-            all_ids = messages[0].split()
-            # Como ya filtramos por radicado, es poco probable tener cientos de correos.
-            # Aun así, tomamos los últimos por si hubiera reintentos de AXA.
-            latest_ids = all_ids[-20:]
-
-            for email_id in reversed(latest_ids):
-                # 1. Obtener cabeceras (From, Date, Subject) para pre-filtrado rápido
-                _, header_data = self.imap.fetch(email_id, '(BODY[HEADER.FIELDS (FROM DATE SUBJECT)])')
-                if not header_data or not header_data[0]: continue
-                header_msg = email.message_from_bytes(header_data[0][1])
-
-                # 2. Decodificar remitente y asunto
-                from_header = self._decode_header_value(header_msg['From'])
-                subject = self._decode_header_value(header_msg['Subject'])
-                
+    def _seleccionar_inbox(self):
+        """Selecciona INBOX. Si cambió UIDVALIDITY, los UID conocidos ya no sirven y se reinicia el índice."""
+        status, _ = self.imap.select("INBOX")
+        if status != "OK":
+            raise imaplib.IMAP4.error("No se pudo seleccionar INBOX.")
+        # El EXISTS de SELECT es el total del buzón, no el aviso de un correo nuevo
+        self.imap.untagged_responses.pop("EXISTS", None)
+        _, datos = self.imap.response("UIDVALIDITY")
+        uidvalidity = datos[0] if datos and datos[0] else None
+        if uidvalidity != self.uidvalidity:
+            self.uidvalidity = uidvalidity
+            self.ultimo_uid = 0
+            self.indice_correos = {}
+            self.uids_por_mover = set()
+        self.inbox_seleccionado = True
+
+    def _uids_nuevos(self) -> list[int]:
+        """
+        UIDs de los correos de AXA que llegaron después del último visto, con un solo SEARCH.
+        La primera vez se toman desde ayer, para cubrir cambios de fecha o retrasos; en modo
+        servicio, desde un día antes del pendiente más antiguo de la tabla, porque sus
+        correos pudieron llegar mientras la aplicación estuvo cerrada (hasta
+        EMAIL_SERVICIO_ESPERA_MAXIMA_HORAS).
+        """
+        if self.ultimo_uid:
+            criterio = f'(UID {self.ultimo_uid + 1}:* FROM "{AXASOAT_EMAIL_SENDER}")'
+        else:
+            desde = datetime.now()
+            if self.tabla_pendientes is not None:
+                creados = [creado for _, _, creado in self.tabla_pendientes.listar()]
+                if creados:
+                    desde = min(desde, datetime.fromtimestamp(min(creados)))
+            desde_str = (desde - timedelta(days=1)).strftime("%d-%b-%Y")
+            criterio = f'(FROM "{AXASOAT_EMAIL_SENDER}" SINCE {desde_str})'
+        status, datos = self.imap.uid("SEARCH", None, criterio)
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Falló la búsqueda de correos nuevos: {datos}")
+        # 'N:*' siempre incluye el último mensaje aunque su UID sea menor que N
+        uids = sorted(int(u) for u in (datos[0] or b"").split() if int(u) > self.ultimo_uid)
+        if uids:
+            self.ultimo_uid = uids[-1]
+        return uids
+
+    def _indexar_uids(self, uids: list[int]) -> dict[int, dict]:
+        """
+        Pide en un solo FETCH (por lote) las cabeceras From/Subject y el BODYSTRUCTURE
+        de los correos nuevos. No se descarga ningún cuerpo: solo lo necesario para
+        saber qué PDF trae cada correo y en qué sección está.
+        """
+        indice = {}
+        for i in range(0, len(uids), EMAIL_LOTE_FETCH):
+            lote = ",".join(str(u) for u in uids[i:i + EMAIL_LOTE_FETCH])
+            _, datos = self.imap.uid("FETCH", lote, "(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (FROM SUBJECT)])")
+            for mensaje in parsear_respuesta_fetch(datos):
+                uid = mensaje.get("UID")
+                cabeceras = next((v for k, v in mensaje.items() if k.startswith("BODY[HEADER")), None)
+                if not isinstance(uid, int) or not isinstance(cabeceras, bytes): continue
+                header_msg = email.message_from_bytes(cabeceras)
                 # Re-validar remitente por si el SEARCH de IMAP fue muy permisivo
-                if AXASOAT_EMAIL_SENDER not in from_header: continue
-                
-                self.progreso_update.emit(f"  [EMAIL] Revisando: '{subject}' (ID: {email_id.decode()})")
-
-                # 3. Obtener el cuerpo completo solo si pasó el filtro inicial
-                _, full_msg_data = self.imap.fetch(email_id, '(RFC822)')
-                if not full_msg_data or not full_msg_data[0]: continue
-                full_msg = email.message_from_bytes(full_msg_data[0][1])
-
-                found_attachment = False
-                for part in full_msg.walk():
-                    # Ignorar partes que no son adjuntos
-                    if part.get_content_maintype() == 'multipart': continue
-                    if part.get('Content-Disposition') is None: continue
-
-                    filename = self._decode_header_value(part.get_filename())
-                    if not filename: continue
-
-                    # --- MEJORA 2: Coincidencia más flexible ---
-                    # Buscamos el radicado en el nombre del archivo o en el asunto como respaldo
-                    if (radicado_number in filename or radicado_number in subject) and filename.lower().endswith(".pdf"):
-                        self.progreso_update.emit(f"  -> ¡COINCIDENCIA ENCONTRADA! Adjunto: {filename}")
-                        ruta_guardado = folder_path / filename
-                        
-                        # Guardar el archivo
-                        try:
-                            payload = part.get_payload(decode=True)
-                            if payload:
-                                with open(ruta_guardado, "wb") as f:
-                                    f.write(payload)
-                                found_attachment = True
-                                break
-                        except Exception as e_save:
-                            self.progreso_update.emit(f"  -> ERROR guardando adjunto {filename}: {e_save}")
-
-                if found_attachment:
-                    # Mover el correo a la carpeta de procesados para no volverlo a leer
-                    self.progreso_update.emit("  -> Moviendo correo procesado...")
+                if AXASOAT_EMAIL_SENDER not in self._decode_header_value(header_msg['From']): continue
+
+                adjuntos = []
+                for parte in partes_adjuntas(mensaje.get("BODYSTRUCTURE")):
+                    parte["nombre"] = self._decode_header_value(parte["nombre"])
+                    if parte["nombre"].lower().endswith(".pdf"):
+                        adjuntos.append(parte)
+                indice[uid] = {"asunto": self._decode_header_value(header_msg['Subject']), "adjuntos": adjuntos}
+        return indice
+
+    def _coincide(self, radicado: str, entrada: dict) -> bool:
+        # Buscamos el radicado en el nombre del archivo o en el asunto como respaldo
+        return bool(entrada["adjuntos"]) and (
+            radicado in entrada["asunto"] or any(radicado in a["nombre"] for a in entrada["adjuntos"])
+        )
+
+    def _descargar_parte(self, uid: int, adjunto: dict, destino: Path, imap=None) -> int:
+        """
+        Descarga solo la sección del adjunto (BODY.PEEK[n]) en bloques parciales
+        <inicio.largo> y la decodifica directo a disco. Devuelve los bytes descargados.
+        'imap' es la conexión del pool que hace la descarga (por defecto, la principal).
+        """
+        imap = imap or self.imap
+        decodificador = DecodificadorIncremental(adjunto["codificacion"])
+        temporal = destino.with_name(destino.name + ".part")
+        descargados = 0
+        try:
+            with open(temporal, "wb") as f:
+                while True:
                     try:
-                        self.imap.copy(email_id, EMAIL_PROCESSED_FOLDER)
-                        self.imap.store(email_id, '+FLAGS', '\\Deleted')
-                        self.imap.expunge()
-                    except Exception as e_move:
-                        self.progreso_update.emit(f"  -> AVISO: No se pudo mover/borrar el correo (ID {email_id}): {e_move}")
+                        _, datos = imap.uid(
+                            "FETCH", str(uid), f"(BODY.PEEK[{adjunto['seccion']}]<{descargados}.{EMAIL_BLOQUE_DESCARGA_BYTES}>)"
+                        )
+                    except OSError as e_red:
+                        # Error del socket, no del disco: como 'abort' llega al pool (o al ciclo), que reconecta
+                        raise imaplib.IMAP4.abort(f"Se perdió la conexión descargando el adjunto: {e_red}") from e_red
+                    bloque = next((v for m in parsear_respuesta_fetch(datos) for k, v in m.items() if k.startswith("BODY[")), None)
+                    if not bloque:
+                        break
+                    f.write(decodificador.decodificar(bloque))
+                    descargados += len(bloque)
+                    if len(bloque) < EMAIL_BLOQUE_DESCARGA_BYTES:
+                        break
+                f.write(decodificador.terminar())
+        except BaseException:
+            temporal.unlink(missing_ok=True)
+            raise
+        if not descargados:
+            # El correo ya no está (movido o expurgado tras indexarlo): no se pisa un PDF bueno con 0 bytes
+            temporal.unlink(missing_ok=True)
+            return 0
+        # El PDF solo aparece en la carpeta cuando está completo
+        os.replace(temporal, destino)
+        return descargados
+
+    def _guardar_adjunto(self, uid: int, entrada: dict, radicado: str, folder_path: Path, imap=None) -> bool:
+        """Guarda en la carpeta el PDF del correo que corresponde al radicado."""
+        for adjunto in entrada["adjuntos"]:
+            if radicado not in adjunto["nombre"] and radicado not in entrada["asunto"]: continue
+
+            self.progreso_update.emit(f"  -> ¡COINCIDENCIA ENCONTRADA! Adjunto: {adjunto['nombre']}")
+            try:
+                descargados = self._descargar_parte(uid, adjunto, Path(folder_path) / adjunto["nombre"], imap)
+                if descargados:
+                    self.progreso_update.emit(f"  -> Adjunto guardado ({descargados / 1024:.0f} KB descargados).")
                     return True
+            except OSError as e_save:
+                # Solo errores del disco (permisos, espacio): los de red salen como IMAP4.abort
+                self.progreso_update.emit(f"  -> ERROR guardando adjunto {adjunto['nombre']}: {e_save}")
+        return False
 
-            return False # No se encontró en este ciclo
-        except Exception as e:
-            self.progreso_update.emit(f"  -> ERROR en búsqueda para {radicado_number}: {e}")
-            # Si hay un error de conexión, intentamos reconectar
-            try: 
-                if self.imap: self.imap.logout()
-            except: pass
-            self._connect()
+    def _mover_a_procesados(self):
+        """
+        Mueve a la carpeta de procesados, en una sola operación por UID, todos los
+        correos resueltos en el ciclo. Usa UID MOVE si el servidor lo anuncia; si no,
+        UID COPY + STORE \\Deleted + UID EXPUNGE (o EXPUNGE sin UIDPLUS). Si falla,
+        los UID quedan para el siguiente ciclo.
+        """
+        if not self.uids_por_mover:
+            return
+        conjunto = ",".join(str(u) for u in sorted(self.uids_por_mover))
+        cantidad = len(self.uids_por_mover)
+        self.progreso_update.emit(f"  -> Moviendo {cantidad} correo(s) procesado(s)...")
+        try:
+            if "MOVE" in self.imap.capabilities:
+                status, datos = self.imap.uid("MOVE", conjunto, EMAIL_PROCESSED_FOLDER)
+            else:
+                status, datos = self.imap.uid("COPY", conjunto, EMAIL_PROCESSED_FOLDER)
+                if status == "OK":
+                    status, datos = self.imap.uid("STORE", conjunto, "+FLAGS", "(\\Deleted)")
+                if status == "OK":
+                    if "UIDPLUS" in self.imap.capabilities:
+                        # Solo borra estos UID, no otros correos marcados por el usuario
+                        status, datos = self.imap.uid("EXPUNGE", conjunto)
+                    else:
+                        status, datos = self.imap.expunge()
+            if status != "OK":
+                raise imaplib.IMAP4.error(datos)
+            self.uids_por_mover.clear()
+        except imaplib.IMAP4.error as e_move:
+            self.progreso_update.emit(f"  -> AVISO: No se pudieron mover los correos (UID {conjunto}): {e_move}. Se reintentará.")
+
+    def _emparejar(self, trabajos: dict) -> set:
+        """
+        Un ciclo de búsqueda para todos los radicados de 'trabajos' (radicado -> carpeta):
+        un SEARCH por los correos nuevos de AXA, que se indexan una sola vez (solo
+        cabeceras y BODYSTRUCTURE), y luego la coincidencia se hace localmente contra
+        todo el índice. Solo se descarga el PDF que coincide. Devuelve los radicados resueltos.
+        """
+        if not self.inbox_seleccionado:
+            self._seleccionar_inbox()
+
+        uids = self._uids_nuevos()
+        if uids:
+            nuevos = self._indexar_uids(uids)
+            for uid, entrada in nuevos.items():
+                self.progreso_update.emit(f"  [EMAIL] Nuevo correo de AXA: '{entrada['asunto']}' (UID: {uid})")
+            self.indice_correos.update(nuevos)
+
+        # Primero se decide localmente qué correo corresponde a cada radicado y luego se descargan todos a la vez
+        coincidencias, asignados = [], set()
+        for radicado, folder_path in trabajos.items():
+            for uid, entrada in self.indice_correos.items():
+                if uid in asignados or not self._coincide(radicado, entrada): continue
+                coincidencias.append((radicado, uid, entrada, folder_path))
+                asignados.add(uid)
+                break
+
+        encontrados = set()
+        for radicado, uid in self._descargar_coincidencias(coincidencias):
+            self.uids_por_mover.add(uid)
+            self.indice_correos.pop(uid, None)
+            encontrados.add(radicado)
+        self._mover_a_procesados()
+        return encontrados
+
+    def _descargar_coincidencias(self, coincidencias: list) -> list[tuple[str, int]]:
+        """
+        Guarda el PDF de cada coincidencia (radicado, uid, entrada, carpeta). Con pool las
+        descargas van en paralelo, cada una por su conexión; sin él, por la conexión principal.
+        Devuelve los (radicado, uid) guardados; los que fallan se reintentan en el siguiente ciclo.
+        """
+        if self.pool_descargas is None or len(coincidencias) < 2:
+            return [
+                (radicado, uid) for radicado, uid, entrada, carpeta in coincidencias
+                if self._guardar_adjunto(uid, entrada, radicado, carpeta)
+            ]
+
+        futuros = [
+            (radicado, uid, self.pool_descargas.enviar(
+                lambda imap, uid=uid, entrada=entrada, radicado=radicado, carpeta=carpeta:
+                    self._guardar_adjunto(uid, entrada, radicado, carpeta, imap)
+            ))
+            for radicado, uid, entrada, carpeta in coincidencias
+        ]
+        guardados = []
+        for radicado, uid, futuro in futuros:
+            try:
+                if futuro.result():
+                    guardados.append((radicado, uid))
+            except Exception as e:
+                self.progreso_update.emit(f"  -> ERROR descargando el correo de {radicado} (UID {uid}): {e}")
+        return guardados
+
+    def _idle_soportado(self) -> bool:
+        return self.imap is not None and "IDLE" in self.imap.capabilities
+
+    def _datos_en_buffer(self) -> bool:
+        """True si imaplib ya tiene bytes leídos y sin procesar (p. ej. un EXISTS que llegó junto con '+ idling')."""
+        sock = self.imap.sock
+        timeout_anterior = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(self.imap.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
             return False
+        finally:
+            sock.settimeout(timeout_anterior)
+
+    def _esperar_idle(self, timeout_segundos: float) -> bool:
+        """
+        IDLE (RFC 2177) hecho a mano: imaplib no lo trae en Python 3.11.
+        Espera hasta que el servidor avise un correo nuevo (EXISTS), llegue un
+        radicado a la cola o se cumpla el tiempo. Devuelve True si hubo aviso.
+        """
+        if not self.inbox_seleccionado:
+            self._seleccionar_inbox()
+        # El servidor puede haber avisado un correo nuevo durante el último ciclo (SEARCH, FETCH, MOVE);
+        # imaplib lo guarda y, si se entrara a IDLE, no se volvería a avisar hasta el siguiente correo
+        if self.imap.untagged_responses.pop("EXISTS", None):
+            return True
+        self._idle_tag += 1
+        tag = f"IDLE{self._idle_tag}".encode()
+        self.imap.send(tag + b" IDLE\r\n")
+        respuesta = self.imap.readline()
+        if not respuesta.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"El servidor rechazó IDLE: {respuesta!r}")
+
+        sock = self.imap.sock
+        hubo_aviso = False
+        limite = time.time() + timeout_segundos
+        while self.is_running and time.time() < limite and self.job_queue.empty():
+            # imaplib lee con buffer y el SSL puede tener bytes ya descifrados: select() no ve ninguno de los dos
+            hay_datos = (
+                self._datos_en_buffer()
+                or (hasattr(sock, "pending") and sock.pending())
+                or select.select([sock], [], [], 1)[0]
+            )
+            if not hay_datos:
+                continue
+            linea = self.imap.readline()
+            if not linea:
+                raise imaplib.IMAP4.abort("El servidor cerró la conexión durante IDLE.")
+            if linea.rstrip().upper().endswith(b"EXISTS"):
+                hubo_aviso = True
+                break
+
+        self.imap.send(b"DONE\r\n")
+        while True:
+            linea = self.imap.readline()
+            if not linea:
+                raise imaplib.IMAP4.abort("El servidor cerró la conexión al terminar IDLE.")
+            if linea.startswith(tag + b" "):
+                break
+        return hubo_aviso
+
+    def _recibir_trabajos(self, timeout: float = 0) -> list:
+        """Pasa los radicados de la cola a 'pendientes'. Devuelve los trabajos nuevos."""
+        nuevos = []
+        while self.recibir_trabajos:
+            try:
+                job = self.job_queue.get(timeout=timeout) if timeout and not nuevos else self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # No llegarán más radicados: se termina cuando se vacíen los pendientes.
+                # En modo servicio es la orden de detenerse (lo pendiente sigue en la tabla).
+                self.recibir_trabajos = False
+                if self.tabla_pendientes is not None:
+                    self.is_running = False
+                break
+            radicado, _ = job
+            self.pendientes[radicado] = (job, self._limite_espera(time.time()))
+            nuevos.append(job)
+        return nuevos
+
+    def _limite_espera(self, desde: float) -> float:
+        if self.tabla_pendientes is not None:
+            return desde + EMAIL_SERVICIO_ESPERA_MAXIMA_HORAS * 3600
+        return desde + EMAIL_SEARCH_RETRIES * EMAIL_SEARCH_DELAY_SECONDS
+
+    def _leer_tabla(self, forzar: bool = False) -> list:
+        """
+        Modo servicio: incorpora los radicados de la tabla persistente (registrados antes
+        de reiniciar la aplicación o por otro proceso). Se relee cada EMAIL_IDLE_RENOVAR_SEGUNDOS.
+        """
+        if self.tabla_pendientes is None:
+            return []
+        if not forzar and time.time() - self._ultima_lectura_tabla < EMAIL_IDLE_RENOVAR_SEGUNDOS:
+            return []
+        self._ultima_lectura_tabla = time.time()
+        nuevos = []
+        for radicado, carpeta, creado in self.tabla_pendientes.listar():
+            if radicado not in self.pendientes:
+                job = (radicado, carpeta)
+                self.pendientes[radicado] = (job, self._limite_espera(creado))
+                nuevos.append(job)
+        return nuevos
+
+    def _buscar_pendientes(self):
+        """Un ciclo de búsqueda para todos los pendientes; los encontrados salen del conjunto."""
+        trabajos = {radicado: job[1] for radicado, (job, _) in self.pendientes.items()}
+        for radicado in self._emparejar(trabajos):
+            self.pendientes.pop(radicado, None)
+            if self.tabla_pendientes is not None:
+                self.tabla_pendientes.quitar(radicado)
+
+    def _vencer_pendientes(self):
+        """Los radicados que superaron su tiempo de espera pasan al repaso final."""
+        ahora = time.time()
+        for radicado, (job, limite) in list(self.pendientes.items()):
+            if ahora >= limite:
+                del self.pendientes[radicado]
+                if self.tabla_pendientes is not None:
+                    self.progreso_update.emit(
+                        f"[EMAIL_LISTENER] ADVERTENCIA: No llegó el correo de {radicado} en "
+                        f"{EMAIL_SERVICIO_ESPERA_MAXIMA_HORAS} h. Se deja de esperar."
+                    )
+                    self.tabla_pendientes.quitar(radicado)
+                    continue
+                self.progreso_update.emit(f"[EMAIL_LISTENER] ADVERTENCIA: No llegó el correo de {radicado} a tiempo. Se repasará.")
+                self.failed_jobs.append(job)
+
+    def _reconectar(self, motivo):
+        self.inbox_seleccionado = False
+        self.progreso_update.emit(f"[EMAIL_LISTENER] ADVERTENCIA: La conexión se perdió ({motivo}). Intentando reconectar...")
+        try:
+            if self.imap: self.imap.logout()
+        except Exception: pass
+        self._connect()
 
-    @QtCore.Slot()
     def run(self):
-        self.progreso_update.emit("--- Hilo de Escucha de Email INICIADO (Modo Conexión Persistente) ---")
-        if not self._connect(): return
+        modo_servicio = self.tabla_pendientes is not None
+        self.progreso_update.emit(
+            "--- Servicio de Correo INICIADO (Modo Conexión Persistente) ---" if modo_servicio else
+            "--- Hilo de Escucha de Email INICIADO (Modo Conexión Persistente) ---"
+        )
+        if not self._connect() and not modo_servicio: return
+        self._iniciar_pool()
+
+        usar_idle = self._idle_soportado()
+        if self.imap is not None:
+            self.progreso_update.emit(
+                "[EMAIL_LISTENER] El servidor soporta IDLE: se esperarán sus avisos de correo nuevo."
+                if usar_idle else
+                f"[EMAIL_LISTENER] El servidor no soporta IDLE: se revisará cada {EMAIL_SEARCH_DELAY_SECONDS} s."
+            )
+        if modo_servicio:
+            self._leer_tabla(forzar=True)
+            self.progreso_update.emit(f"[EMAIL_LISTENER] Radicados pendientes de correo: {len(self.pendientes)}")
+            if self.pendientes and self.imap is not None:
+                # Sus correos pueden haber llegado mientras la aplicación estaba cerrada
+                try:
+                    self._buscar_pendientes()
+                except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError) as e:
+                    self._reconectar(e)
 
         # --- LÓGICA DE "KEEP-ALIVE" (MANTENER LA CONEXIÓN VIVA) ---
         last_noop_time = time.time()
-        NOOP_INTERVAL_SECONDS = 240 # Enviar un NOOP cada 4 minutos (240 segundos)
-        
-        # --- PRIMERA PASADA ---
-        while self.is_running:
+
+        # --- PRIMERA PASADA: hasta que no lleguen más radicados y no quede ninguno pendiente ---
+        while self.is_running and (self.recibir_trabajos or self.pendientes):
             try:
-                job = self.job_queue.get(timeout=1)
-                if job is None: self.is_running = False; continue
-                radicado, folder_path = job
-                
-                # Bucle de reintentos para un solo radicado
-                found = False
-                for i in range(EMAIL_SEARCH_RETRIES):
-                    self.progreso_update.emit(f"[EMAIL_LISTENER] Buscando {radicado} (Intento {i+1})...")
-                    if self._search_single_email(radicado, folder_path):
-                        found = True
-                        break
-                    time.sleep(EMAIL_SEARCH_DELAY_SECONDS)
+                if self.imap is None:
+                    # Modo servicio sin conexión: se reintenta tras una pausa (atenta a la orden de detenerse)
+                    self._recibir_trabajos(timeout=EMAIL_SEARCH_DELAY_SECONDS)
+                    if self.is_running and self._connect():
+                        usar_idle = self._idle_soportado()
+                        last_noop_time = time.time()
+                        self._buscar_pendientes()
+                    continue
 
-                if not found:
-                    self.progreso_update.emit(f"[EMAIL_LISTENER] ADVERTENCIA: No se encontró {radicado} en 1ª pasada. Se repasará.")
-                    self.failed_jobs.append(job)
+                if not self.pendientes:
+                    # Nada que esperar: solo se mantiene viva la conexión mientras llegan radicados
+                    nuevos = self._recibir_trabajos(timeout=1) or self._leer_tabla()
+                    if not nuevos:
+                        if time.time() - last_noop_time > EMAIL_NOOP_SEGUNDOS:
+                            self.imap.noop()
+                            last_noop_time = time.time()
+                        continue
+                    if not self.is_running: break
+                    self._buscar_pendientes()
+                    continue
+
+                # Hay pendientes: se espera un correo nuevo (o un radicado nuevo en la cola)
+                if usar_idle:
+                    self._esperar_idle(EMAIL_IDLE_RENOVAR_SEGUNDOS)
+                else:
+                    self._recibir_trabajos(timeout=EMAIL_SEARCH_DELAY_SECONDS)
+                last_noop_time = time.time()
+
+                self._recibir_trabajos()
+                self._leer_tabla()
+                if not self.is_running: break
+                # Tras el aviso (o el tiempo de renovación) se repasan todos los pendientes
+                self._buscar_pendientes()
+                self._vencer_pendientes()
+
+            except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError) as e:
+                self._reconectar(e)
+                usar_idle = self._idle_soportado()
+                last_noop_time = time.time()
+                # Pausa antes de reintentar para no martillar el servidor si el error persiste
+                self._recibir_trabajos(timeout=EMAIL_SEARCH_DELAY_SECONDS)
+
+        # --- REPASO FINAL (no aplica al servicio: lo no resuelto sigue en la tabla) ---
+        if self.is_running and self.failed_jobs and not modo_servicio:
+            self.progreso_update.emit(f"\n--- REPASO FINAL: {len(self.failed_jobs)} pendiente(s) ---")
+            try:
+                encontrados = self._emparejar({radicado: folder_path for radicado, folder_path in self.failed_jobs})
+                self.failed_jobs = [job for job in self.failed_jobs if job[0] not in encontrados]
+            except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError) as e:
+                self.progreso_update.emit(f"[EMAIL_LISTENER] ERROR en el repaso final: {e}")
+        # Si el listener se detuvo por un error de conexión, lo que quedó pendiente se reporta como fallo
+        if not modo_servicio:
+            self.failed_jobs.extend(job for job, _ in self.pendientes.values())
 
-            except queue.Empty:
-                # --- La cola está vacía, aquí es donde manejamos la inactividad ---
-                current_time = time.time()
-                if current_time - last_noop_time > NOOP_INTERVAL_SECONDS:
-                    try:
-                        self.progreso_update.emit("[EMAIL_LISTENER] Conexión inactiva, enviando NOOP para mantenerla viva...")
-                        self.imap.noop()
-                        self.progreso_update.emit("[EMAIL_LISTENER] NOOP exitoso. La conexión está activa.")
-                        last_noop_time = current_time
-                    except (imaplib.IMAP4.abort, imaplib.IMAP4.readonly) as e:
-                        # Si el NOOP falla, significa que la conexión ya se había perdido.
-                        self.progreso_update.emit(f"[EMAIL_LISTENER] ADVERTENCIA: La conexión se perdió ({e}). Intentando reconectar...")
-                        self._connect() # Intentar restablecer la conexión para el siguiente ciclo.
-                        last_noop_time = time.time()
-                continue
-        
-        # --- CICLO DE REPASO ---
-        for i in range(3): # Repasar la lista de fallos 3 veces
-            if not self.failed_jobs: break
-            self.progreso_update.emit(f"\n--- REPASO FINAL #{i+1}: {len(self.failed_jobs)} pendiente(s) ---")
-            time.sleep(30)
-            
-            still_failed = []
-            for job in self.failed_jobs:
-                radicado, folder_path = job
-                if not self._search_single_email(radicado, folder_path):
-                    still_failed.append(job)
-            self.failed_jobs = still_failed
-        
         self.progreso_update.emit("[EMAIL_LISTENER] Desconectando de IMAP...")
-        if self.imap: self.imap.logout()
+        self._cerrar_pool()
+        try:
+            if self.imap: self.imap.logout()
+        except Exception: pass
         self.progreso_update.emit("[EMAIL_LISTENER] Desconectado de IMAP...")
-        self.finished.emit(self.failed_jobs)
\ No newline at end of file
+        self.finished.emit(self.failed_jobs)
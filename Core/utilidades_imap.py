@@ -0,0 +1,224 @@
+# Core/utilidades_imap.py
+"""
+Utilidades IMAP de bajo nivel que imaplib no trae.
+
+- parsear_respuesta_fetch: convierte la respuesta cruda de FETCH (con literales
+  {n}) en un diccionario por mensaje, p. ej. {"UID": 5, "BODYSTRUCTURE": [...]}.
+- partes_adjuntas: recorre un BODYSTRUCTURE y lista las partes con nombre de
+  archivo, con su número de sección para pedir solo esa parte (BODY.PEEK[n]).
+- DecodificadorIncremental: decodifica base64 o quoted-printable por bloques,
+  para escribir un adjunto a disco sin tenerlo completo en memoria.
+"""
+import base64
+import binascii
+import quopri
+from email.utils import collapse_rfc2231_value, decode_params, unquote
+
+
+# --- Lectura de respuestas IMAP (s-expresiones con literales) ---
+
+def _unir_respuesta(datos) -> bytes:
+    """imaplib entrega los literales como tuplas (línea_con_{n}, bytes); se rearma el flujo original."""
+    partes = []
+    for item in datos:
+        if isinstance(item, tuple):
+            partes.append(item[0] + b"\r\n" + item[1])
+        elif item:
+            partes.append(item)
+    return b"".join(partes)
+
+
+class _Lector:
+    def __init__(self, texto: bytes):
+        self.texto = texto
+        self.pos = 0
+
+    def _saltar_espacios(self):
+        while self.pos < len(self.texto) and self.texto[self.pos] in b" \r\n\t":
+            self.pos += 1
+
+    def fin(self) -> bool:
+        self._saltar_espacios()
+        return self.pos >= len(self.texto)
+
+    def valor(self):
+        """Lee el siguiente valor: lista, cadena, literal, número, NIL o átomo."""
+        self._saltar_espacios()
+        c = self.texto[self.pos:self.pos + 1]
+        if c == b"(":
+            self.pos += 1
+            lista = []
+            while True:
+                self._saltar_espacios()
+                if self.texto[self.pos:self.pos + 1] == b")":
+                    self.pos += 1
+                    return lista
+                if self.pos >= len(self.texto):
+                    raise ValueError("Respuesta IMAP incompleta: falta ')'.")
+                lista.append(self.valor())
+        if c == b'"':
+            self.pos += 1
+            salida = bytearray()
+            while self.texto[self.pos:self.pos + 1] != b'"':
+                if self.texto[self.pos:self.pos + 1] == b"\\":
+                    self.pos += 1
+                salida += self.texto[self.pos:self.pos + 1]
+                self.pos += 1
+            self.pos += 1
+            return bytes(salida)
+        if c == b"{":
+            cierre = self.texto.index(b"}", self.pos)
+            largo = int(self.texto[self.pos + 1:cierre])
+            inicio = cierre + 1
+            if self.texto[inicio:inicio + 2] == b"\r\n":
+                inicio += 2
+            self.pos = inicio + largo
+            return self.texto[inicio:self.pos]
+        return self._atomo()
+
+    def _atomo(self):
+        inicio = self.pos
+        while self.pos < len(self.texto) and self.texto[self.pos] not in b" ()\r\n":
+            if self.texto[self.pos:self.pos + 1] == b"[":
+                # BODY[HEADER.FIELDS (FROM SUBJECT)] incluye espacios y paréntesis dentro de los corchetes
+                self.pos = self.texto.index(b"]", self.pos)
+            self.pos += 1
+        atomo = self.texto[inicio:self.pos]
+        if atomo.upper() == b"NIL":
+            return None
+        if atomo.isdigit():
+            return int(atomo)
+        return atomo
+
+
+def parsear_respuesta_fetch(datos) -> list[dict]:
+    """
+    Convierte la respuesta de imap.fetch/imap.uid('FETCH', ...) en una lista de
+    diccionarios, uno por mensaje. Las claves son los nombres de los ítems en
+    mayúsculas ('UID', 'BODYSTRUCTURE', 'BODY[2]<0>', ...).
+    """
+    lector = _Lector(_unir_respuesta(datos))
+    mensajes = []
+    while not lector.fin():
+        lector.valor()  # número de secuencia
+        items = lector.valor()
+        if not isinstance(items, list):
+            continue
+        mensaje = {}
+        for i in range(0, len(items) - 1, 2):
+            clave = items[i].decode("ascii", errors="replace").upper() if isinstance(items[i], bytes) else str(items[i])
+            mensaje[clave] = items[i + 1]
+        mensajes.append(mensaje)
+    return mensajes
+
+
+# --- BODYSTRUCTURE ---
+
+def _texto(valor) -> str:
+    return valor.decode("utf-8", errors="replace") if isinstance(valor, bytes) else ("" if valor is None else str(valor))
+
+
+def _parametros(lista) -> dict[str, str]:
+    """("NAME" "x.pdf" "CHARSET" "utf-8") -> {"name": "x.pdf", "charset": "utf-8"}"""
+    if not isinstance(lista, list):
+        return {}
+    parametros = {}
+    for i in range(0, len(lista) - 1, 2):
+        parametros[_texto(lista[i]).lower()] = _texto(lista[i + 1])
+    return parametros
+
+
+def _nombre_archivo(parametros: dict[str, str]) -> str:
+    """
+    filename (o name) de la parte. Aplica RFC 2231: une las continuaciones
+    (filename*0*, filename*1*, ...) y decodifica utf-8''nombre%C3%A1.pdf.
+    """
+    decodificados = dict(decode_params([("", "")] + list(parametros.items())))
+    for clave in ("filename", "name"):
+        if decodificados.get(clave):
+            return unquote(collapse_rfc2231_value(decodificados[clave]))
+    return ""
+
+
+def _disposicion(parte: list) -> tuple[str, dict[str, str]]:
+    """Busca el campo de disposición (("ATTACHMENT" ("FILENAME" ...))) en la extensión de la parte."""
+    for campo in parte[7:]:
+        if (
+            isinstance(campo, list) and len(campo) == 2
+            and isinstance(campo[0], bytes) and isinstance(campo[1], list)
+        ):
+            return _texto(campo[0]).lower(), _parametros(campo[1])
+    return "", {}
+
+
+def partes_adjuntas(estructura, seccion: str = "") -> list[dict]:
+    """
+    Lista las partes con nombre de archivo del BODYSTRUCTURE.
+
+    Cada parte: {"seccion": "2", "tipo": "application/pdf", "nombre": "...",
+    "codificacion": "base64", "tamano": 123456}. 'nombre' puede venir como
+    encoded-word (=?utf-8?B?...?=); quien lo use debe decodificarlo.
+    """
+    if not isinstance(estructura, list) or not estructura:
+        return []
+
+    if isinstance(estructura[0], list):
+        # Multiparte: las subpartes van primero y luego el subtipo (MIXED, ALTERNATIVE, ...)
+        partes = []
+        numero = 0
+        for subparte in estructura:
+            if not isinstance(subparte, list):
+                break
+            numero += 1
+            partes.extend(partes_adjuntas(subparte, f"{seccion}.{numero}" if seccion else str(numero)))
+        return partes
+
+    tipo = f"{_texto(estructura[0]).lower()}/{_texto(estructura[1]).lower()}"
+    _, parametros_disposicion = _disposicion(estructura)
+    nombre = _nombre_archivo(parametros_disposicion) or _nombre_archivo(_parametros(estructura[2]))
+    if not nombre:
+        return []
+    return [{
+        "seccion": seccion or "1",
+        "tipo": tipo,
+        "nombre": nombre,
+        "codificacion": _texto(estructura[5]).lower() if len(estructura) > 5 else "7bit",
+        "tamano": estructura[6] if len(estructura) > 6 and isinstance(estructura[6], int) else 0,
+    }]
+
+
+# --- Decodificación por bloques ---
+
+class DecodificadorIncremental:
+    """Decodifica la transferencia de una parte MIME por bloques (base64, quoted-printable o sin codificar)."""
+
+    def __init__(self, codificacion: str):
+        self.codificacion = (codificacion or "7bit").lower()
+        self._resto = b""
+
+    def decodificar(self, bloque: bytes) -> bytes:
+        if self.codificacion == "base64":
+            datos = self._resto + b"".join(bloque.split())
+            corte = len(datos) - len(datos) % 4
+            self._resto = datos[corte:]
+            try:
+                return base64.b64decode(datos[:corte])
+            except binascii.Error:
+                return base64.b64decode(datos[:corte] + b"==", validate=False)
+        if self.codificacion == "quoted-printable":
+            # Un '=XX' o un salto suave pueden quedar partidos: se guarda desde el último salto de línea
+            datos = self._resto + bloque
+            corte = datos.rfind(b"\n") + 1
+            self._resto = datos[corte:]
+            return quopri.decodestring(datos[:corte])
+        return bloque
+
+    def terminar(self) -> bytes:
+        resto, self._resto = self._resto, b""
+        if not resto:
+            return b""
+        if self.codificacion == "base64":
+            return base64.b64decode(resto + b"=" * (-len(resto) % 4))
+        if self.codificacion == "quoted-printable":
+            return quopri.decodestring(resto)
+        return resto
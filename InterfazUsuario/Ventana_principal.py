@@ -6,12 +6,13 @@ from PySide6 import QtWidgets, QtCore, QtGui
 import traceback
 
 try:
-    from Core.trabajador_automatizacion import TrabajadorAutomatizacion
+    from Core.trabajador_automatizacion import TrabajadorAutomatizacion, TrabajadorLote, TrabajadorServicioCorreo
     from Core.trabajador_reporte import TrabajadorReporte
     from Core.utilidades import resource_path
     from Configuracion.constantes import (
         APP_VERSION, CONFIGURACION_AREAS, AREA_GLOSAS_ID, 
-        AREA_FACTURACION_ID, MUNDIAL_ESCOLAR_ID, GRUPO_SIS_ID
+        AREA_FACTURACION_ID, MUNDIAL_ESCOLAR_ID, GRUPO_SIS_ID,
+        ARCHIVO_BITACORA_AUTOMATIZACION, EMAIL_MODO_SERVICIO
     )
     from Automatizaciones.glosas import mundial_escolar
 except ImportError as e:
@@ -50,6 +51,10 @@ class VentanaPrincipal(QtWidgets.QWidget):
         self.hilo_activo = None
         self.worker_activo = None
         self.app_icon = None
+        # Cola de trabajos (área, aseguradora, carpeta) para ejecutar como lote
+        self.cola_lote = []
+        # Servicio de correo en segundo plano (vive mientras la aplicación esté abierta)
+        self.servicio_correo = None
 
         # --- Configuración Ventana ---
         self.setWindowTitle(f"Automatizador SOAT Glosas v{APP_VERSION}")
@@ -81,6 +86,8 @@ class VentanaPrincipal(QtWidgets.QWidget):
         self._crear_grupo_input_glosas()  # Nuevo área para Grupo SIS
         self._crear_grupo_seleccion_carpeta()
         self._crear_botones_accion()
+        self._crear_grupo_cola_lote()
+        self._crear_estado_servicio_correo()
         self._crear_area_log()
 
         # --- Añadir Widgets y Layouts al Principal ---
@@ -91,6 +98,8 @@ class VentanaPrincipal(QtWidgets.QWidget):
         self.main_layout.addWidget(self.grupo_input_glosas) # Añadir a layout
         self.main_layout.addWidget(self.grupo_seleccion_carpeta)
         self.main_layout.addLayout(self.layout_botones)
+        self.main_layout.addWidget(self.grupo_cola_lote)
+        self.main_layout.addWidget(self.pendientes_correo_label)
         self.main_layout.addWidget(self.log_label)
         self.main_layout.addWidget(self.log_text_edit, stretch=1)
 
@@ -100,12 +109,16 @@ class VentanaPrincipal(QtWidgets.QWidget):
         self.browse_button.clicked.connect(self._seleccionar_carpeta)
         self.start_button.clicked.connect(self._iniciar_automatizacion)
         self.report_button.clicked.connect(self._generar_reporte)
+        self.agregar_cola_button.clicked.connect(self._agregar_a_cola)
+        self.limpiar_cola_button.clicked.connect(self._limpiar_cola)
+        self.ejecutar_cola_button.clicked.connect(self._ejecutar_cola)
 
         # --- Llamada inicial para poblar las aseguradoras
         self._actualizar_combo_aseguradoras()
         self._manejar_cambio_aseguradora() # Forzar ocultar/mostrar inicial
         # --- Estado inicial de botones ---
         self._actualizar_estado_botones(proceso_corriendo=False)
+        self._iniciar_servicio_correo()
 
         # --- MOSTRAR ICONO DE BANDEJA AL INICIO ---
         if self.tray_icon and QtWidgets.QSystemTrayIcon.isSystemTrayAvailable():
@@ -293,6 +306,33 @@ class VentanaPrincipal(QtWidgets.QWidget):
         self.layout_botones.addWidget(self.report_button)
         self.layout_botones.addStretch(1)  # Espacio a la derecha
 
+    def _crear_grupo_cola_lote(self):
+        """Crea el GroupBox de la cola de trabajos para ejecutar varias cuentas en lote."""
+        self.grupo_cola_lote = QtWidgets.QGroupBox("Cola de Trabajos (Lote)")
+        layout = QtWidgets.QVBoxLayout(self.grupo_cola_lote)
+
+        self.lista_cola_lote = QtWidgets.QListWidget()
+        self.lista_cola_lote.setMaximumHeight(90)
+        layout.addWidget(self.lista_cola_lote)
+
+        layout_botones_cola = QtWidgets.QHBoxLayout()
+        self.agregar_cola_button = QtWidgets.QPushButton("Agregar a la Cola")
+        self.limpiar_cola_button = QtWidgets.QPushButton("Limpiar Cola")
+        self.ejecutar_cola_button = QtWidgets.QPushButton("Ejecutar Cola")
+        layout_botones_cola.addWidget(self.agregar_cola_button)
+        layout_botones_cola.addWidget(self.limpiar_cola_button)
+        layout_botones_cola.addStretch(1)
+        layout_botones_cola.addWidget(self.ejecutar_cola_button)
+        layout.addLayout(layout_botones_cola)
+
+    def _crear_estado_servicio_correo(self):
+        """Etiqueta con los radicados que aún esperan su correo (se refresca con un QTimer)."""
+        self.pendientes_correo_label = QtWidgets.QLabel("")
+        self.pendientes_correo_label.setVisible(EMAIL_MODO_SERVICIO)
+        self.timer_pendientes_correo = QtCore.QTimer(self)
+        self.timer_pendientes_correo.setInterval(10_000)
+        self.timer_pendientes_correo.timeout.connect(self._actualizar_pendientes_correo)
+
     def _crear_area_log(self):
         """Crea el área de log."""
         self.log_label = QtWidgets.QLabel("Log de Proceso:")
@@ -390,6 +430,8 @@ class VentanaPrincipal(QtWidgets.QWidget):
             )
             return
 
+        reanudar = self._preguntar_reanudar(aseguradora_id, folder_path)
+
         self.log_text_edit.clear()
         self.log_text_edit.append(
             f"Preparando automatización para {self.combo_aseguradora.currentText()}..."
@@ -403,7 +445,8 @@ class VentanaPrincipal(QtWidgets.QWidget):
         self.worker_activo = TrabajadorAutomatizacion(
             area_id, aseguradora_id, folder_path, modo_headless, 
             input_glosas=input_glosas,
-            modo_grupo_sis=modo_grupo_sis
+            modo_grupo_sis=modo_grupo_sis,
+            reanudar=reanudar
         )
         self.worker_activo.moveToThread(self.hilo_activo)
 
@@ -422,6 +465,107 @@ class VentanaPrincipal(QtWidgets.QWidget):
 
 
 
+    def _preguntar_reanudar(self, aseguradora_id, folder_path) -> bool:
+        """Si una ejecución anterior quedó interrumpida, ofrece reanudarla desde la bitácora."""
+        ruta_bitacora = Path(folder_path) / ARCHIVO_BITACORA_AUTOMATIZACION
+        if aseguradora_id in (GRUPO_SIS_ID, MUNDIAL_ESCOLAR_ID) or not ruta_bitacora.is_file():
+            return False
+        resp = QtWidgets.QMessageBox.question(
+            self,
+            "Reanudar Ejecución",
+            f"La carpeta '{os.path.basename(folder_path)}' tiene una bitácora de una ejecución anterior.\n\n"
+            "¿Desea reanudarla? Las carpetas ya terminadas se omitirán y las fallidas se reintentarán.\n"
+            "Si elige 'No', la bitácora se descartará y se procesará todo de nuevo.",
+            QtWidgets.QMessageBox.StandardButton.Yes
+            | QtWidgets.QMessageBox.StandardButton.No,
+            QtWidgets.QMessageBox.StandardButton.Yes,
+        )
+        return resp == QtWidgets.QMessageBox.StandardButton.Yes
+
+    @QtCore.Slot()
+    def _agregar_a_cola(self):
+        """Agrega la selección actual (área, aseguradora, carpeta) a la cola del lote."""
+        area_id = self.combo_area.currentData()
+        aseguradora_id = self.combo_aseguradora.currentData()
+        folder_path = self.folder_line_edit.text()
+
+        if (
+            not aseguradora_id
+            or not folder_path
+            or folder_path == "..."
+            or not os.path.exists(folder_path)
+            or (aseguradora_id != GRUPO_SIS_ID and not os.path.isdir(folder_path))
+        ):
+            QtWidgets.QMessageBox.warning(
+                self, "Entrada Inválida", "Seleccione aseguradora y carpeta/archivo válida."
+            )
+            return
+        if any(t["aseguradora"] == aseguradora_id and t["carpeta"] == folder_path for t in self.cola_lote):
+            QtWidgets.QMessageBox.warning(
+                self, "Trabajo Repetido", "Esa carpeta ya está en la cola para esta aseguradora."
+            )
+            return
+
+        trabajo = {
+            "area": area_id,
+            "aseguradora": aseguradora_id,
+            "carpeta": folder_path,
+            "reanudar": self._preguntar_reanudar(aseguradora_id, folder_path),
+        }
+        if aseguradora_id == GRUPO_SIS_ID:
+            trabajo["input_glosas"] = self.input_glosas_text.toPlainText()
+            trabajo["modo_grupo_sis"] = self.combo_modo_grupo_sis.currentData()
+
+        self.cola_lote.append(trabajo)
+        self.lista_cola_lote.addItem(
+            f"{len(self.cola_lote)}. {self.combo_area.currentText()} / "
+            f"{self.combo_aseguradora.currentText()} — {os.path.basename(folder_path)}"
+            + (" (reanudar)" if trabajo["reanudar"] else "")
+        )
+        self._actualizar_estado_botones(proceso_corriendo=False)
+
+    @QtCore.Slot()
+    def _limpiar_cola(self):
+        """Vacía la cola del lote."""
+        self.cola_lote = []
+        self.lista_cola_lote.clear()
+        self._actualizar_estado_botones(proceso_corriendo=False)
+
+    @QtCore.Slot()
+    def _ejecutar_cola(self):
+        """Ejecuta la cola: portales distintos en paralelo, el mismo portal en secuencia."""
+        if self.hilo_activo and self.hilo_activo.isRunning():
+            QtWidgets.QMessageBox.warning(
+                self, "Proceso Activo", "Ya hay un proceso en curso."
+            )
+            return
+        if not self.cola_lote:
+            QtWidgets.QMessageBox.warning(
+                self, "Cola Vacía", "Agregue al menos un trabajo a la cola."
+            )
+            return
+
+        self.log_text_edit.clear()
+        self.log_text_edit.append(f"Preparando lote de {len(self.cola_lote)} trabajos...")
+        self._actualizar_estado_botones(proceso_corriendo=True)
+
+        self.hilo_activo = QtCore.QThread(self)
+        self.worker_activo = TrabajadorLote(list(self.cola_lote), self.headless_activo)
+        self.worker_activo.moveToThread(self.hilo_activo)
+
+        # Conectar señales
+        self.worker_activo.progreso_update.connect(self._actualizar_log)
+        self.worker_activo.finalizado.connect(self._manejar_finalizacion_worker)
+        self.worker_activo.error_critico.connect(self._mostrar_error_critico)
+        self.hilo_activo.finished.connect(self.worker_activo.deleteLater)
+        self.hilo_activo.finished.connect(self.hilo_activo.deleteLater)
+        self.hilo_activo.finished.connect(
+            self._limpiar_referencias_post_hilo
+        )
+
+        self.hilo_activo.started.connect(self.worker_activo.run_batch)
+        self.hilo_activo.start()
+
     @QtCore.Slot()
     def _generar_reporte(self):
         """Inicia la generación del reporte."""
@@ -516,6 +660,24 @@ RESUMEN DE RESULTADOS:
 - Omitidas (Factura duplicada): {omit_dup}
 - Fallos en Reintento: {retry_fail}
 """
+        elif worker_type is TrabajadorLote and len(args) == 1:
+            resumen = args[0]
+            totales = resumen["totales"]
+            self._actualizar_log(f"\nLote finalizado por el trabajador.")
+
+            titulo_popup = "Lote de Automatización Finalizado"
+            mensaje_popup = f"""Se completaron {len(resumen["trabajos"])} trabajos.
+
+RESUMEN CONSOLIDADO:
+- Éxitos: {totales["exitos"]}
+- Fallos: {totales["fallos"]}
+- Omitidas (Ya tenían RAD): {totales["omitidas_radicadas"]}
+- Omitidas (Factura duplicada): {totales["omitidas_duplicadas"]}
+- Correos no encontrados: {totales["correos_no_encontrados"]}
+- Trabajos con error crítico: {resumen["trabajos_con_error_critico"]}
+"""
+            # La cola ya se ejecutó
+            self._limpiar_cola()
         mostrar_popup = True
 
         # --- ACTUALIZAR BOTONES INMEDIATAMENTE ---
@@ -570,6 +732,11 @@ RESUMEN DE RESULTADOS:
                 reporte_habilitado = True
         
         self.report_button.setEnabled(reporte_habilitado)
+
+        # Controles de la cola del lote
+        self.agregar_cola_button.setEnabled(habilitar_controles and es_path_valida)
+        self.limpiar_cola_button.setEnabled(habilitar_controles and bool(self.cola_lote))
+        self.ejecutar_cola_button.setEnabled(habilitar_controles and bool(self.cola_lote))
         
         # Habilitar o deshabilitar los widgets de selección
         self.combo_area.setEnabled(habilitar_controles) # No olvidar el combo de área
@@ -599,6 +766,31 @@ RESUMEN DE RESULTADOS:
         self.raise_()
         self.activateWindow()
 
+    def _iniciar_servicio_correo(self):
+        """Arranca el servicio de correo; retoma los radicados que quedaron pendientes de otras sesiones."""
+        if not EMAIL_MODO_SERVICIO:
+            return
+        try:
+            self.servicio_correo = TrabajadorServicioCorreo()
+            self.servicio_correo.progreso_update.connect(self._actualizar_log)
+            self.servicio_correo.iniciar()
+        except Exception as e:
+            self.servicio_correo = None
+            self._actualizar_log(f"[ADVERTENCIA] No se pudo iniciar el servicio de correo: {e}")
+        self._actualizar_pendientes_correo()
+        self.timer_pendientes_correo.start()
+
+    @QtCore.Slot()
+    def _actualizar_pendientes_correo(self):
+        if not self.servicio_correo:
+            self.pendientes_correo_label.setText("Servicio de correo: no disponible")
+            return
+        try:
+            pendientes = self.servicio_correo.pendientes()
+        except Exception:
+            return
+        self.pendientes_correo_label.setText(f"Radicados esperando correo: {pendientes}")
+
     @QtCore.Slot()
     def _salir_aplicacion(self):
         """Cierra la aplicación completamente."""
@@ -614,6 +806,10 @@ RESUMEN DE RESULTADOS:
             )
             if resp == QtWidgets.QMessageBox.StandardButton.No:
                 return
+        if self.servicio_correo:
+            # Lo que no se resolvió queda en la tabla y se retoma al volver a abrir la aplicación
+            self.timer_pendientes_correo.stop()
+            self.servicio_correo.detener(timeout=10)
         if self.tray_icon:
             self.tray_icon.hide()
         QtWidgets.QApplication.instance().quit()
@@ -1,7 +1,8 @@
 import os
 import re
+import sys
 from openpyxl import load_workbook, Workbook
-from Core.api_gema import query_api_gema
+from Core.api_gema import TABLA_GLO_CAB, consultar_en_lotes, iterar_api_gema, resumen_cache_gema, configurar_modo_sin_conexion
 
 def extraer_prefijo_numero(factura):
     """Separa el prefijo (letras) del número de la factura."""
@@ -55,16 +56,16 @@ def consultar_tipo_glosa():
     # 3. Obtener Glosas vinculadas a la Cuenta de Cobro (glo_red)
     print(f"\nPaso 2: Buscando glosas asociadas a la Cuenta {gr_docn} en glo_red...")
     try:
-        # glo_red vincula gr_docn con gl_docn
-        sql_red = f"gl_docn FROM [gema10.d/salud/datos/glo_red] WHERE gr_docn = {gr_docn}"
-        data_red = query_api_gema(sql_red)
+        # glo_red vincula gr_docn con gl_docn; se lee por páginas de gl_docn (una cuenta puede traer miles de filas)
+        filas_red = iterar_api_gema("gl_docn", "[gema10.d/salud/datos/glo_red]", f"gr_docn = {gr_docn}", clave="gl_docn")
         
-        if not data_red:
+        # Extraer gl_docn únicos (pueden repetirse por items en glo_red)
+        glosas_ids = list(dict.fromkeys(str(int(item['gl_docn'])) for item in filas_red if item.get('gl_docn')))
+        
+        if not glosas_ids:
             print(f"⚠️ No se encontraron glosas vinculadas a la cuenta {gr_docn}.")
             return
             
-        # Extraer gl_docn únicos (pueden repetirse por items en glo_red)
-        glosas_ids = list(set([str(int(item['gl_docn'])) for item in data_red if item.get('gl_docn')]))
         print(f"✅ Se identificaron {len(glosas_ids)} glosas vinculadas a la cuenta.")
         
     except Exception as e:
@@ -75,29 +76,29 @@ def consultar_tipo_glosa():
     print(f"\nPaso 3: Trayendo detalles de facturas (serie, número, tipo) desde glo_cab...")
     mapa_facturas_validas = {} # (serie, numero) -> tipo
     
-    # Procesamos glosas una a una (o podrías hacer batches si el driver lo permite, pero individual es más seguro)
-    # Mostramos contador por ser muchas glosas
-    for idx, gl_id in enumerate(glosas_ids):
+    # glo_cab vincula gl_docn con fc_serie y fc_docn; se piden por lotes de gl_docn (pocas peticiones)
+    # y un lote fallido solo deja fuera sus glosas
+    errores_cab = {}
+    filas_cab = consultar_en_lotes(
+        f"tipo, fc_serie, fc_docn FROM {TABLA_GLO_CAB} WHERE gl_docn IN ({{valores}})", glosas_ids, errores=errores_cab
+    )
+    if errores_cab:
+        print(f"  ⚠️ Error consultando {len(errores_cab)} glosa(s) en glo_cab: {next(iter(errores_cab.values()))}")
+
+    for row in filas_cab:
         try:
-            # glo_cab vincula gl_docn con fc_serie y fc_docn
-            sql_cab = f"tipo, fc_serie, fc_docn FROM [gema10.d/salud/datos/glo_cab] WHERE gl_docn = {gl_id}"
-            data_cab = query_api_gema(sql_cab)
+            serie = str(row.get('fc_serie')).strip().upper()
+            numero = str(int(row.get('fc_docn'))).strip()
+            tipo = str(row.get('tipo')).strip() if row.get('tipo') else "N/A"
             
-            for row in data_cab:
-                serie = str(row.get('fc_serie')).strip().upper()
-                numero = str(int(row.get('fc_docn'))).strip()
-                tipo = str(row.get('tipo')).strip() if row.get('tipo') else "N/A"
-                
-                # Guardamos en nuestro mapa de validación
-                mapa_facturas_validas[(serie, numero)] = tipo
-                
-            if (idx + 1) % 50 == 0:
-                print(f"   ... procesadas {idx + 1} de {len(glosas_ids)} glosas.")
-                
+            # Guardamos en nuestro mapa de validación
+            mapa_facturas_validas[(serie, numero)] = tipo
         except Exception as e:
-            print(f"  ⚠️ Error consultando glosa {gl_id}: {e}")
+            print(f"  ⚠️ Error leyendo la fila de glo_cab {row}: {e}")
 
     print(f"✅ Mapa de facturas de la cuenta construido. ({len(mapa_facturas_validas)} facturas encontradas)")
+    if resumen_cache_gema():
+        print(resumen_cache_gema())
 
     # 5. Cruzar con el Excel y generar resultados
     print("\nPaso 4: Cruzando datos con tu lista de Excel...")
@@ -115,6 +116,10 @@ def consultar_tipo_glosa():
         if tipo_encontrado:
             print(f"  🔹 {factura} -> {tipo_encontrado}")
             resultados_finales.append({"Factura": factura, "Tipo": tipo_encontrado})
+        elif errores_cab:
+            # Pudo estar en una glosa del lote que falló: no se puede afirmar que no esté en la cuenta
+            print(f"  ⚠️ {factura} -> NO ENCONTRADA (hubo errores de API)")
+            resultados_finales.append({"Factura": factura, "Tipo": "ERROR_API"})
         else:
             print(f"  ⛔ {factura} -> NO EN CUENTA {gr_docn}")
             resultados_finales.append({"Factura": factura, "Tipo": "NO_EN_CUENTA"})
@@ -137,4 +142,7 @@ def consultar_tipo_glosa():
         print(f"❌ Error guardando resultados: {e}")
 
 if __name__ == "__main__":
+    # '--sin-conexion': responde desde la instantánea local de GEMA (python -m Core.cli --instantanea-gema)
+    if "--sin-conexion" in sys.argv:
+        configurar_modo_sin_conexion(True)
     consultar_tipo_glosa()
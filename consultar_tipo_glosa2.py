@@ -1,7 +1,8 @@
 import os
 import re
+import sys
 from openpyxl import load_workbook, Workbook
-from Core.api_gema import query_api_gema
+from Core.api_gema import consultar_glo_cab_por_facturas, clave_factura, resumen_cache_gema, configurar_modo_sin_conexion
 
 def extraer_prefijo_numero(factura):
     """Separa el prefijo (letras) del número de la factura."""
@@ -47,35 +48,44 @@ def consultar_tipo_glosa():
         print(f"❌ Error leyendo el Excel: {e}")
         return
 
-    # 3. Consultar GEMA para cada factura
+    # 3. Consultar GEMA por lotes (pocas peticiones para todas las facturas)
     print(f"\nProcesando {len(facturas_excel)} facturas...")
     resultados_finales = []
-    
-    for idx, factura in enumerate(facturas_excel):
-        prefijo, numero = extraer_prefijo_numero(factura)
-        
+
+    facturas_validas = [extraer_prefijo_numero(f) for f in facturas_excel]
+    # Un lote fallido solo marca sus facturas como ERROR_API; las demás siguen
+    errores_api = {}
+    try:
+        # freg DESC: la glosa más reciente de cada factura queda primero
+        cabeceras = consultar_glo_cab_por_facturas(
+            [par for par in facturas_validas if par[0]], columnas="tipo, freg", orden="freg DESC", errores=errores_api
+        )
+    except Exception as e:
+        cabeceras = {}
+        errores_api = {clave_factura(*par): e for par in facturas_validas if par[0]}
+    if errores_api:
+        print(f"  ⚠️ Error consultando GEMA para {len(errores_api)} factura(s): {next(iter(errores_api.values()))}")
+    if resumen_cache_gema():
+        print(resumen_cache_gema())
+
+    for idx, (factura, (prefijo, numero)) in enumerate(zip(facturas_excel, facturas_validas)):
         if not prefijo or not numero:
             print(f"  ⚠️ {factura} -> ERROR FORMATO")
             resultados_finales.append({"Factura": factura, "Tipo": "ERROR_FORMATO"})
             continue
-            
-        try:
-            # Consultamos la glosa más reciente para esta factura
-            # Usamos freg DESC para obtener siempre el último registro
-            sql = f"tipo FROM [gema10.d/salud/datos/glo_cab] WHERE fc_serie = '{prefijo}' AND fc_docn = {numero} ORDER BY freg DESC"
-            data = query_api_gema(sql)
-            
-            if data and len(data) > 0:
-                tipo_encontrado = str(data[0].get('tipo', 'S/T')).strip()
-                print(f"  [{idx+1}/{len(facturas_excel)}] {factura} -> {tipo_encontrado}")
-                resultados_finales.append({"Factura": factura, "Tipo": tipo_encontrado})
-            else:
-                print(f"  [{idx+1}/{len(facturas_excel)}] {factura} -> NO ENCONTRADA")
-                resultados_finales.append({"Factura": factura, "Tipo": "NO_ENCONTRADA"})
-                
-        except Exception as e:
-            print(f"  ⚠️ Error consultando {factura}: {e}")
+        if clave_factura(prefijo, numero) in errores_api:
+            print(f"  [{idx+1}/{len(facturas_excel)}] {factura} -> ERROR API")
             resultados_finales.append({"Factura": factura, "Tipo": "ERROR_API"})
+            continue
+
+        data = cabeceras.get(clave_factura(prefijo, numero))
+        if data:
+            tipo_encontrado = str(data[0].get('tipo', 'S/T')).strip()
+            print(f"  [{idx+1}/{len(facturas_excel)}] {factura} -> {tipo_encontrado}")
+            resultados_finales.append({"Factura": factura, "Tipo": tipo_encontrado})
+        else:
+            print(f"  [{idx+1}/{len(facturas_excel)}] {factura} -> NO ENCONTRADA")
+            resultados_finales.append({"Factura": factura, "Tipo": "NO_ENCONTRADA"})
 
     # 4. Guardar en Excel
     try:
@@ -95,4 +105,7 @@ def consultar_tipo_glosa():
         print(f"❌ Error guardando resultados: {e}")
 
 if __name__ == "__main__":
+    # '--sin-conexion': responde desde la instantánea local de GEMA (python -m Core.cli --instantanea-gema)
+    if "--sin-conexion" in sys.argv:
+        configurar_modo_sin_conexion(True)
     consultar_tipo_glosa()
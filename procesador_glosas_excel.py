@@ -8,7 +8,7 @@ from openpyxl import load_workbook
 # IMPORTACIÓN REAL
 # ======================================================================
 try:
-    from Core.api_gema import query_api_gema
+    from Core.api_gema import consultar_items_de_glosas_api
 except ImportError:
     print("ERROR FATAL: No se pudo encontrar el archivo 'Core/api_gema.py'.")
     exit()
@@ -58,28 +58,6 @@ def obtener_glosas_desde_input() -> list[tuple[str, str]]:
     return glosas_a_procesar
 
 
-def consultar_items_de_glosa_api(factura: str, estado: str) -> list[dict]:
-    try:
-        match = re.match(r'([A-Za-z]+)(\d+)', factura)
-        if not match:
-            return []
-        prefijo, num = match.groups()
-
-        sql_gl_docn = f"gl_docn FROM [gema10.d/salud/datos/glo_cab] WHERE fc_serie = '{prefijo}' AND fc_docn = {num} ORDER BY gl_fecha DESC"
-        print(f"  [API GEMA] Consultando ID para {factura}...")
-        resultados_cab = query_api_gema(sql_gl_docn)
-        if not resultados_cab:
-            return []
-
-        gl_docn = resultados_cab[0]['gl_docn']
-        sql_gl_det = f"codigo, vr_glosa, motivo_res FROM [gema10.d/salud/datos/glo_det] WHERE gl_docn = {gl_docn} AND estatus1 = '{estado}'"
-        print(f"  [API GEMA] Obteniendo detalles de ítems (gl_docn: {gl_docn}, estado: {estado})...")
-        return query_api_gema(sql_gl_det)
-    except Exception as e:
-        print(f"  - ERROR CRÍTICO durante la consulta a la API: {e}")
-        return []
-
-
 # ======================================================================
 # PROCESAMIENTO PRINCIPAL
 # ======================================================================
@@ -134,14 +112,21 @@ def procesar_archivo(tipo: str):
 
     reporte = {'exitos': set(), 'advertencias': set(), 'fallos': set()}
     total_items_actualizados = 0
+    items_por_glosa, errores_api = consultar_items_de_glosas_api(glosas_a_procesar, print)
 
     # ==================================================================
     # PROCESAMIENTO DE CADA FACTURA
     # ==================================================================
     for factura, estado in glosas_a_procesar:
         print(f"\n--- Procesando {factura} | Estado: {estado} ---")
-        items_api = consultar_items_de_glosa_api(factura, estado)
-        
+        items_api = items_por_glosa[(factura, estado)]
+
+        # Una caída de la API no es lo mismo que una factura sin ítems
+        if (factura, estado) in errores_api:
+            print(f"  - ERROR consultando la API: {errores_api[(factura, estado)]}")
+            reporte['fallos'].add(f"{factura} (Error API)")
+            continue
+
         # Si la API devuelve vacío o mensaje especial, manejarlo
         if not items_api:
             print("  - Sin ítems en la API o factura no encontrada.")